@@ -12,5 +12,20 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mare.settings')
+# Sob ASGI as páginas, a curva e as janelas usam as views assíncronas
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Como em mare/wsgi.py: com "gunicorn --preload" a store é carregada no mestre
+# e compartilhada pelos workers (copy-on-write)
+from django.conf import settings  # noqa: E402
+
+if settings.TIDE_STORE_ENABLED:
+    from django.db import connections
+    from mare_backend.store import get_store
+
+    try:
+        get_store()
+    finally:
+        connections.close_all()
@@ -0,0 +1,28 @@
+"""Configuração do gunicorn (``gunicorn -c mare/mare/gunicorn.conf.py``).
+
+``DJANGO_SERVER=asgi`` troca os workers síncronos (um pedido por vez) por
+workers do uvicorn rodando ``mare.asgi`` (pacote ``uvicorn-worker``, ver
+requirements); o padrão continua ``mare.wsgi`` com workers síncronos.
+
+Com mais de um worker exige cache compartilhado (``DJANGO_CACHE_BACKEND=file``
+ou ``redis``): a versão dos dados (``mare_backend.cache``) fica no cache, e com
+locmem uma escrita num worker (ou num comando, outro processo) não invalidaria
+as páginas, os validadores e o store dos demais.
+"""
+import os
+import sys
+
+_ASGI = os.getenv("DJANGO_SERVER", "wsgi") == "asgi"
+
+chdir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+wsgi_app = "mare.asgi:application" if _ASGI else "mare.wsgi:application"
+worker_class = "uvicorn_worker.UvicornWorker" if _ASGI else "sync"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+preload_app = True
+
+if workers > 1 and os.getenv("DJANGO_CACHE_BACKEND", "locmem") not in ("file", "redis"):
+    sys.exit(
+        f"{workers} workers com cache locmem: defina DJANGO_CACHE_BACKEND=file ou redis "
+        "(ou WEB_CONCURRENCY=1)"
+    )
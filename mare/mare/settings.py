@@ -63,7 +63,38 @@ MIDDLEWARE = [
 ]
 
 if _USE_WHITENOISE:
-    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    # Subclasse que também roda no modo assíncrono (deploy ASGI)
+    MIDDLEWARE.insert(1, 'mare_backend.staticfiles.WhiteNoiseMiddleware')
+
+# Views assíncronas (ORM assíncrono) para as páginas, curva e janelas; ligado
+# por mare/asgi.py. A API DRF continua síncrona (roda numa thread sob ASGI)
+ASYNC_VIEWS = os.getenv('DJANGO_ASYNC_VIEWS', 'False') == 'True'
+
+# Métricas Prometheus em /metrics (mare_backend.metrics). Logo depois do
+# WhiteNoise, para medir só as requisições que chegam às views
+METRICS_ENABLED = os.getenv('DJANGO_METRICS_ENABLED', 'True') == 'True'
+# Com vários workers (gunicorn), diretório compartilhado onde cada processo grava seus números
+METRICS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+# Se definido, /metrics exige "Authorization: Bearer <token>"; senão, só staff (sessão)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(2 if _USE_WHITENOISE else 1, 'mare_backend.metrics.MetricsMiddleware')
+
+# Perfil sob demanda (mare_backend.profiling): staff + "X-Profile: 1" ou "?_profile=1".
+# Depois do AuthenticationMiddleware, que fornece request.user
+# Ligado por padrão só com DEBUG. Capturas limitadas em número, idade (dias) e
+# consultas detalhadas por captura; limpeza manual: manage.py limpar_perfis
+PROFILER_ENABLED = os.getenv('DJANGO_PROFILER_ENABLED', str(DEBUG)) == 'True'
+PROFILER_DIR = os.getenv('DJANGO_PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_KEEP = int(os.getenv('DJANGO_PROFILER_KEEP', '50'))
+PROFILER_MAX_AGE_DAYS = int(os.getenv('DJANGO_PROFILER_MAX_AGE_DAYS', '7'))
+PROFILER_MAX_QUERIES = int(os.getenv('DJANGO_PROFILER_MAX_QUERIES', '500'))
+if PROFILER_ENABLED:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+        'mare_backend.profiling.ProfilerMiddleware',
+    )
 
 ROOT_URLCONF = 'mare.urls'
 
@@ -82,6 +113,10 @@ TEMPLATES = [
     },
 ]
 
+if METRICS_ENABLED:
+    # Mesmo backend, somando o tempo de render de cada requisição (mare_backend.metrics)
+    TEMPLATES[0]['BACKEND'] = 'mare_backend.metrics.DjangoTemplates'
+
 WSGI_APPLICATION = 'mare.wsgi.application'
 
 
@@ -104,6 +139,102 @@ if DATABASE_URL:
     except Exception:
         pass
 
+# Réplica de leitura (mare_backend.routers): segundo arquivo SQLite
+# (sqlite:////caminho/replica.sqlite3) ou URL Postgres. GET/HEAD leem as marés
+# da réplica; escritas, admin, sessões e comandos ficam no primário
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+# Segundos após uma escrita em que todas as leituras voltam ao primário (atraso da réplica)
+REPLICA_PIN_SECONDS = float(os.getenv('DJANGO_REPLICA_PIN_SECONDS', '5'))
+if DATABASE_REPLICA_URL:
+    import dj_database_url  # type: ignore
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600, ssl_require=False)
+    # Nos testes a réplica é o próprio banco de teste
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['mare_backend.routers.ReplicaRouter']
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'mare_backend.routers.ReplicaMiddleware',
+    )
+
+# Perfil de leitura do SQLite: WAL (leitores não esperam o escritor), mmap,
+# synchronous=NORMAL (seguro com WAL) e cache maior, aplicados a cada conexão.
+# Desligado por padrão: o modo WAL fica gravado no arquivo do banco
+if os.getenv('DJANGO_SQLITE_TUNING', 'False') == 'True':
+    _SQLITE_PRAGMAS = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={int(os.getenv('DJANGO_SQLITE_MMAP_MB', '256')) * 1024 * 1024}",
+        f"PRAGMA cache_size=-{int(os.getenv('DJANGO_SQLITE_CACHE_MB', '64')) * 1024}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+    for _alias, _db in DATABASES.items():
+        if _db['ENGINE'] != 'django.db.backends.sqlite3':
+            continue
+        _pragmas = _SQLITE_PRAGMAS + (['PRAGMA query_only=ON'] if _alias == 'replica' else [])
+        _db['OPTIONS'] = {
+            **_db.get('OPTIONS', {}),
+            'init_command': ';'.join(_pragmas),
+            # Escritas pegam o lock já no BEGIN: sem "database is locked" no meio da transação
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': int(os.getenv('DJANGO_SQLITE_TIMEOUT', '20')),
+        }
+
+
+# Cache
+# DJANGO_CACHE_BACKEND: "locmem" (padrão), "file" ou "redis" (requer o pacote redis).
+# A versão dos dados (mare_backend.cache) mora no cache: locmem só serve a um
+# processo (runserver, testes); gunicorn com mais de um worker recusa subir
+# com ele (mare/gunicorn.conf.py). Dockerfile, Procfile e .ebextensions usam file
+
+_CACHE_BACKEND = os.getenv('DJANGO_CACHE_BACKEND', 'locmem')
+_CACHE_LOCATION = os.getenv('DJANGO_CACHE_LOCATION', '')
+
+if _CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': _CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+        }
+    }
+elif _CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': _CACHE_LOCATION or str(BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': _CACHE_LOCATION or 'mare',
+        }
+    }
+
+# Tempo de vida (s) das páginas/fragmentos renderizados; a invalidação real é
+# feita pela versão dos dados (mare_backend.cache)
+PAGES_CACHE_TIMEOUT = int(os.getenv('PAGES_CACHE_TIMEOUT', str(60 * 60 * 24)))
+
+# Páginas caras (index, /calendario/, /dia/; mare_backend.singleflight): numa
+# falta de cache só um processo reconstrói (trava de até COALESCE_LOCK_SECONDS);
+# os outros servem a última cópia boa da URL ou esperam COALESCE_WAIT_SECONDS.
+# A última cópia boa vale STALE_PAGE_TIMEOUT e cobre também o banco fora do ar
+COALESCE_LOCK_SECONDS = int(os.getenv('DJANGO_COALESCE_LOCK_SECONDS', '30'))
+COALESCE_WAIT_SECONDS = float(os.getenv('DJANGO_COALESCE_WAIT_SECONDS', '2'))
+STALE_PAGE_TIMEOUT = int(os.getenv('DJANGO_STALE_PAGE_TIMEOUT', str(60 * 60 * 24 * 7)))
+
+# Store de marés em memória (mare_backend.store): páginas e TideDayViewSet leem
+# de arrays carregados uma vez por processo em vez de consultar o banco
+TIDE_STORE_ENABLED = os.getenv('TIDE_STORE_ENABLED', 'False') == 'True'
+
+# Sincronização incremental (/api/changes/): o token devolvido fica
+# SYNC_TOKEN_LAG_SECONDS atrás do relógio, para não perder transações que
+# gravaram updated_at antes e fizeram commit depois (mudanças recentes vêm de
+# novo na próxima chamada). Lápides de exclusões valem SYNC_TOMBSTONE_DAYS;
+# tokens mais antigos recebem 410 (recarga completa)
+SYNC_TOKEN_LAG_SECONDS = float(os.getenv('DJANGO_SYNC_TOKEN_LAG_SECONDS', '60'))
+SYNC_TOMBSTONE_DAYS = int(os.getenv('DJANGO_SYNC_TOMBSTONE_DAYS', '90'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -145,6 +276,15 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 if _USE_WHITENOISE:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Páginas pré-renderizadas (manage.py gerar_paginas), ao lado de STATIC_ROOT
+PRERENDER_ROOT = Path(os.getenv('DJANGO_PRERENDER_ROOT', str(BASE_DIR / 'prerendered')))
+# Esquema e host usados nas URLs absolutas (canonical, og:image) das páginas geradas
+PRERENDER_BASE_URL = os.getenv('DJANGO_PRERENDER_BASE_URL', 'https://www.maresdesalinas.com.br')
+# Serve /dia/ e /calendario/ direto dos arquivos gerados pelo WhiteNoise (com .gz/.br)
+if _USE_WHITENOISE and os.getenv('DJANGO_PRERENDER_SERVE', 'False') == 'True':
+    WHITENOISE_ROOT = PRERENDER_ROOT
+    WHITENOISE_INDEX_FILE = True
+
 # Security headers for production (only effective when behind HTTPS)
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -168,10 +308,17 @@ if _csrf_trusted:
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Django REST Framework minimal defaults
+# JSON da API via orjson quando instalado (mesma saída do renderer do DRF);
+# a Browsable API (HTML, ?format=api) só com DEBUG
+try:
+    import orjson  # noqa: F401
+    _JSON_RENDERER = 'mare_backend.renderers.ORJSONRenderer'
+except Exception:
+    _JSON_RENDERER = 'rest_framework.renderers.JSONRenderer'
+
 REST_FRAMEWORK = {
-    'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+    'DEFAULT_RENDERER_CLASSES': (_JSON_RENDERER,) + (
+        ('rest_framework.renderers.BrowsableAPIRenderer',) if DEBUG else ()
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
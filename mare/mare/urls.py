@@ -14,11 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
-from mare_backend.api_views import TideDayViewSet, TideViewSet
+from mare_backend.metrics import metrics_view
+from mare_backend.api_views import (
+    TideDayViewSet, TideViewSet, atide_curve, atide_windows, tide_bundle, tide_bundle_file, tide_changes,
+    tide_curve, tide_export, tide_windows,
+)
+
+if settings.ASYNC_VIEWS:
+    tide_curve, tide_windows = atide_curve, atide_windows
 
 router = DefaultRouter()
 router.register(r"tidedays", TideDayViewSet, basename="tideday")
@@ -27,6 +35,13 @@ router.register(r"tides", TideViewSet, basename="tide")
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('pages.urls')),
+    path('metrics', metrics_view, name='metrics'),
+    path('api/export/', tide_export, name='tide-export'),
+    path('api/curve/', tide_curve, name='tide-curve'),
+    path('api/windows/', tide_windows, name='tide-windows'),
+    path('api/changes/', tide_changes, name='tide-changes'),
+    path('api/bundle/<int:year>/', tide_bundle, name='tide-bundle'),
+    path('api/bundle/<int:year>/<slug:digest>.<slug:fmt>', tide_bundle_file, name='tide-bundle-file'),
     path('api/', include(router.urls)),
     # OpenAPI schema and docs
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
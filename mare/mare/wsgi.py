@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mare.settings')
 
 application = get_wsgi_application()
+
+# Com "gunicorn --preload" este módulo roda no processo mestre: carrega a store
+# de marés aqui para que os workers a compartilhem (copy-on-write), e fecha a
+# conexão usada para que nenhum worker herde o mesmo socket.
+from django.conf import settings  # noqa: E402
+
+if settings.TIDE_STORE_ENABLED:
+    from django.db import connections
+    from mare_backend.store import get_store
+
+    try:
+        get_store()
+    finally:
+        connections.close_all()
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import TideDay, Tide
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import ImportManifestEntry, ProfileCapture, TideDay, Tide, reclassify_days
 
 
 class TideInline(admin.TabularInline):
@@ -10,14 +14,91 @@ class TideInline(admin.TabularInline):
 @admin.register(TideDay)
 class TideDayAdmin(admin.ModelAdmin):
     list_display = ("date", "weekday")
+    list_filter = ("year", "month")
     search_fields = ("weekday",)
     inlines = [TideInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        form.instance.classify_tides()
+
 
 @admin.register(Tide)
 class TideAdmin(admin.ModelAdmin):
-    list_display = ("day", "order", "time", "height")
+    list_display = ("day", "order", "time", "height", "kind")
     list_select_related = ("day",)
-    list_filter = ("order",)
+    list_filter = ("year", "month", "order")
+    readonly_fields = ("kind", "at")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.day.classify_tides()
+
+    def delete_model(self, request, obj):
+        day = obj.day
+        super().delete_model(request, obj)
+        day.classify_tides()
+
+    def delete_queryset(self, request, queryset):
+        day_ids = list(queryset.values_list("day_id", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        reclassify_days(day_ids)
+
+
+@admin.register(ImportManifestEntry)
+class ImportManifestEntryAdmin(admin.ModelAdmin):
+    list_display = ("key", "digest", "source", "updated_at")
+    search_fields = ("key",)
+    readonly_fields = ("key", "digest", "source", "updated_at")
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at", "method", "path", "view_name", "status",
+        "duration_ms", "query_count", "db_ms", "user", "downloads",
+    )
+    list_filter = ("view_name", "status")
+    search_fields = ("path",)
+    readonly_fields = [f.name for f in ProfileCapture._meta.fields] + ["downloads"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Artefatos")
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">.prof</a> · <a href="{}">.json</a>',
+            reverse("admin:mare_backend_profilecapture_download", args=[obj.pk, "prof"]),
+            reverse("admin:mare_backend_profilecapture_download", args=[obj.pk, "json"]),
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                "<int:pk>/download/<str:kind>/",
+                self.admin_site.admin_view(self.download),
+                name="mare_backend_profilecapture_download",
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        capture = self.get_object(request, pk)
+        if capture is None or kind not in ("prof", "json") or not self.has_view_permission(request, capture):
+            raise Http404
+        artifact = capture.artifact_path(kind)
+        if not artifact.exists():
+            raise Http404
+        return FileResponse(open(artifact, "rb"), as_attachment=True, filename=f"profile-{pk}.{kind}")
+
+    def delete_model(self, request, obj):
+        obj.delete_artifacts()
+        super().delete_model(request, obj)
 
-# Register your models here.
+    def delete_queryset(self, request, queryset):
+        for capture in queryset:
+            capture.delete_artifacts()
+        super().delete_queryset(request, queryset)
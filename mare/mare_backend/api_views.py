@@ -1,50 +1,686 @@
-from datetime import datetime
+import calendar
+import csv
+import json
+import math
+from datetime import MAXYEAR, MINYEAR, date, datetime, timedelta
 
+from django.conf import settings
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import quote_etag
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
-from .models import TideDay, Tide
+from . import curve, rows, sync, windows
+from .bundle import get_bundle
+from .conditional import not_modified, range_validators, set_validators
+from .models import MAX_DATE, MIN_DATE, TideDay, Tide, in_range, instant_bounds
+from .pagination import TideCursorPagination, TideDayCursorPagination
+from .routers import use_primary
 from .serializers import TideDaySerializer, TideSerializer
+from .store import get_store
 
 
-class TideDayViewSet(viewsets.ReadOnlyModelViewSet):
+class ConditionalGetMixin:
+    """ETag/Last-Modified em list/retrieve; 304 antes de qualquer serialização.
+
+    As subclasses informam, em ``get_validator_days``, os ``TideDay`` que
+    compõem a resposta.
+    """
+
+    def get_validator_days(self):
+        raise NotImplementedError
+
+    def validator_pk(self):
+        """``pk`` da URL para ``get_validator_days``, que roda antes do ``get_object``:
+        um valor não numérico é 404, como lá."""
+        try:
+            return int(self.kwargs["pk"])
+        except (TypeError, ValueError):
+            raise NotFound
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        # A Browsable API depende do usuário/sessão; não usa validadores
+        if request.accepted_renderer.format == "api":
+            return handler(request, *args, **kwargs)
+        etag, last_modified = range_validators(
+            self.get_validator_days(), self.basename, request.get_full_path(), request.accepted_renderer.format
+        )
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return set_validators(handler(request, *args, **kwargs), etag, last_modified)
+
+
+def _stored_day_data(day):
+    # Mesmo formato de TideDaySerializer
+    return {
+        "id": day.id,
+        "date": day.date.isoformat(),
+        "weekday": day.weekday,
+        "tides": [
+            {"id": t.id, "order": t.order, "time": t.time.isoformat(), "height": str(t.height)}
+            for t in day.tides
+        ],
+    }
+
+
+class TideStoreMixin:
+    """Serve list/retrieve a partir da store em memória quando ela está ligada."""
+
+    def list(self, request, *args, **kwargs):
+        store = get_store()
+        if store is None:
+            return super().list(request, *args, **kwargs)
+        lo, hi = store.bounds(*self.get_date_bounds())
+        days, next_link, previous_link = self.paginator.paginate_store(store, lo, hi, request)
+        return Response({
+            "next": next_link,
+            "previous": previous_link,
+            "results": [_stored_day_data(d) for d in days],
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        store = get_store()
+        if store is None:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            day = store.by_id(int(kwargs["pk"]))
+        except ValueError:
+            day = None
+        if day is None:
+            raise NotFound()
+        return Response(_stored_day_data(day))
+
+
+class ValuesReadMixin:
+    """list/retrieve a partir de ``.values()``, sem instanciar modelos nem serializers.
+
+    As linhas viram dicts pelas funções compiladas de ``rows``, com a mesma
+    saída do ``serializer_class``. A Browsable API (que monta formulários com o
+    serializer) continua pelo caminho padrão.
+    """
+    read_fields = ()
+
+    def rows_to_data(self, rows):
+        raise NotImplementedError
+
+    def get_values_queryset(self):
+        return self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*self.read_fields)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == "api":
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.get_values_queryset())
+        return self.get_paginated_response(self.rows_to_data(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == "api":
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(self.get_values_queryset(), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(self.rows_to_data([row])[0])
+
+
+def _period_bounds(params):
+    """Primeiro e último dia de ``year`` (e ``month``, opcional), ou ``None`` sem ``year``.
+
+    Um filtro inválido é recusado (400) em vez de ignorado: nunca amplia o resultado.
+    """
+    if not params.get("year"):
+        if params.get("month"):
+            raise ParseError("Informe year junto com month.")
+        return None
+    try:
+        year = int(params["year"])
+        month = int(params["month"]) if params.get("month") else None
+        if month is None:
+            return date(year, 1, 1), date(year, 12, 31)
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    except (ValueError, OverflowError):
+        raise ParseError(f"year deve estar entre {MINYEAR} e {MAXYEAR} e month entre 1 e 12.")
+
+
+class TideDayViewSet(ConditionalGetMixin, TideStoreMixin, ValuesReadMixin, viewsets.ReadOnlyModelViewSet):
     queryset = TideDay.objects.all().prefetch_related("tides").order_by("date")
     serializer_class = TideDaySerializer
+    pagination_class = TideDayCursorPagination
+    read_fields = rows.field_names(rows.TIDEDAY_FIELDS)
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        date_param = self.request.query_params.get("date")
-        start = self.request.query_params.get("start")
-        end = self.request.query_params.get("end")
+    def rows_to_data(self, day_rows):
+        return rows.days_with_tides(day_rows)
+
+    def get_date_bounds(self):
+        """``(início, fim)`` a partir de ``date``, ``start``+``end`` e/ou ``year``[+``month``];
+        ``None`` = aberto."""
+        lower = upper = None
+        params = self.request.query_params
+        date_param = params.get("date")
+        start = params.get("start")
+        end = params.get("end")
         if date_param:
             try:
-                d = datetime.strptime(date_param, "%Y-%m-%d").date()
-                qs = qs.filter(date=d)
+                lower = upper = datetime.strptime(date_param, "%Y-%m-%d").date()
             except ValueError:
                 pass
         if start and end:
             try:
                 ds = datetime.strptime(start, "%Y-%m-%d").date()
                 de = datetime.strptime(end, "%Y-%m-%d").date()
-                qs = qs.filter(date__range=(ds, de))
+                lower = max(lower, ds) if lower else ds
+                upper = min(upper, de) if upper else de
             except ValueError:
                 pass
+        period = _period_bounds(params)
+        if period:
+            lower = max(lower, period[0]) if lower else period[0]
+            upper = min(upper, period[1]) if upper else period[1]
+        return lower, upper
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        lower, upper = self.get_date_bounds()
+        if lower:
+            qs = qs.filter(date__gte=lower)
+        if upper:
+            qs = qs.filter(date__lte=upper)
         return qs
 
+    def get_validator_days(self):
+        if "pk" in self.kwargs:
+            return TideDay.objects.filter(pk=self.validator_pk())
+        return self.filter_queryset(self.get_queryset())
+
 
-class TideViewSet(viewsets.ModelViewSet):
-    queryset = Tide.objects.select_related("day").all().order_by("day__date", "order")
+class TideViewSet(ConditionalGetMixin, ValuesReadMixin, viewsets.ModelViewSet):
+    queryset = (
+        Tide.objects.select_related("day")
+        .annotate(day_date=F("day__date"))
+        .order_by("day_date", "order")
+    )
     serializer_class = TideSerializer
+    pagination_class = TideCursorPagination
+    # day_date: posição do cursor (não sai na resposta)
+    read_fields = rows.field_names(rows.TIDE_FIELDS) + ["day_date"]
+
+    def rows_to_data(self, tide_rows):
+        tide_row = rows.tide_row
+        return [tide_row(r) for r in tide_rows]
 
     def get_queryset(self):
+        # Filtros sobre Tide.at/year/month: varreduras de índice, sem join com TideDay
         qs = super().get_queryset()
-        date_param = self.request.query_params.get("date")
+        params = self.request.query_params
+        date_param = params.get("date")
         if date_param:
             try:
                 d = datetime.strptime(date_param, "%Y-%m-%d").date()
-                qs = qs.filter(day__date=d)
             except ValueError:
-                pass
+                d = None
+            if d is not None and not in_range(d):
+                # Nenhuma maré é gravada fora do alcance dos instantes
+                qs = qs.none()
+            elif d is not None:
+                begin, stop = instant_bounds(d, d)
+                qs = qs.filter(at__gte=begin, at__lt=stop)
+        # Instantes ISO (com ou sem fuso; sem fuso = TIME_ZONE), inclusive atravessando a meia-noite
+        lowest, highest = instant_bounds(MIN_DATE, MAX_DATE)
+        for name, lookup in (("after", "at__gte"), ("before", "at__lt")):
+            try:
+                value = parse_datetime(params.get(name, "").replace(" ", "+"))
+            except ValueError:
+                value = None
+            if value is not None:
+                if timezone.is_naive(value):
+                    value = timezone.make_aware(value, timezone.get_default_timezone())
+                # Nenhuma maré é gravada fora do alcance: basta limitar o instante
+                qs = qs.filter(**{lookup: min(max(value, lowest), highest)})
+        if _period_bounds(params):
+            qs = qs.filter(year=int(params["year"]))
+            if params.get("month"):
+                qs = qs.filter(month=int(params["month"]))
         return qs
 
+    def get_validator_days(self):
+        if "pk" in self.kwargs:
+            return TideDay.objects.filter(tides__pk=self.validator_pk())
+        return TideDay.objects.filter(pk__in=self.filter_queryset(self.get_queryset()).values("day_id"))
+
+    @action(detail=False, methods=["post"], url_path="batch")
+    def batch(self, request):
+        """Cria/atualiza várias marés (qualquer número de datas) numa única transação."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        tides = serializer.save()
+        results = [
+            {
+                "index": i,
+                "id": t.id,
+                "date": t.day.date.isoformat(),
+                "order": t.order,
+                "time": t.time.isoformat(),
+                "height": str(t.height),
+                "kind": t.kind,
+                "created": t.created,
+            }
+            for i, t in enumerate(tides)
+        ]
+        created = sum(1 for t in tides if t.created)
+        return Response(
+            {"created": created, "updated": len(tides) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    def perform_destroy(self, instance):
+        day = instance.day
+        super().perform_destroy(instance)
+        day.classify_tides()
+
+
+
+EXPORT_FIELDS = ("date", "weekday", "order", "time", "height", "kind")
+EXPORT_CHUNK_SIZE = 2000
+
+
+class _Echo:
+    """Pseudo-buffer para o csv.writer: devolve a linha em vez de gravá-la."""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(start, end):
+    qs = Tide.objects.order_by("day__date", "order")
+    if start:
+        qs = qs.filter(at__gte=instant_bounds(start, start)[0])
+    if end:
+        qs = qs.filter(at__lt=instant_bounds(end, end)[1])
+    # Cursor do banco lido em blocos: memória constante para qualquer intervalo
+    return qs.values_list(
+        "day__date", "day__weekday", "order", "time", "height", "kind"
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _batched(lines):
+    buf = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= EXPORT_CHUNK_SIZE:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def _stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for d, weekday, order, t, height, kind in rows:
+        yield writer.writerow((d.isoformat(), weekday, order, t.isoformat(), height, kind))
+
+
+def _stream_ndjson(rows):
+    for d, weekday, order, t, height, kind in rows:
+        yield json.dumps({
+            "date": d.isoformat(),
+            "weekday": weekday,
+            "order": order,
+            "time": t.isoformat(),
+            "height": str(height),
+            "kind": kind,
+        }, ensure_ascii=False) + "\n"
+
+
+def tide_export(request):
+    """Exporta marés em NDJSON ou CSV, por streaming.
+
+    Parâmetros: ``start``/``end`` (YYYY-MM-DD, ambos opcionais) e
+    ``format`` (``ndjson`` ou ``csv``; padrão ``ndjson``).
+    """
+    fmt = request.GET.get("format", "ndjson").lower()
+    if fmt not in ("ndjson", "csv"):
+        return JsonResponse({"detail": "format deve ser ndjson ou csv."}, status=status.HTTP_400_BAD_REQUEST)
+    bounds = {}
+    for name in ("start", "end"):
+        value = request.GET.get(name)
+        try:
+            bounds[name] = datetime.strptime(value, "%Y-%m-%d").date() if value else None
+        except ValueError:
+            return JsonResponse({"detail": f"{name} inválido; use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+    if not in_range(*(b for b in bounds.values() if b)):
+        return JsonResponse(
+            {"detail": f"Datas de {MIN_DATE} a {MAX_DATE}."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    rows = _export_rows(bounds["start"], bounds["end"])
+    if fmt == "csv":
+        response = StreamingHttpResponse(_batched(_stream_csv(rows)), content_type="text/csv; charset=utf-8")
+    else:
+        response = StreamingHttpResponse(_batched(_stream_ndjson(rows)), content_type="application/x-ndjson")
+    label = "-".join(b.isoformat() for b in bounds.values() if b) or "all"
+    response["Content-Disposition"] = f'attachment; filename="mares-{label}.{fmt}"'
+    return response
+
+
+BUNDLE_CONTENT_TYPES = {"json": "application/json", "bin": "application/octet-stream"}
+# URLs com o hash do conteúdo nunca mudam de conteúdo
+BUNDLE_IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _accepted_encoding(request, available):
+    """A melhor codificação pré-comprimida aceita pelo cliente (br, gzip ou identity)."""
+    accepted = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, param = part.partition(";")
+        param = param.strip()
+        try:
+            q = float(param[2:]) if param.startswith("q=") else 1.0
+        except ValueError:
+            q = 0.0
+        accepted[name.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, 0) > 0:
+            return coding
+    return "identity"
+
+
+def _bundle_url(year, bundle, fmt):
+    return reverse("tide-bundle-file", kwargs={"year": year, "digest": bundle["hash"], "fmt": fmt})
+
+
+def tide_bundle(request, year):
+    """Manifesto do pacote do ano: hash atual e URLs imutáveis (JSON e binário).
+
+    Revalidado a cada uso (ETag); os arquivos apontados podem ficar no cache
+    do cliente para sempre.
+    """
+    bundle = get_bundle(year)
+    if bundle is None:
+        return JsonResponse({"detail": f"Nenhum dia cadastrado em {year}."}, status=status.HTTP_404_NOT_FOUND)
+    etag = quote_etag(bundle["hash"])
+    response = not_modified(request, etag, None)
+    if response is None:
+        response = JsonResponse({
+            "year": year,
+            "hash": bundle["hash"],
+            "days": bundle["days"],
+            "tides": bundle["tides"],
+            "json": _bundle_url(year, bundle, "json"),
+            "bin": _bundle_url(year, bundle, "bin"),
+        })
+        response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+def tide_bundle_file(request, year, digest, fmt):
+    """Pacote do ano já comprimido (br/gzip conforme Accept-Encoding), com cache imutável.
+
+    Um hash antigo redireciona para o atual.
+    """
+    if fmt not in BUNDLE_CONTENT_TYPES:
+        return JsonResponse({"detail": "Formato deve ser json ou bin."}, status=status.HTTP_404_NOT_FOUND)
+    bundle = get_bundle(year)
+    if bundle is None:
+        return JsonResponse({"detail": f"Nenhum dia cadastrado em {year}."}, status=status.HTTP_404_NOT_FOUND)
+    if digest != bundle["hash"]:
+        response = HttpResponseRedirect(_bundle_url(year, bundle, fmt))
+        response["Cache-Control"] = "no-cache"
+        return response
+    coding = _accepted_encoding(request, bundle[fmt])
+    response = HttpResponse(bundle[fmt][coding], content_type=BUNDLE_CONTENT_TYPES[fmt])
+    if coding != "identity":
+        response["Content-Encoding"] = coding
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = BUNDLE_IMMUTABLE
+    return response
+
+
+def tide_changes(request):
+    """Dias alterados ou excluídos desde ``since`` (token de uma chamada anterior).
+
+    Sem ``since``: só o token atual, para começar a sincronizar depois de uma
+    carga completa. Sempre lê do primário: numa réplica atrasada o token
+    avançaria sobre mudanças que ela ainda não tem.
+    """
+    raw = request.GET.get("since")
+    with use_primary():
+        now = timezone.now()
+        horizon = now - timedelta(seconds=settings.SYNC_TOKEN_LAG_SECONDS)
+        if not raw:
+            return JsonResponse({"token": sync.encode_token(horizon), "days": [], "removed": []})
+        try:
+            since = sync.decode_token(raw)
+        except (ValueError, OverflowError):
+            return JsonResponse({"detail": "since inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        if since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            return JsonResponse(
+                {"detail": "Token expirado; refaça a carga completa e recomece sem since."},
+                status=status.HTTP_410_GONE,
+            )
+        days, removed = sync.changes_since(since)
+    return JsonResponse({"token": sync.encode_token(max(since, horizon)), "days": days, "removed": removed})
+
+
+CURVE_MAX_POINTS = 1_000_000
+CURVE_MAX_INSTANTS = 10_000
+
+
+def _curve_values(values):
+    return [None if v != v else round(v, 3) for v in values.tolist()]
+
+
+def tide_curve(request):
+    """Altura da maré em qualquer instante, interpolada entre os extremos.
+
+    - ``?at=ISO,ISO,...``: alturas nos instantes informados (até 10.000);
+    - ``?start=YYYY-MM-DD&end=YYYY-MM-DD&step=N``: série a cada N minutos
+      (padrão 10) de ``start`` 00:00 até ``end`` 23:59.
+
+    ``method`` escolhe a interpolação: ``cosine`` (padrão) ou ``twelfths``.
+    """
+    error, query = _curve_query(request)
+    if error is not None:
+        return error
+    extremes = curve.extremes_between(*query["span"]) if query["span"] else None
+    return _curve_response(query, extremes)
+
+
+async def atide_curve(request):
+    """``tide_curve`` assíncrona (deploy ASGI)."""
+    error, query = _curve_query(request)
+    if error is not None:
+        return error
+    extremes = await curve.aextremes_between(*query["span"]) if query["span"] else None
+    return _curve_response(query, extremes)
+
+
+def _curve_query(request):
+    """Valida os parâmetros: ``(resposta de erro, None)`` ou ``(None, query)``.
+
+    ``query["span"]`` traz as datas cujos extremos a resposta precisa.
+    """
+    method = request.GET.get("method", "cosine")
+    if method not in curve.METHODS:
+        return JsonResponse({"detail": "method deve ser cosine ou twelfths."}, status=status.HTTP_400_BAD_REQUEST), None
+
+    at = request.GET.get("at")
+    if at:
+        instants = []
+        for raw in at.split(","):
+            try:
+                value = parse_datetime(raw.strip().replace(" ", "+"))
+            except ValueError:
+                value = None
+            if value is None or not in_range(value):
+                return JsonResponse({"detail": f"Instante inválido: {raw}"}, status=status.HTTP_400_BAD_REQUEST), None
+            instants.append(value)
+        if len(instants) > CURVE_MAX_INSTANTS:
+            return JsonResponse(
+                {"detail": f"No máximo {CURVE_MAX_INSTANTS} instantes."}, status=status.HTTP_400_BAD_REQUEST
+            ), None
+        seconds = curve.instant_seconds(instants)
+        return None, {"method": method, "at": at, "seconds": seconds, "span": curve.seconds_span(seconds)}
+
+    try:
+        start = datetime.strptime(request.GET.get("start", ""), "%Y-%m-%d").date()
+        end = datetime.strptime(request.GET.get("end", ""), "%Y-%m-%d").date()
+        step = int(request.GET.get("step", "10"))
+    except ValueError:
+        return JsonResponse(
+            {"detail": "Informe at=... ou start/end (YYYY-MM-DD) e step em minutos."},
+            status=status.HTTP_400_BAD_REQUEST,
+        ), None
+    if end < start or not 1 <= step <= 1440:
+        return JsonResponse(
+            {"detail": "Intervalo ou step inválido (1 a 1440 minutos)."}, status=status.HTTP_400_BAD_REQUEST
+        ), None
+    if not in_range(start, end):
+        return JsonResponse(
+            {"detail": f"Datas de {MIN_DATE} a {MAX_DATE}."}, status=status.HTTP_400_BAD_REQUEST
+        ), None
+    if ((end - start).days + 1) * 1440 // step > CURVE_MAX_POINTS:
+        return JsonResponse(
+            {"detail": f"No máximo {CURVE_MAX_POINTS} pontos por pedido."}, status=status.HTTP_400_BAD_REQUEST
+        ), None
+    return None, {"method": method, "start": start, "end": end, "step": step, "span": (start, end)}
+
+
+def _curve_response(query, extremes):
+    method = query["method"]
+    if "at" in query:
+        heights = _curve_values(curve.interpolate(*extremes, query["seconds"], method))
+        return JsonResponse({
+            "method": method,
+            "results": [{"at": raw.strip(), "height": h} for raw, h in zip(query["at"].split(","), heights)],
+        })
+    start, end, step = query["start"], query["end"], query["step"]
+    heights = curve.series(start, end, step, method, extremes)
+    return JsonResponse({
+        "start": f"{start.isoformat()}T00:00:00",
+        "end": f"{end.isoformat()}T23:59:59",
+        "step_minutes": step,
+        "method": method,
+        "unit": "m",
+        "heights": _curve_values(heights),
+    })
+
+
+WINDOWS_MAX_DAYS = 366 * 20
+WINDOWS_MAX_RESULTS = 10_000
+
+
+def _minute_of_day(value):
+    """``HH:MM`` -> minutos (0..1440; ``24:00`` marca o fim do dia)."""
+    hours, _, minutes = value.partition(":")
+    total = int(hours) * 60 + int(minutes or 0)
+    if not 0 <= total <= 1440 or not 0 <= int(minutes or 0) < 60:
+        raise ValueError(value)
+    return total
+
+
+def tide_windows(request):
+    """Janelas em que a maré fica abaixo (ou acima) de uma altura.
+
+    Parâmetros: ``threshold`` (metros), ``start``/``end`` (YYYY-MM-DD),
+    ``mode`` (``below``, padrão, ou ``above``), ``from``/``to`` (HH:MM,
+    opcionais; ``from`` > ``to`` atravessa a meia-noite), ``min_duration``
+    (minutos) e ``method`` (como em ``/api/curve/``).
+    """
+    error, query = _windows_query(request)
+    if error is not None:
+        return error
+    extremes = windows.candidate_extremes(query["start"], query["end"], query["threshold"], query["mode"])
+    return _windows_response(query, extremes)
+
+
+async def atide_windows(request):
+    """``tide_windows`` assíncrona (deploy ASGI)."""
+    error, query = _windows_query(request)
+    if error is not None:
+        return error
+    extremes = await windows.acandidate_extremes(query["start"], query["end"], query["threshold"], query["mode"])
+    return _windows_response(query, extremes)
+
+
+def _windows_query(request):
+    """Valida os parâmetros: ``(resposta de erro, None)`` ou ``(None, query)``."""
+    mode = request.GET.get("mode", windows.BELOW)
+    method = request.GET.get("method", "cosine")
+    if mode not in windows.MODES or method not in curve.METHODS:
+        return JsonResponse(
+            {"detail": "mode deve ser below ou above; method, cosine ou twelfths."},
+            status=status.HTTP_400_BAD_REQUEST,
+        ), None
+    try:
+        threshold = float(request.GET["threshold"])
+        start = datetime.strptime(request.GET.get("start", ""), "%Y-%m-%d").date()
+        end = datetime.strptime(request.GET.get("end", ""), "%Y-%m-%d").date()
+        min_duration = int(request.GET.get("min_duration", "0"))
+    except (KeyError, ValueError):
+        return JsonResponse(
+            {"detail": "Informe threshold (metros), start/end (YYYY-MM-DD) e min_duration em minutos."},
+            status=status.HTTP_400_BAD_REQUEST,
+        ), None
+    try:
+        time_from = _minute_of_day(request.GET["from"]) if request.GET.get("from") else None
+        time_to = _minute_of_day(request.GET["to"]) if request.GET.get("to") else None
+    except ValueError:
+        return JsonResponse({"detail": "from/to inválidos; use HH:MM."}, status=status.HTTP_400_BAD_REQUEST), None
+    if (not math.isfinite(threshold) or end < start or min_duration < 0
+            or (time_from is not None and time_from == time_to)):
+        return JsonResponse({"detail": "Intervalo, limite ou horário inválido."}, status=status.HTTP_400_BAD_REQUEST), None
+    if not in_range(start, end):
+        return JsonResponse(
+            {"detail": f"Datas de {MIN_DATE} a {MAX_DATE}."}, status=status.HTTP_400_BAD_REQUEST
+        ), None
+    if (end - start).days + 1 > WINDOWS_MAX_DAYS:
+        return JsonResponse(
+            {"detail": f"No máximo {WINDOWS_MAX_DAYS} dias por pedido."}, status=status.HTTP_400_BAD_REQUEST
+        ), None
+    return None, {
+        "threshold": threshold, "start": start, "end": end, "mode": mode, "method": method,
+        "time_from": time_from, "time_to": time_to, "min_duration": min_duration,
+    }
+
+
+def _windows_response(query, extremes):
+    mode, threshold = query["mode"], query["threshold"]
+    starts, ends, extremes = windows.search(
+        query["start"], query["end"], threshold, mode, query["time_from"], query["time_to"],
+        query["min_duration"], query["method"], extremes,
+    )
+    label = "min_height" if mode == windows.BELOW else "max_height"
+    results = [
+        {
+            "start": curve.from_local_seconds(round(s / 60) * 60).isoformat(timespec="minutes"),
+            "end": curve.from_local_seconds(round(e / 60) * 60).isoformat(timespec="minutes"),
+            "duration_minutes": round((e - s) / 60),
+            label: round(h, 3),
+        }
+        for s, e, h in zip(
+            starts[:WINDOWS_MAX_RESULTS].tolist(), ends[:WINDOWS_MAX_RESULTS].tolist(),
+            extremes[:WINDOWS_MAX_RESULTS].tolist(),
+        )
+    ]
+    return JsonResponse({
+        "threshold": threshold,
+        "mode": mode,
+        "method": query["method"],
+        "unit": "m",
+        "count": len(starts),
+        "truncated": len(starts) > WINDOWS_MAX_RESULTS,
+        "results": results,
+    })
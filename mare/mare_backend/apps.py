@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MareBackendConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mare_backend'
+
+    def ready(self):
+        from . import signals  # noqa: F401
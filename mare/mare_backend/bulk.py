@@ -0,0 +1,50 @@
+"""Gravação em lote de dias/marés, compartilhada pelos comandos de carga."""
+from django.db.models import Q
+
+from .models import Tide, TideDay, reclassify_days
+
+
+def upsert_days(days: dict, batch_size: int = 500) -> dict:
+    """Grava ``{date: (weekday, [(order, time, altura), ...])}`` com bulk upserts.
+
+    Marés que deixaram de existir num dia (``order`` ausente) são removidas e
+    os dias gravados são reclassificados. Devolve ``{date: id}``. Escritas em
+    lote não disparam ``post_save``: quem chama deve trocar a versão dos dados.
+    """
+    if not days:
+        return {}
+    TideDay.objects.bulk_create(
+        [TideDay(date=d, weekday=weekday, year=d.year, month=d.month) for d, (weekday, _) in sorted(days.items())],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["date"],
+        update_fields=["weekday", "updated_at"],
+    )
+    id_by_date = dict(TideDay.objects.filter(date__in=list(days)).values_list("date", "id"))
+
+    Tide.objects.bulk_create(
+        [
+            Tide(day_id=id_by_date[d], order=order, time=t, height=altura).set_instant(d)
+            for d, (_, tides) in days.items()
+            for order, t, altura in tides
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["day", "order"],
+        update_fields=["time", "height", "at", "updated_at"],
+    )
+    delete_stale_tides(days, id_by_date)
+    reclassify_days(id_by_date.values())
+    return id_by_date
+
+
+def delete_stale_tides(days: dict, id_by_date: dict, batch_size: int = 200):
+    # Marés que sumiram em dias já existentes; em lotes, pois o SQLite limita
+    # a profundidade da expressão (um OR por dia)
+    items = list(days.items())
+    for i in range(0, len(items), batch_size):
+        stale = Q()
+        for d, (_, tides) in items[i:i + batch_size]:
+            stale |= Q(day_id=id_by_date[d]) & ~Q(order__in=[order for order, _, _ in tides])
+        if stale:
+            Tide.objects.filter(stale).delete()
@@ -0,0 +1,172 @@
+"""Pacote de um ano inteiro em colunas, para clientes offline (site legado, app).
+
+Colunas (listas paralelas; "delta" = cada valor é a diferença para o anterior,
+o primeiro é absoluto):
+
+- ``day``: dia do ano (0 = 1º de janeiro), delta, um por dia cadastrado;
+- ``weekday``: rótulo do dia (``TideDay.weekday``), um por dia;
+- ``count``: número de marés do dia;
+- ``order``: ``Tide.order``, uma por maré, na ordem dos dias;
+- ``minute``: minutos desde 1º de janeiro 00:00 (horário local), delta;
+- ``cm``: altura em centímetros, delta (pode ser negativo).
+
+Variante binária (``.bin``, little-endian): cabeçalho ``<4sBHHI`` (``b"MARE"``,
+versão, ano, dias, marés), as colunas ``day``, ``count``, ``order``,
+``minute`` e ``cm`` em varints zigzag e, por fim, os rótulos em UTF-8
+separados por ``"\\n"``.
+
+O pacote de cada ano fica no cache, com gzip e brotli (pacote ``brotli``) já
+prontos, sob uma chave derivada do ``updated_at`` e das contagens dos dias e
+marés do ano: só é refeito quando os dados daquele ano mudam (ou quando
+expira, após ``PAGES_CACHE_TIMEOUT``).
+"""
+import gzip
+import hashlib
+import json
+import struct
+from datetime import MAXYEAR, MINYEAR, date
+
+from django.core.cache import cache
+
+from .cache import cache_key, page_timeout
+from .conditional import range_aggregates
+from .models import Tide, TideDay
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - opcional
+    brotli = None
+
+FORMAT_VERSION = 1
+MAGIC = b"MARE"
+_HEADER = struct.Struct("<4sBHHI")
+_VARINT_COLUMNS = ("day", "count", "order", "minute", "cm")
+
+
+def _deltas(values):
+    previous = 0
+    out = []
+    for v in values:
+        out.append(v - previous)
+        previous = v
+    return out
+
+
+def build_columns(year):
+    """Colunas do ano a partir do banco (duas consultas)."""
+    days = list(TideDay.objects.filter(year=year).order_by("date").values_list("id", "date", "weekday"))
+    tides = {}
+    rows = Tide.objects.filter(year=year).values_list("day_id", "order", "time", "height")
+    for day_id, order, at_time, height in rows:
+        tides.setdefault(day_id, []).append((order, at_time, height))
+    jan1 = date(year, 1, 1).toordinal()
+    day_index, counts, orders, minutes, heights = [], [], [], [], []
+    for day_id, d, _ in days:
+        index = d.toordinal() - jan1
+        day_index.append(index)
+        day_tides = sorted(tides.get(day_id, ()))
+        counts.append(len(day_tides))
+        for order, at_time, height in day_tides:
+            orders.append(order)
+            minutes.append(index * 1440 + at_time.hour * 60 + at_time.minute)
+            heights.append(int(height * 100))
+    return {
+        "v": FORMAT_VERSION,
+        "year": year,
+        "day": _deltas(day_index),
+        "weekday": [w for _, _, w in days],
+        "count": counts,
+        "order": orders,
+        "minute": _deltas(minutes),
+        "cm": _deltas(heights),
+    }
+
+
+def _varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_json(columns):
+    return json.dumps(columns, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_bin(columns):
+    out = bytearray(_HEADER.pack(MAGIC, FORMAT_VERSION, columns["year"], len(columns["day"]), len(columns["order"])))
+    for name in _VARINT_COLUMNS:
+        for v in columns[name]:
+            # zigzag: deltas negativos (alturas) em poucos bytes
+            _varint(v * 2 if v >= 0 else -v * 2 - 1, out)
+    out += "\n".join(columns["weekday"]).encode("utf-8")
+    return bytes(out)
+
+
+def decode_bin(data):
+    """Inverso de ``encode_bin`` (referência para os clientes)."""
+    magic, version, year, n_days, n_tides = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("pacote binário inválido")
+    pos = _HEADER.size
+    columns = {"v": version, "year": year}
+    for name in _VARINT_COLUMNS:
+        values = []
+        for _ in range(n_tides if name in ("order", "minute", "cm") else n_days):
+            shift = value = 0
+            while True:
+                byte = data[pos]
+                pos += 1
+                value |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            values.append(value >> 1 if not value & 1 else -(value >> 1) - 1)
+        columns[name] = values
+    labels = data[pos:].decode("utf-8")
+    columns["weekday"] = labels.split("\n") if n_days else []
+    return columns
+
+
+def _variants(content):
+    variants = {"identity": content, "gzip": gzip.compress(content, 9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(content)
+    return variants
+
+
+def _year_state(year):
+    """Assinatura dos dados do ano; recalculada (uma consulta) a cada versão dos dados."""
+    key = cache_key("bundle-state", year)
+    state = cache.get(key)
+    if state is None:
+        # Como range_validators, mas com o updated_at completo (sem truncar no segundo)
+        agg = range_aggregates(TideDay.objects.filter(year=year))
+        state = hashlib.md5("|".join(str(v) for v in agg.values()).encode("utf-8")).hexdigest()
+        cache.set(key, state, page_timeout())
+    return state
+
+
+def get_bundle(year):
+    """``{"hash", "days", "tides", "json": {codificação: bytes}, "bin": {...}}`` do
+    ano, ou ``None`` se não houver dias cadastrados (ou o ano não couber em ``date``)."""
+    if not MINYEAR <= year <= MAXYEAR:
+        return None
+    key = f"mare:bundle:{year}:{_year_state(year)}"
+    bundle = cache.get(key)
+    if bundle is None:
+        columns = build_columns(year)
+        if not columns["day"]:
+            return None
+        content = encode_json(columns)
+        bundle = {
+            "hash": hashlib.sha256(content).hexdigest()[:16],
+            "days": len(columns["day"]),
+            "tides": len(columns["order"]),
+            "json": _variants(content),
+            "bin": _variants(encode_bin(columns)),
+        }
+        # A chave muda com os dados do ano: as cópias antigas não são mais
+        # lidas, e a expiração as tira do cache
+        cache.set(key, bundle, page_timeout())
+    return bundle
@@ -0,0 +1,58 @@
+"""Versão dos dados de maré usada para compor as chaves de cache.
+
+Qualquer escrita em TideDay/Tide troca a versão (ver ``signals.py``); as
+páginas e fragmentos gravados com a versão antiga simplesmente deixam de ser
+lidos e expiram sozinhos.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DATA_VERSION_KEY = "mare:data_version"
+# Instante (time.time()) da última escrita, para o roteador de réplica
+LAST_WRITE_KEY = "mare:last_write"
+
+
+def _new_version() -> str:
+    # Baseado no relógio para nunca reaproveitar uma versão após o cache ser
+    # esvaziado (reinício do locmem, evicção no Redis, ...)
+    return format(time.time_ns(), "x")
+
+
+def get_data_version() -> str:
+    version = cache.get(DATA_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(DATA_VERSION_KEY, version, None):
+            version = cache.get(DATA_VERSION_KEY, version)
+    return version
+
+
+async def aget_data_version() -> str:
+    version = await cache.aget(DATA_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(DATA_VERSION_KEY, version, None):
+            version = await cache.aget(DATA_VERSION_KEY, version)
+    return version
+
+
+def bump_data_version() -> str:
+    version = _new_version()
+    cache.set_many({DATA_VERSION_KEY: version, LAST_WRITE_KEY: time.time()}, None)
+    return version
+
+
+def cache_key(prefix: str, *parts, version: str | None = None) -> str:
+    if version is None:
+        version = get_data_version()
+    raw = ":".join(str(p) for p in parts)
+    if len(raw) > 64:
+        raw = hashlib.md5(raw.encode("utf-8")).hexdigest()
+    return f"mare:{prefix}:{version}:{raw}"
+
+
+def page_timeout() -> int:
+    return getattr(settings, "PAGES_CACHE_TIMEOUT", 60 * 60 * 24)
@@ -0,0 +1,89 @@
+"""Validadores HTTP (ETag/Last-Modified) a partir do ``updated_at`` dos dados.
+
+Usados pelas páginas e pela API para responder 304 antes de serializar ou
+renderizar qualquer coisa.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from .cache import aget_data_version, cache_key, page_timeout
+
+
+_VALIDATOR_AGGREGATES = {
+    "day_max": Max("updated_at"),
+    "tide_max": Max("tides__updated_at"),
+    "days": Count("id", distinct=True),
+    "tides": Count("tides"),
+}
+
+
+def range_aggregates(days_qs):
+    """Maior ``updated_at`` dos dias e das marés e as contagens, numa consulta."""
+    return days_qs.order_by().aggregate(**_VALIDATOR_AGGREGATES)
+
+
+def range_validators(days_qs, *salt):
+    """Devolve ``(etag, last_modified)`` para um queryset de ``TideDay``.
+
+    ``last_modified`` é o maior ``updated_at`` entre os dias e suas marés (em
+    segundos, como espera ``get_conditional_response``). A ETag também leva as
+    contagens, para que exclusões mudem o validador, e ``salt`` com o que mais
+    influencia a resposta (URL, data de hoje, ...). O resultado fica no cache
+    até a próxima troca de versão dos dados.
+    """
+    days_qs = days_qs.order_by()
+    key = cache_key("validators", _query_key(days_qs), *salt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    validators = _validators(range_aggregates(days_qs), salt)
+    cache.set(key, validators, page_timeout())
+    return validators
+
+
+async def arange_validators(days_qs, *salt):
+    """``range_validators`` para views assíncronas (ORM e cache assíncronos)."""
+    days_qs = days_qs.order_by()
+    key = cache_key("validators", _query_key(days_qs), *salt, version=await aget_data_version())
+    cached = await cache.aget(key)
+    if cached is not None:
+        return cached
+    validators = _validators(await days_qs.aaggregate(**_VALIDATOR_AGGREGATES), salt)
+    await cache.aset(key, validators, page_timeout())
+    return validators
+
+
+def _query_key(days_qs):
+    try:
+        return str(days_qs.query)
+    except EmptyResultSet:
+        # Filtro que nunca casa (ex.: inteiro fora da faixa da coluna)
+        return "empty"
+
+
+def _validators(agg, salt):
+    stamps = [v for v in (agg["day_max"], agg["tide_max"]) if v is not None]
+    newest = max(stamps) if stamps else None
+    last_modified = int(newest.timestamp()) if newest else None
+    # A ETag usa o instante completo: duas escritas no mesmo segundo a mudam
+    raw = "|".join(str(p) for p in (newest, agg["days"], agg["tides"], *salt))
+    etag = quote_etag(hashlib.md5(raw.encode("utf-8")).hexdigest())
+    return etag, last_modified
+
+
+def not_modified(request, etag, last_modified):
+    """Resposta 304 (ou 412) se o cliente já tem a versão atual; senão ``None``."""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response.headers.setdefault("ETag", etag)
+        if last_modified is not None:
+            response.headers.setdefault("Last-Modified", http_date(last_modified))
+    return response
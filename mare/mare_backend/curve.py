@@ -0,0 +1,200 @@
+"""Curva contínua da maré entre os extremos cadastrados (NumPy, vetorizado).
+
+Os modelos guardam só os 3–4 extremos de cada dia. Entre dois extremos
+consecutivos (inclusive atravessando a meia-noite) a altura é interpolada por
+meio cosseno ou pela regra dos doze avos, e todas as consultas de um pedido
+são resolvidas numa única passada com ``searchsorted``.
+
+Os instantes são tratados em segundos "locais" (horário de ``TIME_ZONE``,
+como em ``Tide.time``) contados a partir de 0001-01-01.
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Tide, instant_bounds
+from .store import aget_store, get_store
+
+SECONDS_PER_DAY = 86400
+# Extremos consecutivos ficam a ~6 h um do outro; um intervalo maior indica
+# dias faltando no banco, e a curva não é inventada sobre o buraco
+MAX_SEGMENT_SECONDS = 10 * 3600
+METHODS = ("cosine", "twelfths")
+
+# Fração acumulada da variação ao fim de cada sexto do intervalo: 1, 2, 3, 3, 2, 1 doze avos
+_TWELFTHS_X = np.linspace(0.0, 1.0, 7)
+_TWELFTHS_Y = np.array([0, 1, 3, 6, 9, 11, 12], dtype=float) / 12.0
+
+
+def local_seconds(value):
+    """Converte ``date``/``datetime`` (aware ou não) em segundos locais."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return (value.toordinal() * SECONDS_PER_DAY + value.hour * 3600
+                + value.minute * 60 + value.second + value.microsecond / 1e6)
+    return value.toordinal() * SECONDS_PER_DAY
+
+
+def from_local_seconds(seconds):
+    day, rest = divmod(int(round(seconds)), SECONDS_PER_DAY)
+    return datetime.combine(date.fromordinal(day), datetime.min.time()) + timedelta(seconds=rest)
+
+
+def extremes_between(start, end):
+    """Extremos de ``start - 1 dia`` a ``end + 1 dia`` como arrays ``(segundos, alturas)``.
+
+    A margem de um dia garante o extremo anterior/posterior nas bordas. Usa a
+    store em memória quando ligada (sem cópia: ``np.frombuffer`` sobre os
+    arrays) e o ORM caso contrário.
+    """
+    first, last = start - timedelta(days=1), end + timedelta(days=1)
+    store = get_store()
+    if store is not None:
+        return store_extremes(store, *store.bounds(first, last))
+    return rows_to_arrays(tide_rows(_tides_between(first, last)))
+
+
+async def aextremes_between(start, end):
+    """``extremes_between`` com o ORM assíncrono."""
+    first, last = start - timedelta(days=1), end + timedelta(days=1)
+    store = await aget_store()
+    if store is not None:
+        return store_extremes(store, *store.bounds(first, last))
+    return rows_to_arrays(await atide_rows(_tides_between(first, last)))
+
+
+def _tides_between(first, last):
+    begin, stop = instant_bounds(first, last)
+    return Tide.objects.filter(at__gte=begin, at__lt=stop)
+
+
+def tide_rows(tides):
+    """``[(date, time, altura), ...]`` de um queryset de marés, sem join com TideDay.
+
+    A data local vem de ``at``; o horário, do próprio ``time`` (evita o deslocamento
+    de horários inexistentes na virada do horário de verão).
+    """
+    return _local_rows(_tide_values(tides))
+
+
+async def atide_rows(tides):
+    return _local_rows([row async for row in _tide_values(tides)])
+
+
+def _tide_values(tides):
+    return tides.order_by("at").values_list("at", "time", "height")
+
+
+def _local_rows(values):
+    tz = timezone.get_default_timezone()
+    return [(timezone.localtime(at, tz).date(), t, h) for at, t, h in values]
+
+
+def store_extremes(store, lo, hi, days=None):
+    """Extremos dos dias ``[lo, hi)`` da store; ``days`` (máscara booleana) filtra os dias."""
+    t_lo, t_hi = store.tide_start[lo], store.tide_start[hi]
+    starts = np.frombuffer(store.tide_start, dtype=np.uint32)[lo:hi + 1].astype(np.int64)
+    ordinals = np.frombuffer(store.day_ordinals, dtype=np.int32)[lo:hi].astype(np.int64)
+    counts = np.diff(starts)
+    day_of_tide = np.repeat(ordinals, counts)
+    minutes = np.frombuffer(store.minutes, dtype=np.uint16)[t_lo:t_hi]
+    heights = np.frombuffer(store.heights_cm, dtype=np.int32)[t_lo:t_hi] / 100.0
+    seconds = day_of_tide * SECONDS_PER_DAY + minutes.astype(np.int64) * 60
+    if days is not None:
+        keep = np.repeat(days, counts)
+        seconds, heights = seconds[keep], heights[keep]
+    return _sorted(seconds.astype(np.float64), heights)
+
+
+def rows_to_arrays(rows):
+    """``[(date, time, altura), ...]`` -> ``(segundos, alturas)`` ordenados."""
+    seconds = np.fromiter(
+        (d.toordinal() * SECONDS_PER_DAY + t.hour * 3600 + t.minute * 60 + t.second for d, t, _ in rows),
+        dtype=np.float64, count=len(rows),
+    )
+    heights = np.fromiter((float(h) for _, _, h in rows), dtype=np.float64, count=len(rows))
+    return _sorted(seconds, heights)
+
+
+def _sorted(seconds, heights):
+    # searchsorted exige instantes crescentes; "order" normalmente já garante isso
+    if len(seconds) > 1 and np.any(np.diff(seconds) < 0):
+        order = np.argsort(seconds, kind="stable")
+        return seconds[order], heights[order]
+    return seconds, heights
+
+
+def interpolate(ext_seconds, ext_heights, query_seconds, method="cosine"):
+    """Altura em cada instante de ``query_seconds`` (array), numa passada só.
+
+    Instantes fora do intervalo coberto pelos extremos, ou sobre um buraco nos
+    dados (``MAX_SEGMENT_SECONDS``), resultam em ``nan``.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method deve ser um de {METHODS}")
+    query = np.asarray(query_seconds, dtype=np.float64)
+    out = np.full(query.shape, np.nan)
+    if len(ext_seconds) < 2:
+        return out
+
+    idx = np.searchsorted(ext_seconds, query, side="right") - 1
+    valid = (idx >= 0) & (idx < len(ext_seconds) - 1)
+    i = idx[valid]
+    t0, t1 = ext_seconds[i], ext_seconds[i + 1]
+    h0, h1 = ext_heights[i], ext_heights[i + 1]
+    span = t1 - t0
+    ok = (span > 0) & (span <= MAX_SEGMENT_SECONDS)
+    frac = np.zeros_like(t0)
+    np.divide(query[valid] - t0, span, out=frac, where=ok)
+    if method == "cosine":
+        weight = (1.0 - np.cos(np.pi * frac)) / 2.0
+    else:
+        weight = np.interp(frac, _TWELFTHS_X, _TWELFTHS_Y)
+    values = h0 + (h1 - h0) * weight
+    values[~ok] = np.nan
+    out[valid] = values
+    return out
+
+
+def crossing_fraction(weight, method="cosine"):
+    """Inverso do peso de ``interpolate``: fração do segmento em que a altura
+    percorreu ``weight`` (0..1) da variação entre os dois extremos."""
+    weight = np.clip(weight, 0.0, 1.0)
+    if method == "cosine":
+        return np.arccos(1.0 - 2.0 * weight) / np.pi
+    return np.interp(weight, _TWELFTHS_Y, _TWELFTHS_X)
+
+
+def instant_seconds(instants):
+    """Lista de ``datetime`` -> array de segundos locais."""
+    return np.array([local_seconds(v) for v in instants], dtype=np.float64)
+
+
+def seconds_span(seconds):
+    """Primeira e última data cobertas por um array (não vazio) de segundos locais."""
+    return from_local_seconds(seconds.min()).date(), from_local_seconds(seconds.max()).date()
+
+
+def heights_at(instants, method="cosine", extremes=None):
+    """Alturas para uma lista de ``datetime`` arbitrários.
+
+    ``extremes`` (de ``extremes_between``/``aextremes_between``) evita a leitura.
+    """
+    seconds = instant_seconds(instants)
+    if not len(seconds):
+        return seconds
+    if extremes is None:
+        extremes = extremes_between(*seconds_span(seconds))
+    return interpolate(*extremes, seconds, method)
+
+
+def series(start, end, step_minutes=10, method="cosine", extremes=None):
+    """Série de passo fixo de ``start`` 00:00 até ``end`` 23:59 (datas inclusivas)."""
+    begin = local_seconds(start)
+    stop = local_seconds(end) + SECONDS_PER_DAY
+    query = np.arange(begin, stop, step_minutes * 60, dtype=np.float64)
+    if extremes is None:
+        extremes = extremes_between(start, end)
+    return interpolate(*extremes, query, method)
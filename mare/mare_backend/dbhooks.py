@@ -0,0 +1,44 @@
+"""Ganchos de consulta por requisição que também valem para o ORM assíncrono.
+
+``connection.execute_wrapper`` só vale para o objeto de conexão da thread
+atual, e as conexões do Django são por thread: numa view assíncrona as
+consultas rodam na thread do ``sync_to_async``, com outra conexão. Por isso
+cada conexão recebe, uma vez, um wrapper fixo que repassa a consulta aos
+ganchos guardados numa ``ContextVar``, que o ``sync_to_async`` copia para a
+thread.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_hooks = contextvars.ContextVar("mare_query_hooks", default=())
+
+
+def _run_hooks(execute, sql, params, many, context):
+    for hook in reversed(_hooks.get()):
+        execute = partial(hook, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    if _run_hooks not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_run_hooks)
+
+
+# Conexões abertas depois (novas threads, reconexões)
+connection_created.connect(install)
+
+
+@contextmanager
+def query_hooks(*hooks):
+    """Aplica ``hooks`` (mesma assinatura de ``execute_wrapper``) às consultas do bloco."""
+    for conn in connections.all(initialized_only=True):
+        install(conn)
+    token = _hooks.set(_hooks.get() + hooks)
+    try:
+        yield
+    finally:
+        _hooks.reset(token)
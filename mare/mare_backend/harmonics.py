@@ -0,0 +1,225 @@
+"""Previsão harmônica de marés a partir do histórico cadastrado.
+
+A curva contínua (``mare_backend.curve``) do período de ajuste é amostrada de
+hora em hora e ajustada por mínimos quadrados a
+
+    h(t) = Z0 + Σ f_k(t) · [a_k cos(ω_k t + u_k(t)) + b_k sin(ω_k t + u_k(t))]
+
+onde ω_k é a velocidade de cada constituinte e f/u são as correções nodais
+(ciclo de 18,6 anos do nodo lunar). Só entram constituintes separáveis no
+período disponível (critério de Rayleigh). A previsão avalia o modelo numa
+grade fina, vetorizada no tempo, e extrai os extremos (máximos/mínimos).
+"""
+from datetime import datetime
+
+import numpy as np
+from django.db.models import Max, Min
+
+from . import curve
+from .models import TideDay
+
+# Velocidades angulares em graus/hora, em ordem de prioridade (as primeiras
+# vencem quando duas não são separáveis no período de ajuste)
+CONSTITUENTS = {
+    "M2": 28.9841042,
+    "S2": 30.0000000,
+    "N2": 28.4397295,
+    "K1": 15.0410686,
+    "O1": 13.9430356,
+    "K2": 30.0821373,
+    "P1": 14.9589314,
+    "Q1": 13.3986609,
+    "M4": 57.9682084,
+    "MS4": 58.9841042,
+    "MN4": 57.4238337,
+    "2N2": 27.8953548,
+    "NU2": 28.5125831,
+    "L2": 29.5284789,
+    "MU2": 27.9682084,
+    "M6": 86.9523127,
+    "MF": 1.0980331,
+    "MM": 0.5443747,
+    "SSA": 0.0821373,
+    "SA": 0.0410686,
+}
+
+# Referência de tempo: J2000.0 (2000-01-01 12:00), em segundos locais
+_EPOCH_SECONDS = curve.local_seconds(datetime(2000, 1, 1, 12, 0))
+
+
+def to_hours(local_seconds):
+    return (np.asarray(local_seconds, dtype=np.float64) - _EPOCH_SECONDS) / 3600.0
+
+
+def select_constituents(span_hours, names=None, rayleigh=1.0):
+    """Constituintes resolvíveis em ``span_hours`` pelo critério de Rayleigh."""
+    chosen = []
+    for name in names or CONSTITUENTS:
+        speed = CONSTITUENTS[name]
+        # um ciclo completo e separação de pelo menos ``rayleigh`` ciclo das já escolhidas
+        if speed * span_hours < 360.0 * rayleigh:
+            continue
+        if all(abs(speed - CONSTITUENTS[c]) * span_hours >= 360.0 * rayleigh for c in chosen):
+            chosen.append(name)
+    return chosen
+
+
+def _nodal(name, terms):
+    """Fator ``f`` e fase ``u`` (graus) da correção nodal, a partir de ``_node_terms``."""
+    c1, c2, c3, s1, s2, s3 = terms
+    f_m2 = 1.0004 - 0.0373 * c1 + 0.0002 * c2
+    u_m2 = -2.14 * s1
+    if name in ("M2", "N2", "2N2", "NU2", "MU2", "MS4"):
+        return f_m2, u_m2
+    if name in ("M4", "MN4"):
+        return f_m2 ** 2, 2 * u_m2
+    if name == "M6":
+        return f_m2 ** 3, 3 * u_m2
+    if name == "K1":
+        return (1.0060 + 0.1150 * c1 - 0.0088 * c2 + 0.0006 * c3,
+                -8.86 * s1 + 0.68 * s2 - 0.07 * s3)
+    if name in ("O1", "Q1"):
+        return (1.0089 + 0.1871 * c1 - 0.0147 * c2 + 0.0014 * c3,
+                10.80 * s1 - 1.34 * s2 + 0.19 * s3)
+    if name == "K2":
+        return (1.0241 + 0.2863 * c1 + 0.0083 * c2 - 0.0015 * c3,
+                -17.74 * s1 + 0.68 * s2 - 0.04 * s3)
+    if name == "L2":
+        return (1.0 - 0.0249 * c1, -2.14 * s1)
+    if name == "MF":
+        return (1.043 + 0.414 * c1, -23.74 * s1 + 2.68 * s2 - 0.38 * s3)
+    if name == "MM":
+        return (1.0 - 0.130 * c1, 0.0)
+    return 1.0, 0.0
+
+
+def _node_terms(t_hours):
+    """cos/sin de N, 2N e 3N, com N a longitude do nodo ascendente lunar (Meeus).
+
+    Calculados uma vez por chamada e reaproveitados por todas as constituintes.
+    """
+    centuries = t_hours / (24.0 * 36525.0)
+    node = np.radians(125.04452 - 1934.136261 * centuries)
+    return (np.cos(node), np.cos(2 * node), np.cos(3 * node),
+            np.sin(node), np.sin(2 * node), np.sin(3 * node))
+
+
+def _basis(name, t_hours, terms):
+    f, u = _nodal(name, terms)
+    arg = np.radians(CONSTITUENTS[name] * t_hours + u)
+    return f * np.cos(arg), f * np.sin(arg)
+
+
+class HarmonicModel:
+    def __init__(self, names, mean, cos_coef, sin_coef):
+        self.names = list(names)
+        self.mean = float(mean)
+        self.cos_coef = np.asarray(cos_coef, dtype=np.float64)
+        self.sin_coef = np.asarray(sin_coef, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, t_hours, heights, names=None):
+        """Ajuste por mínimos quadrados; ``names`` padrão = seleção de Rayleigh."""
+        t_hours = np.asarray(t_hours, dtype=np.float64)
+        heights = np.asarray(heights, dtype=np.float64)
+        keep = ~np.isnan(heights)
+        t_hours, heights = t_hours[keep], heights[keep]
+        if len(t_hours) < 2:
+            raise ValueError("Histórico insuficiente para o ajuste harmônico.")
+        if names is None:
+            names = select_constituents(t_hours[-1] - t_hours[0])
+        terms = _node_terms(t_hours)
+        columns = [np.ones_like(t_hours)]
+        for name in names:
+            columns.extend(_basis(name, t_hours, terms))
+        design = np.column_stack(columns)
+        coef, *_ = np.linalg.lstsq(design, heights, rcond=None)
+        return cls(names, coef[0], coef[1::2], coef[2::2])
+
+    @property
+    def amplitudes(self):
+        return dict(zip(self.names, np.hypot(self.cos_coef, self.sin_coef)))
+
+    @property
+    def phases(self):
+        return dict(zip(self.names, np.degrees(np.arctan2(self.sin_coef, self.cos_coef)) % 360))
+
+    def predict(self, t_hours):
+        t_hours = np.asarray(t_hours, dtype=np.float64)
+        terms = _node_terms(t_hours)
+        out = np.full(t_hours.shape, self.mean)
+        # Acumula constituinte a constituinte: memória O(n), sem matriz n×k
+        for name, a, b in zip(self.names, self.cos_coef, self.sin_coef):
+            c, s = _basis(name, t_hours, terms)
+            out += a * c + b * s
+        return out
+
+    def extremes(self, start, end, step_minutes=1.0, min_range=0.1):
+        """Máximos/mínimos de ``start`` 00:00 a ``end`` 23:59 (datas inclusivas).
+
+        Devolve ``(segundos_locais, alturas, é_máximo)``. Cada extremo é
+        refinado por interpolação parabólica sobre a grade; pares de extremos
+        adjacentes com diferença menor que ``min_range`` (oscilações rasas das
+        harmônicas de água rasa) são descartados.
+        """
+        begin = curve.local_seconds(start)
+        stop = curve.local_seconds(end) + curve.SECONDS_PER_DAY
+        step = step_minutes * 60.0
+        # Uma amostra de margem em cada ponta para detectar extremos nas bordas
+        grid = np.arange(begin - step, stop + step, step)
+        h = self.predict(to_hours(grid))
+
+        d = np.diff(h)
+        is_max = (d[:-1] > 0) & (d[1:] <= 0)
+        is_min = (d[:-1] < 0) & (d[1:] >= 0)
+        idx = np.nonzero(is_max | is_min)[0] + 1
+
+        y0, y1, y2 = h[idx - 1], h[idx], h[idx + 1]
+        denom = y0 - 2 * y1 + y2
+        offset = np.zeros_like(y1)
+        np.divide(0.5 * (y0 - y2), denom, out=offset, where=denom != 0)
+        seconds = grid[idx] + offset * step
+        heights = y1 - 0.25 * (y0 - y2) * offset
+        highs = is_max[idx - 1]
+
+        inside = (seconds >= begin) & (seconds < stop)
+        seconds, heights, highs = seconds[inside], heights[inside], highs[inside]
+        return _drop_shallow(seconds, heights, highs, min_range)
+
+
+def _drop_shallow(seconds, heights, highs, min_range):
+    keep = np.ones(len(seconds), dtype=bool)
+    i = 0
+    while i < len(seconds) - 1:
+        if abs(heights[i + 1] - heights[i]) < min_range:
+            keep[i] = keep[i + 1] = False
+            i += 2
+        else:
+            i += 1
+    return seconds[keep], heights[keep], highs[keep]
+
+
+def history_samples(start, end, step_minutes=60):
+    """Amostras horárias da curva histórica, para o ajuste."""
+    begin = curve.local_seconds(start)
+    stop = curve.local_seconds(end) + curve.SECONDS_PER_DAY
+    seconds = np.arange(begin, stop, step_minutes * 60.0)
+    heights = curve.series(start, end, step_minutes)
+    return seconds, heights
+
+
+def group_by_day(seconds, heights):
+    """``{date: [(order, time, altura), ...]}`` a partir dos extremos previstos."""
+    days = {}
+    for s, h in zip(seconds.tolist(), heights.tolist()):
+        moment = curve.from_local_seconds(round(s / 60.0) * 60)
+        tides = days.setdefault(moment.date(), [])
+        tides.append((len(tides) + 1, moment.time(), round(h, 2)))
+    return days
+
+
+def history_bounds():
+    """Primeira e última data com marés cadastradas (``None`` se vazio)."""
+    agg = TideDay.objects.filter(tides__isnull=False).aggregate(first=Min("date"), last=Max("date"))
+    return agg["first"], agg["last"]
+
@@ -1,13 +1,18 @@
+import hashlib
 import json
 import re
+import time as clock
 import unicodedata
 from datetime import date, time
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.db.models import Q
 
-from mare_backend.models import TideDay, Tide
+from mare_backend.bulk import delete_stale_tides, upsert_days
+from mare_backend.cache import bump_data_version
+from mare_backend.models import ImportManifestEntry, TideDay, Tide, reclassify_days
 
 
 def _strip_js_comments(text: str) -> str:
@@ -55,137 +60,314 @@ MONTH_MAP = {
 }
 
 
+def _read_source(path: Path) -> str:
+    try:
+        return path.read_text(encoding="utf-8")
+    except UnicodeDecodeError:
+        return path.read_text(encoding="latin-1")
+
+
+def _collect_month_blocks(raw: str) -> dict:
+    """Separa os blocos ``Janeiro = { ... };`` em texto JSON por mês."""
+    raw = _strip_js_comments(raw)
+    months = {}
+    current_name = None
+    brace_level = 0
+    buf = []
+    for line in raw.splitlines():
+        if current_name is None:
+            m = re.match(r"\s*([A-Za-zÀ-ÿ]+)\s*=\s*\{\s*$", line)
+            if m:
+                current_name = m.group(1)
+                brace_level = 1
+                buf = ["{"]
+            continue
+        else:
+            # inside block
+            brace_level += line.count("{")
+            brace_level -= line.count("}")
+            buf.append(line)
+            if brace_level == 0:
+                # end of month object; remove trailing '};' if present
+                content = "\n".join(buf)
+                content = content.rstrip().rstrip(";")
+                content = _normalize_key_names(content)
+                content = _remove_trailing_commas(content)
+                months[current_name] = content
+                current_name = None
+                buf = []
+    return months
+
+
+def _parse_tide(block):
+    horario = str(block.get("Horario", "")).strip()
+    altura = block.get("Altura")
+    if not horario or len(horario) != 4 or altura is None:
+        return None
+    try:
+        hh = int(horario[0:2])
+        mm = int(horario[2:4])
+        return time(hh, mm), altura
+    except Exception:
+        return None
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _parse_days(months: dict, year: int, warn):
+    """Converte os blocos de mês em ``{date: (weekday, [(order, time, altura), ...])}``.
+
+    Também devolve o hash de cada bloco de mês (``{"AAAA-MM": sha1}``) para o
+    manifesto de importação.
+    """
+    days = {}
+    month_digests = {}
+    for month_name, json_like in months.items():
+        slug = _ascii_slug(month_name)
+        month_num = MONTH_MAP.get(slug)
+        if not month_num:
+            warn(f"Mês ignorado: {month_name}")
+            continue
+        try:
+            data = json.loads(json_like)
+        except json.JSONDecodeError as e:
+            raise CommandError(f"Falha ao decodificar mês {month_name}: {e}")
+        month_digests[f"{year:04d}-{month_num:02d}"] = _digest(data)
+
+        for day_str, payload in data.items():
+            try:
+                day_int = int(day_str)
+            except ValueError:
+                warn(f"Dia inválido: {day_str} em {month_name}")
+                continue
+            d = date(year, month_num, day_int)
+            weekday = str(payload.get("DIA", "")).strip()
+            tides = []
+            for n in (1, 2, 3, 4):
+                key = f"MARE{n}"
+                if key not in payload:
+                    continue
+                parsed = _parse_tide(payload[key])
+                if parsed is not None:
+                    tides.append((n, *parsed))
+            days[d] = (weekday, tides)
+    return days, month_digests
+
+
 class Command(BaseCommand):
     help = "Importa marés a partir de oldProj/banco.js para modelos TideDay/Tide."
 
     def add_arguments(self, parser):
         parser.add_argument(
             "--path",
-            dest="path",
-            default=str(Path("mare") / "mare" / "oldProj" / "banco.js"),
-            help="Caminho para banco.js",
+            dest="paths",
+            action="append",
+            help=(
+                "Caminho para banco.js (padrão: mare/mare/oldProj/banco.js). "
+                "Repita junto com --year para importar vários arquivos; um único "
+                "--path vale para todos os anos."
+            ),
         )
         parser.add_argument(
             "--year",
-            dest="year",
+            dest="years",
             type=int,
+            action="append",
             required=True,
-            help="Ano para aplicar (ex.: 2025)",
+            help="Ano para aplicar (ex.: 2025). Pode ser repetido.",
         )
         parser.add_argument(
             "--truncate",
             action="store_true",
             help="Apaga dados existentes do ano antes de importar",
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas mostra o que seria adicionado/alterado/removido, sem gravar",
+        )
+        parser.add_argument(
+            "--no-bulk",
+            dest="bulk",
+            action="store_false",
+            help="Grava linha a linha (get_or_create/update_or_create) em vez do modo em lote",
+        )
+        parser.add_argument(
+            "--batch-size",
+            dest="batch_size",
+            type=int,
+            default=500,
+            help="Tamanho dos lotes do bulk_create (padrão: 500)",
+        )
 
     def handle(self, *args, **options):
-        path = Path(options["path"]).resolve()
-        year = options["year"]
-        if not path.exists():
-            raise CommandError(f"Arquivo não encontrado: {path}")
+        years = options["years"]
+        paths = options["paths"] or [str(Path("mare") / "mare" / "oldProj" / "banco.js")]
+        if len(paths) == 1:
+            paths = paths * len(years)
+        if len(paths) != len(years):
+            raise CommandError("Informe um único --path ou um --path para cada --year")
 
-        try:
-            raw = path.read_text(encoding="utf-8")
-        except UnicodeDecodeError:
-            raw = path.read_text(encoding="latin-1")
-
-        raw = _strip_js_comments(raw)
-
-        # Collect month blocks like: Janeiro = { ... };
-        months = {}
-        current_name = None
-        brace_level = 0
-        buf = []
-        for line in raw.splitlines():
-            if current_name is None:
-                m = re.match(r"\s*([A-Za-zÀ-ÿ]+)\s*=\s*\{\s*$", line)
-                if m:
-                    current_name = m.group(1)
-                    brace_level = 1
-                    buf = ["{"]
-                continue
-            else:
-                # inside block
-                brace_level += line.count("{")
-                brace_level -= line.count("}")
-                buf.append(line)
-                if brace_level == 0:
-                    # end of month object; remove trailing '};' if present
-                    content = "\n".join(buf)
-                    content = content.rstrip().rstrip(";")
-                    content = _normalize_key_names(content)
-                    content = _remove_trailing_commas(content)
-                    months[current_name] = content
-                    current_name = None
-                    buf = []
-
-        if not months:
-            raise CommandError("Nenhum bloco de mês encontrado em banco.js")
-
-        # Optionally truncate existing data for year
-        if options["truncate"]:
-            Tide.objects.filter(day__date__year=year).delete()
-            TideDay.objects.filter(date__year=year).delete()
+        def warn(msg):
+            self.stderr.write(self.style.WARNING(msg))
 
-        created_days = 0
-        created_tides = 0
+        # Fase 1: lê e interpreta todos os arquivos antes de qualquer escrita
+        t0 = clock.perf_counter()
+        days = {}
+        month_digests = {}
+        for raw_path, year in zip(paths, years):
+            path = Path(raw_path).resolve()
+            if not path.exists():
+                raise CommandError(f"Arquivo não encontrado: {path}")
+            months = _collect_month_blocks(_read_source(path))
+            if not months:
+                raise CommandError(f"Nenhum bloco de mês encontrado em {path}")
+            parsed_days, parsed_months = _parse_days(months, year, warn)
+            days.update(parsed_days)
+            month_digests.update(parsed_months)
+        day_digests = {d.isoformat(): _digest(payload) for d, payload in days.items()}
+        parse_s = clock.perf_counter() - t0
+
+        # Fase 2: compara com o manifesto da última importação
+        diff = self._diff(days, day_digests, month_digests, set(years), options["truncate"])
+        self.stdout.write(
+            f"Adicionados: {len(diff['added'])}, alterados: {len(diff['changed'])}, "
+            f"removidos: {len(diff['removed'])}, inalterados: {diff['unchanged']} "
+            f"(meses inalterados: {diff['months_unchanged']})"
+        )
+        if options["verbosity"] > 1:
+            for label in ("added", "changed", "removed"):
+                for d in sorted(diff[label]):
+                    self.stdout.write(f"  {label}: {d.isoformat()}")
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING("--dry-run: nada foi gravado."))
+            return
+
+        to_write = {d: days[d] for d in diff["added"] | diff["changed"]}
 
+        # Fase 3: escrita apenas do que mudou
+        t1 = clock.perf_counter()
         with transaction.atomic():
-            for month_name, json_like in months.items():
-                slug = _ascii_slug(month_name)
-                month_num = MONTH_MAP.get(slug)
-                if not month_num:
-                    self.stderr.write(self.style.WARNING(f"Mês ignorado: {month_name}"))
-                    continue
-                # Parse JSON
-                try:
-                    data = json.loads(json_like)
-                except json.JSONDecodeError as e:
-                    raise CommandError(f"Falha ao decodificar mês {month_name}: {e}")
-
-                for day_str, payload in data.items():
-                    try:
-                        day_int = int(day_str)
-                    except ValueError:
-                        self.stderr.write(self.style.WARNING(f"Dia inválido: {day_str} em {month_name}"))
-                        continue
-                    d = date(year, month_num, day_int)
-                    weekday = str(payload.get("DIA", "")).strip()
-                    day_obj, day_created = TideDay.objects.get_or_create(
-                        date=d, defaults={"weekday": weekday}
-                    )
-                    if not day_created and weekday and day_obj.weekday != weekday:
-                        day_obj.weekday = weekday
-                        day_obj.save(update_fields=["weekday"])
-                    if day_created:
-                        created_days += 1
-
-                    for n in (1, 2, 3, 4):
-                        key = f"MARE{n}"
-                        if key not in payload:
-                            continue
-                        block = payload[key]
-                        horario = str(block.get("Horario", "")).strip()
-                        altura = block.get("Altura")
-                        if not horario or len(horario) != 4 or altura is None:
-                            continue
-                        try:
-                            hh = int(horario[0:2])
-                            mm = int(horario[2:4])
-                            t = time(hh, mm)
-                        except Exception:
-                            continue
-                        tide_obj, tide_created = Tide.objects.update_or_create(
-                            day=day_obj,
-                            order=n,
-                            defaults={
-                                "time": t,
-                                "height": altura,
-                            },
-                        )
-                        if tide_created:
-                            created_tides += 1
+            # Optionally truncate existing data for each year
+            if options["truncate"]:
+                for year in set(years):
+                    TideDay.objects.filter(date__range=(date(year, 1, 1), date(year, 12, 31))).delete()
+                    ImportManifestEntry.objects.filter(key__startswith=f"{year:04d}-").delete()
+            elif diff["dropped"]:
+                TideDay.objects.filter(date__in=diff["removed"]).delete()
+                ImportManifestEntry.objects.filter(
+                    key__in=[d.isoformat() for d in diff["dropped"]]
+                ).delete()
+
+            if options["bulk"]:
+                stats = self._write_bulk(to_write, options["batch_size"])
+            else:
+                stats = self._write_rows(to_write)
+
+            self._save_manifest(
+                {**month_digests, **{d.isoformat(): day_digests[d.isoformat()] for d in to_write}},
+                source=", ".join(sorted(set(paths))),
+                batch_size=options["batch_size"],
+            )
+        # Escritas em lote não disparam post_save; invalida os caches aqui
+        if to_write or diff["removed"]:
+            transaction.on_commit(bump_data_version)
+        write_s = clock.perf_counter() - t1
 
         self.stdout.write(self.style.SUCCESS(
-            f"Importação concluída. Dias criados: {created_days}, Marés criadas: {created_tides}"
+            "Importação concluída. "
+            + ", ".join(f"{label}: {value}" for label, value in stats.items())
+            + f". Leitura: {parse_s:.3f}s, escrita: {write_s:.3f}s"
         ))
+
+    def _diff(self, days, day_digests, month_digests, years, truncate) -> dict:
+        year_q = Q()
+        for year in years:
+            year_q |= Q(date__range=(date(year, 1, 1), date(year, 12, 31)))
+        existing = set(TideDay.objects.filter(year_q).values_list("date", flat=True))
+
+        manifest = {}
+        if not truncate:
+            manifest_q = Q()
+            for year in years:
+                manifest_q |= Q(key__startswith=f"{year:04d}-")
+            manifest = dict(ImportManifestEntry.objects.filter(manifest_q).values_list("key", "digest"))
+
+        months_unchanged = {
+            key for key, digest in month_digests.items() if manifest.get(key) == digest
+        }
+        # Só some o que uma importação anterior gravou (dias no manifesto): dias
+        # criados pela API, pelo lote ou por prever_mares ficam
+        dropped = {
+            date.fromisoformat(key) for key in manifest if len(key) == 10
+        } - set(days)
+        added, changed = set(), set()
+        unchanged = 0
+        for d in days:
+            key = d.isoformat()
+            if truncate or d not in existing:
+                added.add(d)
+            elif key[:7] in months_unchanged or manifest.get(key) == day_digests[key]:
+                unchanged += 1
+            else:
+                changed.add(d)
+        return {
+            "added": added,
+            "changed": changed,
+            "removed": existing & dropped,
+            "dropped": dropped,
+            "unchanged": unchanged,
+            "months_unchanged": len(months_unchanged),
+        }
+
+    def _save_manifest(self, digests: dict, source: str, batch_size: int):
+        ImportManifestEntry.objects.bulk_create(
+            [ImportManifestEntry(key=key, digest=digest, source=source[:255]) for key, digest in digests.items()],
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["key"],
+            update_fields=["digest", "source", "updated_at"],
+        )
+
+    def _write_bulk(self, days: dict, batch_size: int) -> dict:
+        id_by_date = upsert_days(days, batch_size)
+        return {
+            "Dias gravados": len(id_by_date),
+            "Marés gravadas": sum(len(tides) for _, tides in days.values()),
+        }
+
+    def _write_rows(self, days: dict) -> dict:
+        created_days = 0
+        created_tides = 0
+        touched_day_ids = {}
+        for d, (weekday, tides) in days.items():
+            day_obj, day_created = TideDay.objects.get_or_create(
+                date=d, defaults={"weekday": weekday}
+            )
+            if not day_created and weekday and day_obj.weekday != weekday:
+                day_obj.weekday = weekday
+                day_obj.save(update_fields=["weekday", "updated_at"])
+            if day_created:
+                created_days += 1
+            touched_day_ids[d] = day_obj.pk
+
+            for order, t, altura in tides:
+                _, tide_created = Tide.objects.update_or_create(
+                    day=day_obj,
+                    order=order,
+                    defaults={
+                        "time": t,
+                        "height": altura,
+                    },
+                )
+                if tide_created:
+                    created_tides += 1
+        delete_stale_tides(days, touched_day_ids)
+        # Classificação alta/baixa feita uma vez, na escrita
+        reclassify_days(touched_day_ids.values())
+        return {
+            "Dias criados": created_days,
+            "Marés criadas": created_tides,
+        }
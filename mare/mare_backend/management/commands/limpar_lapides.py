@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mare_backend.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os registros de exclusão (Tombstone) mais antigos que SYNC_TOMBSTONE_DAYS; "
+        "tokens de /api/changes/ anteriores a isso já recebem 410."
+    )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"{deleted} registros de exclusão anteriores a {cutoff:%Y-%m-%d %H:%M} apagados.")
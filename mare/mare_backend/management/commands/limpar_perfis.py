@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mare_backend.profiling import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga as capturas do perfil (ProfileCapture e arquivos em PROFILER_DIR) além das "
+        "PROFILER_KEEP mais recentes ou mais antigas que PROFILER_MAX_AGE_DAYS, e os "
+        "arquivos sem captura."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, help="Capturas mantidas (padrão: PROFILER_KEEP)")
+        parser.add_argument("--days", type=int, help="Idade máxima em dias (padrão: PROFILER_MAX_AGE_DAYS)")
+
+    def handle(self, *args, **options):
+        keep = settings.PROFILER_KEEP if options["keep"] is None else options["keep"]
+        days = settings.PROFILER_MAX_AGE_DAYS if options["days"] is None else options["days"]
+        captures, orphans = prune(max(keep, 0), days)
+        self.stdout.write(f"{captures} capturas e {orphans} arquivos sem captura apagados.")
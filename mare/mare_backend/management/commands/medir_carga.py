@@ -0,0 +1,149 @@
+import asyncio
+import json
+import math
+import time as clock
+from datetime import date
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Mix padrão: páginas e leituras da API (datas relativas ao ano corrente)
+DEFAULT_PATHS = [
+    "/",
+    "/?date={year}-03-02",
+    "/dia/{year}-03-10/",
+    "/calendario/{year}/",
+    "/api/tidedays/?format=json&year={year}&month=3",
+    "/api/curve/?start={year}-03-01&end={year}-03-07&step=10",
+    "/api/windows/?threshold=0.8&start={year}-01-01&end={year}-12-31",
+]
+
+
+async def _read_response(reader):
+    """Lê uma resposta HTTP/1.1; devolve ``(status, keep_alive)``."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get("connection") != "close"
+
+
+async def _client(host, port, paths, offset, deadline, samples, errors):
+    """Uma conexão: pedidos em sequência (keep-alive quando o servidor aceita)."""
+    reader = writer = None
+    i = offset
+    while clock.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        t0 = clock.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode())
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors.append(path)
+            writer = None
+            continue
+        samples.append((path, status, clock.perf_counter() - t0))
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1)]
+
+
+async def run_load(url, paths, concurrency, duration, warmup):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    if warmup:
+        await asyncio.gather(*(
+            _client(host, port, paths, i, clock.perf_counter() + warmup, [], [])
+            for i in range(concurrency)
+        ))
+    samples, errors = [], []
+    t0 = clock.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, paths, i, t0 + duration, samples, errors)
+        for i in range(concurrency)
+    ))
+    elapsed = clock.perf_counter() - t0
+    latencies = sorted(s for _, _, s in samples)
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests": len(samples),
+        "errors": len(errors),
+        "non_2xx": sum(1 for _, status, _ in samples if not 200 <= status < 400),
+        "rps": round(len(samples) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera carga concorrente contra servidores já rodando (ex.: gunicorn WSGI e "
+        "gunicorn+uvicorn ASGI) e compara vazão e latência p99."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", dest="targets", action="append", required=True,
+            help="nome=URL base, ex.: wsgi=http://127.0.0.1:8001 (pode repetir)",
+        )
+        parser.add_argument("--path", dest="paths", action="append", help="Caminho a pedir (pode repetir; padrão: mix de páginas e API)")
+        parser.add_argument("--concurrency", type=int, action="append", help="Conexões simultâneas (pode repetir; padrão: 50)")
+        parser.add_argument("--duration", type=float, default=20.0, help="Segundos de medida por rodada")
+        parser.add_argument("--warmup", type=float, default=3.0, help="Segundos de aquecimento antes de cada rodada")
+        parser.add_argument("--json", dest="json_path", help="Grava os resultados neste arquivo")
+
+    def handle(self, *args, **options):
+        targets = []
+        for raw in options["targets"]:
+            name, sep, url = raw.partition("=")
+            if not sep or urlsplit(url).scheme != "http" or not urlsplit(url).hostname:
+                raise CommandError(f"--target inválido: {raw} (use nome=http://host:porta)")
+            targets.append((name, url.rstrip("/")))
+        year = date.today().year
+        paths = [p.format(year=year) for p in options["paths"] or DEFAULT_PATHS]
+
+        results = []
+        for concurrency in options["concurrency"] or [50]:
+            for name, url in targets:
+                result = asyncio.run(run_load(url, paths, concurrency, options["duration"], options["warmup"]))
+                result["name"] = name
+                results.append(result)
+                self.stdout.write(
+                    f"{name:<8} c={concurrency:<4} {result['rps']:>8.1f} req/s  "
+                    f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  max {result['max_ms']} ms  "
+                    f"({result['requests']} pedidos, {result['errors']} erros, {result['non_2xx']} não-2xx)"
+                )
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as fh:
+                json.dump({"paths": paths, "results": results}, fh, indent=2)
+                fh.write("\n")
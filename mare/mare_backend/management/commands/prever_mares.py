@@ -0,0 +1,164 @@
+import time as clock
+from datetime import date, datetime
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mare_backend import curve
+from mare_backend.bulk import upsert_days
+from mare_backend.cache import bump_data_version
+from mare_backend.harmonics import (
+    HarmonicModel,
+    group_by_day,
+    history_bounds,
+    history_samples,
+    to_hours,
+)
+from mare_backend.models import MAX_DATE, MIN_DATE, TideDay, Tide, in_range, instant_bounds
+
+# Rótulos usados em banco.js (segunda = 0)
+WEEKDAYS_PT = ["SEG", "TER", "QUA", "QUI", "SEX", "SÁB", "DOM"]
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Data inválida: {value} (use YYYY-MM-DD)")
+
+
+class Command(BaseCommand):
+    help = (
+        "Ajusta constituintes harmônicas ao histórico de marés e grava extremos "
+        "previstos em TideDay/Tide para anos ou intervalos futuros."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", dest="years", type=int, action="append", help="Ano a prever (pode repetir)")
+        parser.add_argument("--start", help="Início do intervalo a prever (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Fim do intervalo a prever (YYYY-MM-DD)")
+        parser.add_argument("--fit-start", help="Início do histórico usado no ajuste (padrão: primeiro dia cadastrado)")
+        parser.add_argument("--fit-end", help="Fim do histórico usado no ajuste (padrão: último dia cadastrado)")
+        parser.add_argument(
+            "--step",
+            type=float,
+            default=1.0,
+            help="Passo da grade de previsão em minutos (padrão: 1)",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Sobrescreve dias que já têm marés (por padrão só preenche dias vazios)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Ajusta e prevê, mas não grava")
+        parser.add_argument("--batch-size", type=int, default=500, help="Tamanho dos lotes do bulk_create")
+
+    def handle(self, *args, **options):
+        # Anos inteiros dentro de MIN_DATE..MAX_DATE (date() recusa 0 e 10000)
+        first_year, last_year = MIN_DATE.year + 1, MAX_DATE.year - 1
+        for y in options["years"] or []:
+            if not first_year <= y <= last_year:
+                raise CommandError(f"Ano inválido: {y} (use {first_year} a {last_year})")
+        ranges = [(date(y, 1, 1), date(y, 12, 31)) for y in options["years"] or []]
+        if options["start"] or options["end"]:
+            if not (options["start"] and options["end"]):
+                raise CommandError("Informe --start e --end juntos")
+            ranges.append((_parse_date(options["start"]), _parse_date(options["end"])))
+        if not ranges:
+            raise CommandError("Informe --year ou --start/--end")
+        if any(end < start for start, end in ranges):
+            raise CommandError("--end anterior a --start")
+        if not all(in_range(start, end) for start, end in ranges):
+            raise CommandError(f"Datas de {MIN_DATE} a {MAX_DATE}")
+
+        first, last = history_bounds()
+        fit_start = _parse_date(options["fit_start"]) if options["fit_start"] else first
+        fit_end = _parse_date(options["fit_end"]) if options["fit_end"] else last
+        if fit_start is None or fit_end is None:
+            raise CommandError("Não há marés cadastradas para o ajuste")
+
+        # Ajuste
+        t0 = clock.perf_counter()
+        seconds, heights = history_samples(fit_start, fit_end)
+        try:
+            model = HarmonicModel.fit(to_hours(seconds), heights)
+        except ValueError as e:
+            raise CommandError(str(e))
+        fit_s = clock.perf_counter() - t0
+        self._report_fit(model, seconds, heights, fit_start, fit_end, fit_s)
+
+        # Previsão
+        t1 = clock.perf_counter()
+        days = {}
+        for start, end in ranges:
+            ext_seconds, ext_heights, _ = model.extremes(start, end, step_minutes=options["step"])
+            for d, tides in group_by_day(ext_seconds, ext_heights).items():
+                if start <= d <= end:
+                    days[d] = (WEEKDAYS_PT[d.weekday()], tides)
+        predict_s = clock.perf_counter() - t1
+        n_tides = sum(len(tides) for _, tides in days.values())
+        self.stdout.write(
+            f"Previsão: {len(days)} dias, {n_tides} extremos em {predict_s:.3f}s "
+            f"({len(days) / max(predict_s, 1e-9):,.0f} dias/s, {n_tides / max(predict_s, 1e-9):,.0f} extremos/s)"
+        )
+
+        if not options["overwrite"]:
+            filled = set(
+                TideDay.objects.filter(date__in=list(days), tides__isnull=False)
+                .values_list("date", flat=True)
+            )
+            if filled:
+                self.stdout.write(f"Mantidos {len(filled)} dias já cadastrados (use --overwrite para substituir)")
+            days = {d: payload for d, payload in days.items() if d not in filled}
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.WARNING(f"--dry-run: {len(days)} dias seriam gravados."))
+            return
+
+        t2 = clock.perf_counter()
+        with transaction.atomic():
+            upsert_days(days, options["batch_size"])
+            if days:
+                # bulk_create não dispara post_save
+                transaction.on_commit(bump_data_version)
+        write_s = clock.perf_counter() - t2
+        self.stdout.write(self.style.SUCCESS(
+            f"Gravados {len(days)} dias / {sum(len(t) for _, t in days.values())} marés em {write_s:.3f}s"
+        ))
+
+    def _report_fit(self, model, seconds, heights, fit_start, fit_end, fit_s):
+        valid = ~np.isnan(heights)
+        residual = heights[valid] - model.predict(to_hours(seconds[valid]))
+        self.stdout.write(
+            f"Ajuste {fit_start} a {fit_end}: {valid.sum()} amostras horárias, "
+            f"{len(model.names)} constituintes em {fit_s:.3f}s"
+        )
+        self.stdout.write(f"  nível médio Z0 = {model.mean:.3f} m")
+        for name in model.names:
+            self.stdout.write(f"  {name:>4}: amplitude {model.amplitudes[name]:.3f} m, fase {model.phases[name]:6.1f}°")
+        self.stdout.write(
+            f"  resíduo (curva horária): RMS {np.sqrt(np.mean(residual ** 2)):.3f} m, "
+            f"máx {np.max(np.abs(residual)):.3f} m"
+        )
+
+        # Resíduo nos extremos cadastrados: altura e deslocamento no tempo
+        begin, stop = instant_bounds(fit_start, fit_end)
+        stored = curve.tide_rows(Tide.objects.filter(at__gte=begin, at__lt=stop))
+        if not stored:
+            return
+        stored_s = np.array(
+            [curve.local_seconds(datetime.combine(d, t)) for d, t, _ in stored], dtype=np.float64
+        )
+        stored_h = np.array([float(h) for _, _, h in stored])
+        height_err = stored_h - model.predict(to_hours(stored_s))
+        pred_s, _, _ = model.extremes(fit_start, fit_end)
+        if len(pred_s):
+            idx = np.clip(np.searchsorted(pred_s, stored_s), 1, len(pred_s) - 1)
+            nearest = np.minimum(np.abs(pred_s[idx] - stored_s), np.abs(pred_s[idx - 1] - stored_s))
+            timing = f", erro de horário médio {np.mean(nearest) / 60:.1f} min"
+        else:
+            timing = ""
+        self.stdout.write(
+            f"  resíduo nos {len(stored)} extremos cadastrados: RMS {np.sqrt(np.mean(height_err ** 2)):.3f} m{timing}"
+        )
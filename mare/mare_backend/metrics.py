@@ -0,0 +1,336 @@
+"""Métricas de requisições no formato texto do Prometheus.
+
+``MetricsMiddleware`` registra, por nome de URL resolvido (``index``,
+``calendar_year``, ``tideday-list``, ...), latência, número de consultas e
+tempo de banco (via ``mare_backend.dbhooks``), tempo de renderização de
+templates (backend ``DjangoTemplates`` deste módulo) e tamanho da resposta.
+``metrics_view`` expõe tudo em ``/metrics``, para staff ou com ``METRICS_TOKEN``.
+
+Com vários workers do gunicorn cada processo grava seus números num arquivo
+próprio (``metrics-<pid>.json``) em ``METRICS_MULTIPROC_DIR``, no máximo a
+cada ``METRICS_FLUSH_INTERVAL`` segundos; a coleta soma os arquivos de todos
+os processos. Arquivos de workers já encerrados continuam somando, para que
+os contadores nunca diminuam. Sem diretório, vale só o processo atual.
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from django.template.backends.django import Template as DjangoTemplate
+from django.urls import Resolver404, resolve
+from django.utils.crypto import constant_time_compare
+
+from .dbhooks import query_hooks
+
+# Limites superiores dos buckets (segundos, consultas, bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+# nome: (tipo, ajuda, buckets)
+METRICS = {
+    "mare_http_requests_total": ("counter", "Requisições por view, método e status.", None),
+    "mare_http_request_duration_seconds": ("histogram", "Latência da requisição por view.", LATENCY_BUCKETS),
+    "mare_db_queries": ("histogram", "Consultas SQL por requisição.", QUERY_BUCKETS),
+    "mare_db_duration_seconds": ("histogram", "Tempo de banco por requisição.", LATENCY_BUCKETS),
+    "mare_template_render_seconds": ("histogram", "Tempo de renderização de templates por requisição.", LATENCY_BUCKETS),
+    "mare_http_response_size_bytes": ("histogram", "Tamanho do corpo da resposta.", SIZE_BUCKETS),
+}
+
+UNRESOLVED = "<unresolved>"
+# O método vem do cliente: fora destes vira "other", para não criar séries à vontade
+HTTP_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE", "CONNECT"})
+OTHER_METHOD = "other"
+
+
+class Registry:
+    """Contadores e histogramas do processo, com gravação periódica em arquivo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._dirty = False
+        self._pid = None
+        self._flusher = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [name, list(labels), value if not isinstance(value, dict) else dict(value, buckets=list(value["buckets"]))]
+                for (name, labels), value in self._values.items()
+            ]
+
+    # Multiprocesso
+
+    def start(self):
+        """Inicia a gravação periódica (uma vez por processo, já depois do fork)."""
+        directory = _multiproc_dir()
+        if not directory or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            # Num worker recém-criado, os números herdados do mestre não são dele
+            self._values, self._dirty = {}, False
+        os.makedirs(directory, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self):
+        interval = getattr(settings, "METRICS_FLUSH_INTERVAL", 1.0)
+        while True:
+            time.sleep(interval)
+            self.flush()
+
+    def flush(self):
+        directory = _multiproc_dir()
+        if not directory or not self._dirty:
+            return
+        with self._lock:
+            self._dirty = False
+        path = os.path.join(directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(self.snapshot(), fh)
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Valores somados de todos os processos (ou só deste, sem diretório)."""
+        directory = _multiproc_dir()
+        if not directory:
+            return _merge([self.snapshot()])
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(directory):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(directory, filename), encoding="utf-8") as fh:
+                    snapshots.append(json.load(fh))
+            except (OSError, ValueError):
+                continue
+        return _merge(snapshots)
+
+
+def _multiproc_dir():
+    return getattr(settings, "METRICS_MULTIPROC_DIR", "")
+
+
+def _merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if not isinstance(value, dict):
+                merged[key] = merged.get(key, 0) + value
+                continue
+            state = merged.setdefault(key, {"buckets": [0] * len(value["buckets"]), "sum": 0.0, "count": 0})
+            state["buckets"] = [a + b for a, b in zip(state["buckets"], value["buckets"])]
+            state["sum"] += value["sum"]
+            state["count"] += value["count"]
+    return merged
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+def render_text(values):
+    """Formato de exposição texto 0.0.4 do Prometheus."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == "counter":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            # Buckets já são cumulativos (cada observação conta em todos os limites >= valor)
+            for bound, count in zip(buckets, value["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels + (('le', _number(float(bound))),))} {count}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """``/metrics``; com ``METRICS_TOKEN`` definido exige ``Authorization: Bearer <token>``,
+    senão uma sessão de staff."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        allowed = constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}")
+    else:
+        allowed = request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_text(registry.collect()), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Tempo de template da requisição corrente (None fora de uma requisição medida)
+_render_time = contextvars.ContextVar("mare_render_time", default=None)
+
+
+class _TimedTemplate(DjangoTemplate):
+    def render(self, context=None, request=None):
+        totals = _render_time.get()
+        if totals is None:
+            return super().render(context, request)
+        t0 = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            totals[0] += time.perf_counter() - t0
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """Backend de templates do Django que soma o tempo de render à requisição medida.
+
+    Só o render de topo passa por aqui: includes e ``extends`` usam os templates
+    do engine e não contam duas vezes.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name).template, self)
+
+
+class _QueryTimer:
+    """``execute_wrapper``: conta as consultas e soma o tempo gasto no banco."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - t0
+            self.count += 1
+
+
+@contextmanager
+def _measured():
+    """Mede o bloco: consultas e tempo de banco, tempo de template e duração."""
+    timer = _QueryTimer()
+    state = {"queries": 0, "db_seconds": 0.0}
+    render_token = _render_time.set([0.0])
+    t0 = time.perf_counter()
+    try:
+        with query_hooks(timer):
+            yield state
+    finally:
+        state["elapsed"] = time.perf_counter() - t0
+        state["render_seconds"] = _render_time.get()[0]
+        state["queries"], state["db_seconds"] = timer.count, timer.seconds
+        _render_time.reset(render_token)
+
+
+def _view_name(request):
+    try:
+        return resolve(request.path_info).view_name or UNRESOLVED
+    except Resolver404:
+        return UNRESOLVED
+
+
+class MetricsMiddleware:
+    """Funciona nos dois modos (WSGI e ASGI), sem trocar de thread no assíncrono."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        view = _view_name(request)
+        if view == "metrics":
+            return self.get_response(request)
+        registry.start()
+        with _measured() as state:
+            response = self.get_response(request)
+        _record(request, view, state, response)
+        return response
+
+    async def __acall__(self, request):
+        view = _view_name(request)
+        if view == "metrics":
+            return await self.get_response(request)
+        registry.start()
+        with _measured() as state:
+            response = await self.get_response(request)
+        _record(request, view, state, response)
+        return response
+
+
+def _record(request, view, state, response):
+    labels = {"view": view}
+    method = request.method if request.method in HTTP_METHODS else OTHER_METHOD
+    registry.inc(
+        "mare_http_requests_total",
+        {"view": view, "method": method, "status": str(response.status_code)},
+    )
+    registry.observe("mare_http_request_duration_seconds", labels, state["elapsed"])
+    registry.observe("mare_db_queries", labels, state["queries"])
+    registry.observe("mare_db_duration_seconds", labels, state["db_seconds"])
+    if state["render_seconds"]:
+        registry.observe("mare_template_render_seconds", labels, state["render_seconds"])
+    # Respostas em streaming (exportação) não têm tamanho conhecido
+    if not response.streaming:
+        registry.observe("mare_http_response_size_bytes", labels, len(response.content))
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def classify_existing(apps, schema_editor):
+    Tide = apps.get_model("mare_backend", "Tide")
+    by_day = {}
+    for tide in Tide.objects.order_by("day_id", "order"):
+        by_day.setdefault(tide.day_id, []).append(tide)
+
+    changed = []
+    for tides in by_day.values():
+        if len(tides) < 2:
+            continue
+        for i, tide in enumerate(tides):
+            compare_idx = i + 1 if i + 1 < len(tides) else i - 1
+            tide.kind = "high" if tide.height > tides[compare_idx].height else "low"
+            changed.append(tide)
+    Tide.objects.bulk_update(changed, ["kind"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mare_backend', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tide',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('high', 'Maré Alta'), ('low', 'Maré Baixa')], default='', max_length=4),
+        ),
+        migrations.RunPython(classify_existing, migrations.RunPython.noop),
+    ]
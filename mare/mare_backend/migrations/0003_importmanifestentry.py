@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mare_backend', '0002_tide_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=10, unique=True)),
+                ('digest', models.CharField(max_length=40)),
+                ('source', models.CharField(blank=True, max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['key'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:02
+
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def fill_ranges(apps, schema_editor):
+    TideDay = apps.get_model("mare_backend", "TideDay")
+    days = list(TideDay.objects.annotate(low=Min("tides__height"), high=Max("tides__height")))
+    for day in days:
+        day.min_height, day.max_height = day.low, day.high
+    TideDay.objects.bulk_update(days, ["min_height", "max_height"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mare_backend', '0004_tide_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tideday',
+            name='max_height',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddField(
+            model_name='tideday',
+            name='min_height',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=5, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tideday',
+            index=models.Index(fields=['date', 'min_height'], name='tideday_date_min_height'),
+        ),
+        migrations.AddIndex(
+            model_name='tideday',
+            index=models.Index(fields=['date', 'max_height'], name='tideday_date_max_height'),
+        ),
+        migrations.RunPython(fill_ranges, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:20
+
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_components(apps, schema_editor):
+    TideDay = apps.get_model("mare_backend", "TideDay")
+    Tide = apps.get_model("mare_backend", "Tide")
+    days = list(TideDay.objects.only("date"))
+    for day in days:
+        day.year, day.month = day.date.year, day.date.month
+    TideDay.objects.bulk_update(days, ["year", "month"], batch_size=500)
+
+    tz = timezone.get_default_timezone()
+    tides = list(Tide.objects.select_related("day").only("time", "day__date"))
+    for tide in tides:
+        d = tide.day.date
+        tide.at = timezone.make_aware(datetime.combine(d, tide.time), tz)
+        tide.year, tide.month = d.year, d.month
+    Tide.objects.bulk_update(tides, ["at", "year", "month"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mare_backend', '0005_tideday_height_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tideday',
+            name='year',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tideday',
+            name='month',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tide',
+            name='at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tide',
+            name='year',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tide',
+            name='month',
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_components, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tideday',
+            name='year',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tideday',
+            name='month',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tide',
+            name='at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tide',
+            name='year',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='tide',
+            name='month',
+            field=models.PositiveSmallIntegerField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tideday',
+            index=models.Index(fields=['year', 'month'], name='tideday_year_month'),
+        ),
+        migrations.AddIndex(
+            model_name='tide',
+            index=models.Index(fields=['at'], name='tide_at'),
+        ),
+        migrations.AddIndex(
+            model_name='tide',
+            index=models.Index(fields=['year', 'month', 'at'], name='tide_year_month_at'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mare_backend', '0007_profilecapture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('tideday', 'Dia'), ('tide', 'Maré')], max_length=7)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('day_pk', models.PositiveBigIntegerField()),
+                ('date', models.DateField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tide',
+            index=models.Index(fields=['updated_at'], name='tide_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='tideday',
+            index=models.Index(fields=['updated_at'], name='tideday_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_at'),
+        ),
+    ]
@@ -1,4 +1,88 @@
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+
+
+def classify_heights(heights):
+    """Classifica cada extremo como maré alta/baixa comparando com o vizinho.
+
+    Cada altura é comparada com a próxima do dia (ou com a anterior, no caso da
+    última). Um dia com um único extremo não pode ser classificado.
+    """
+    if len(heights) < 2:
+        return [""] * len(heights)
+    kinds = []
+    for i, h in enumerate(heights):
+        compare_idx = i + 1 if i + 1 < len(heights) else i - 1
+        kinds.append(Tide.HIGH if h > heights[compare_idx] else Tide.LOW)
+    return kinds
+
+
+def tide_instant(day_date, t):
+    """Instante (aware, em ``TIME_ZONE``) de uma maré do dia ``day_date``."""
+    return timezone.make_aware(datetime.combine(day_date, t), timezone.get_default_timezone())
+
+
+def instant_bounds(first, last):
+    """``(início, fim)`` semiaberto, com fuso, cobrindo as marés de ``first`` a ``last``."""
+    return tide_instant(first, time.min), tide_instant(last + timedelta(days=1), time.min)
+
+
+# Datas aceitas nas consultas por instante: a meia-noite seguinte
+# (``instant_bounds``), o fuso e a margem de um dia da curva cabem em ``date``
+MIN_DATE = date.min + timedelta(days=2)
+MAX_DATE = date.max - timedelta(days=2)
+
+
+def in_range(*values):
+    """``True`` se todas as datas (ou ``datetime``) estão entre ``MIN_DATE`` e ``MAX_DATE``."""
+    return all(MIN_DATE <= (v.date() if isinstance(v, datetime) else v) <= MAX_DATE for v in values)
+
+
+def reclassify_days(day_ids):
+    """Recalcula os campos derivados dos dias informados e de suas marés.
+
+    ``Tide.kind``, ``Tide.at``/``year``/``month`` e a faixa
+    ``TideDay.min_height``/``max_height``: uma consulta para os dias, outra
+    para as marés, e ``bulk_update`` apenas do que mudou.
+    """
+    day_ids = list(day_ids)
+    if not day_ids:
+        return 0
+    days = {day.pk: day for day in TideDay.objects.filter(pk__in=day_ids).only("date", "min_height", "max_height")}
+    by_day = {}
+    for tide in Tide.objects.filter(day_id__in=day_ids).order_by("day_id", "order"):
+        by_day.setdefault(tide.day_id, []).append(tide)
+
+    changed = []
+    now = timezone.now()
+    for day_id, tides in by_day.items():
+        day_date = days[day_id].date
+        kinds = classify_heights([t.height for t in tides])
+        for tide, kind in zip(tides, kinds):
+            at = tide_instant(day_date, tide.time)
+            if (tide.kind, tide.at, tide.year, tide.month) != (kind, at, day_date.year, day_date.month):
+                tide.kind, tide.at, tide.year, tide.month = kind, at, day_date.year, day_date.month
+                # bulk_update não aplica auto_now
+                tide.updated_at = now
+                changed.append(tide)
+    if changed:
+        Tide.objects.bulk_update(changed, ["kind", "at", "year", "month", "updated_at"], batch_size=500)
+
+    # Dias sem marés ficam com a faixa vazia (None)
+    ranges = []
+    for day in days.values():
+        heights = [t.height for t in by_day.get(day.pk, [])]
+        low, high = (min(heights), max(heights)) if heights else (None, None)
+        if (day.min_height, day.max_height) != (low, high):
+            day.min_height, day.max_height = low, high
+            ranges.append(day)
+    if ranges:
+        TideDay.objects.bulk_update(ranges, ["min_height", "max_height"], batch_size=500)
+    return len(changed)
 
 
 class TideDay(models.Model):
@@ -6,23 +90,165 @@ class TideDay(models.Model):
     weekday = models.CharField(max_length=10, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Menor/maior altura do dia, mantidas por reclassify_days. Com os índices
+    # (date, min_height)/(date, max_height), a busca de janelas
+    # (mare_backend.windows) descarta anos de dias sem ler nenhuma maré.
+    min_height = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, editable=False)
+    max_height = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, editable=False)
+    # Componentes de ``date`` gravados à parte: filtros por ano/mês viram uma
+    # varredura de índice em vez de django_date_extract() linha a linha
+    year = models.PositiveSmallIntegerField(editable=False)
+    month = models.PositiveSmallIntegerField(editable=False)
 
     class Meta:
         ordering = ["date"]
+        indexes = [
+            models.Index(fields=["date", "min_height"], name="tideday_date_min_height"),
+            models.Index(fields=["date", "max_height"], name="tideday_date_max_height"),
+            models.Index(fields=["year", "month"], name="tideday_year_month"),
+            models.Index(fields=["updated_at"], name="tideday_updated_at"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.date} ({self.weekday})"
 
+    def save(self, *args, **kwargs):
+        self.year, self.month = self.date.year, self.date.month
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "date" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "year", "month"}
+        super().save(*args, **kwargs)
+
+    def classify_tides(self):
+        return reclassify_days([self.pk])
+
 
 class Tide(models.Model):
+    HIGH = "high"
+    LOW = "low"
+    KIND_CHOICES = [
+        (HIGH, "Maré Alta"),
+        (LOW, "Maré Baixa"),
+    ]
+
     day = models.ForeignKey(TideDay, on_delete=models.CASCADE, related_name="tides")
     order = models.PositiveSmallIntegerField()  # 1..4
     time = models.TimeField()
     height = models.DecimalField(max_digits=5, decimal_places=2)
+    # Preenchido na escrita (serializer, importador, admin) via reclassify_days
+    kind = models.CharField(max_length=4, choices=KIND_CHOICES, blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+    # Data do dia + ``time`` num instante com fuso, e ano/mês do dia: consultas
+    # por intervalo de instantes (inclusive atravessando a meia-noite) ou por
+    # mês não precisam de join com TideDay. Mantidos por save() e reclassify_days.
+    at = models.DateTimeField(editable=False)
+    year = models.PositiveSmallIntegerField(editable=False)
+    month = models.PositiveSmallIntegerField(editable=False)
 
     class Meta:
         unique_together = ("day", "order")
         ordering = ["day__date", "order"]
+        indexes = [
+            models.Index(fields=["at"], name="tide_at"),
+            models.Index(fields=["year", "month", "at"], name="tide_year_month_at"),
+            models.Index(fields=["updated_at"], name="tide_updated_at"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.day.date} #{self.order} - {self.time} ({self.height} m)"
+
+    def save(self, *args, **kwargs):
+        self.set_instant(self.day.date)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"day", "time"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "at", "year", "month"}
+        super().save(*args, **kwargs)
+
+    def set_instant(self, day_date):
+        """Preenche ``at``/``year``/``month`` (para ``bulk_create``, que não chama save())."""
+        self.at = tide_instant(day_date, self.time)
+        self.year, self.month = day_date.year, day_date.month
+        return self
+
+    @property
+    def type_label(self):
+        return self.get_kind_display() or None
+
+
+class Tombstone(models.Model):
+    """Registro de um ``TideDay``/``Tide`` excluído, para a sincronização (``/api/changes/``).
+
+    Gravado por ``signals.py`` na mesma transação da exclusão; ``day_pk`` é o
+    dia afetado (o próprio, para ``TideDay``). Removido por ``limpar_lapides``
+    depois de ``SYNC_TOMBSTONE_DAYS``.
+    """
+    TIDEDAY = "tideday"
+    TIDE = "tide"
+    MODEL_CHOICES = [
+        (TIDEDAY, "Dia"),
+        (TIDE, "Maré"),
+    ]
+
+    model = models.CharField(max_length=7, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    day_pk = models.PositiveBigIntegerField()
+    # Só para TideDay: a data do dia excluído
+    date = models.DateField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["deleted_at"]
+        indexes = [
+            models.Index(fields=["deleted_at"], name="tombstone_deleted_at"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.model} {self.object_id} ({self.deleted_at:%Y-%m-%d %H:%M})"
+
+
+class ImportManifestEntry(models.Model):
+    """Hash do conteúdo carregado por ``importar_banco_js``.
+
+    ``key`` é o mês ("AAAA-MM") ou o dia ("AAAA-MM-DD"); reimportações só
+    gravam os dias cujo hash mudou.
+    """
+    key = models.CharField(max_length=10, unique=True)
+    digest = models.CharField(max_length=40)
+    source = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["key"]
+
+    def __str__(self) -> str:
+        return f"{self.key} {self.digest[:8]}"
+
+
+class ProfileCapture(models.Model):
+    """Requisição perfilada sob demanda (``mare_backend.profiling``).
+
+    Os artefatos (``<id>.prof`` do cProfile e ``<id>.json`` com as consultas
+    SQL) ficam em ``PROFILER_DIR``; aqui só o resumo, listado no admin.
+    """
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=100, blank=True)
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    db_ms = models.FloatField()
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    def artifact_path(self, kind):
+        return Path(settings.PROFILER_DIR) / f"{self.pk}.{kind}"
+
+    def delete_artifacts(self):
+        for kind in ("prof", "json"):
+            self.artifact_path(kind).unlink(missing_ok=True)
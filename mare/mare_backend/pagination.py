@@ -0,0 +1,58 @@
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class DateCursorPagination(CursorPagination):
+    """Paginação por cursor (keyset): sem COUNT(*) nem OFFSET.
+
+    O cliente escolhe o tamanho da página com ``?page_size=`` (até
+    ``max_page_size``); páginas profundas custam o mesmo que a primeira.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class TideDayCursorPagination(DateCursorPagination):
+    ordering = "date"
+
+    def paginate_store(self, store, lo, hi, request):
+        """Como ``paginate_queryset``, mas sobre a faixa ``[lo, hi)`` da store em memória.
+
+        Gera os mesmos cursores (posição = data ISO) que a versão via ORM.
+        Devolve ``(dias, link_next, link_previous)``.
+        """
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        start, end = lo, hi
+        if cursor is not None and cursor.position is not None:
+            try:
+                ordinal = date.fromisoformat(cursor.position).toordinal()
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+            if cursor.reverse:
+                end = bisect_left(store.day_ordinals, ordinal, lo, hi)
+            else:
+                start = bisect_right(store.day_ordinals, ordinal, lo, hi)
+        if cursor is not None and cursor.reverse:
+            start = max(start, end - page_size)
+        else:
+            end = min(end, start + page_size)
+
+        days = store.slice(start, end)
+        next_link = previous_link = None
+        if days and end < hi:
+            next_link = self.encode_cursor(Cursor(offset=0, reverse=False, position=days[-1].date.isoformat()))
+        if days and start > lo:
+            previous_link = self.encode_cursor(Cursor(offset=0, reverse=True, position=days[0].date.isoformat()))
+        return days, next_link, previous_link
+
+
+class TideCursorPagination(DateCursorPagination):
+    # day_date é anotado em TideViewSet.queryset (F("day__date")); empates na
+    # mesma data (até 4 marés) são resolvidos pelo offset do cursor
+    ordering = ("day_date", "order")
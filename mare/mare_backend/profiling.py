@@ -0,0 +1,212 @@
+"""Perfil de uma requisição sob demanda, só para usuários staff.
+
+Dispara com o cabeçalho ``X-Profile: 1`` ou o parâmetro ``?_profile=1``. A
+requisição roda sob ``cProfile`` e cada consulta SQL é registrada com tempo,
+parâmetros e a origem no código do projeto. O resultado vira um
+``ProfileCapture`` (listado no admin, com download do ``.prof`` e do
+``.json``); a resposta ganha o cabeçalho ``X-Profile-Id``.
+
+Sem o gatilho, o middleware só confere o cabeçalho e o parâmetro. Ligado por
+padrão só com ``DEBUG``; as capturas são limitadas em número
+(``PROFILER_KEEP``), idade (``PROFILER_MAX_AGE_DAYS``) e consultas detalhadas
+por captura (``PROFILER_MAX_QUERIES``). ``limpar_perfis`` faz a mesma limpeza
+por fora (ex.: cron, ou depois de desligar o perfil).
+"""
+import cProfile
+import io
+import json
+import pstats
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from .dbhooks import query_hooks
+from .models import ProfileCapture
+
+TRIGGER_HEADER = "HTTP_X_PROFILE"
+TRIGGER_PARAM = "_profile"
+# Quadros da pilha guardados por consulta e funções no resumo do cProfile
+STACK_DEPTH = 6
+TOP_FUNCTIONS = 40
+# Middlewares/wrappers de instrumentação não são a origem de nenhuma consulta
+_SKIP_FILES = {Path(__file__).resolve()} | {Path(__file__).resolve().with_name(n) for n in ("metrics.py", "dbhooks.py")}
+
+
+def is_triggered(request):
+    return request.META.get(TRIGGER_HEADER) == "1" or request.GET.get(TRIGGER_PARAM) == "1"
+
+
+class _SqlRecorder:
+    """Gancho de consulta que guarda cada consulta com tempo e origem.
+
+    Conta e soma o tempo de todas, mas só detalha as ``limit`` primeiras.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            self.count += 1
+            self.ms += ms
+            if len(self.queries) < self.limit:
+                self.queries.append({
+                    "db": context["connection"].alias,
+                    "sql": sql,
+                    "params": repr(params)[:500],
+                    "many": many,
+                    "ms": round(ms, 3),
+                    "stack": _origin(),
+                })
+
+
+def _origin():
+    """Últimos quadros da pilha dentro do projeto (fora de site-packages)."""
+    base = str(settings.BASE_DIR)
+    frames = [
+        f"{Path(frame.filename).relative_to(base)}:{frame.lineno} in {frame.name}"
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base)
+        and "site-packages" not in frame.filename
+        and Path(frame.filename).resolve() not in _SKIP_FILES
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+def _top_functions(profiler):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, lineno, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{lineno}({name})",
+            "calls": nc,
+            "primitive_calls": cc,
+            "tottime_ms": round(tt * 1000, 3),
+            "cumtime_ms": round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+class ProfilerMiddleware:
+    """Precisa vir depois de ``AuthenticationMiddleware`` (usa ``request.user``).
+
+    No modo assíncrono o ``cProfile`` cobre o loop de eventos; as consultas do
+    ORM assíncrono rodam em outra thread e aparecem só no relatório de SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not is_triggered(request) or not request.user.is_staff:
+            return self.get_response(request)
+        with _profiled() as run:
+            response = self.get_response(request)
+        return self.save(request, response, *run)
+
+    async def __acall__(self, request):
+        if not is_triggered(request) or not (await request.auser()).is_staff:
+            return await self.get_response(request)
+        with _profiled() as run:
+            response = await self.get_response(request)
+        return await sync_to_async(self.save)(request, response, *run)
+
+    def save(self, request, response, profiler, recorder, duration):
+        queries = recorder.queries
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            view_name = ""
+        # Gravado fora do execute_wrapper: a própria captura não entra no relatório
+        capture = ProfileCapture.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view_name=view_name[:100],
+            status=response.status_code,
+            duration_ms=round(duration[0] * 1000, 3),
+            query_count=recorder.count,
+            db_ms=round(recorder.ms, 3),
+        )
+        directory = Path(settings.PROFILER_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(capture.artifact_path("prof"))
+        with open(capture.artifact_path("json"), "w", encoding="utf-8") as fh:
+            json.dump({
+                "id": capture.pk,
+                "created_at": capture.created_at.isoformat(),
+                "method": capture.method,
+                "path": capture.path,
+                "view_name": capture.view_name,
+                "status": capture.status,
+                "duration_ms": capture.duration_ms,
+                "query_count": capture.query_count,
+                "db_ms": capture.db_ms,
+                "queries": queries,
+                "queries_omitted": recorder.count - len(queries),
+                "functions": _top_functions(profiler),
+            }, fh, indent=2, ensure_ascii=False)
+        prune(settings.PROFILER_KEEP, settings.PROFILER_MAX_AGE_DAYS)
+        response["X-Profile-Id"] = str(capture.pk)
+        return response
+
+
+@contextmanager
+def _profiled():
+    """``cProfile`` e registro de SQL em volta do bloco; produz ``(profiler, recorder, [duração])``."""
+    recorder = _SqlRecorder(settings.PROFILER_MAX_QUERIES)
+    profiler = cProfile.Profile()
+    duration = [0.0]
+    t0 = time.perf_counter()
+    with query_hooks(recorder):
+        profiler.enable()
+        try:
+            yield profiler, recorder, duration
+        finally:
+            profiler.disable()
+            duration[0] = time.perf_counter() - t0
+
+
+def prune(keep, max_age_days=None):
+    """Mantém só as ``keep`` capturas mais recentes, e só as dos últimos
+    ``max_age_days`` dias (registros e arquivos); apaga também arquivos de
+    ``PROFILER_DIR`` sem captura. Devolve ``(capturas, arquivos)`` apagados."""
+    stale = list(ProfileCapture.objects.order_by("-created_at", "-pk")[keep:])
+    if max_age_days is not None:
+        cutoff = timezone.now() - timedelta(days=max_age_days)
+        stale += ProfileCapture.objects.filter(created_at__lt=cutoff).exclude(pk__in=[c.pk for c in stale])
+    for capture in stale:
+        capture.delete_artifacts()
+        capture.delete()
+
+    orphans = 0
+    directory = Path(settings.PROFILER_DIR)
+    if directory.is_dir():
+        known = {str(pk) for pk in ProfileCapture.objects.values_list("pk", flat=True)}
+        for path in directory.iterdir():
+            if path.suffix in (".prof", ".json") and path.stem.isdigit() and path.stem not in known:
+                path.unlink(missing_ok=True)
+                orphans += 1
+    return len(stale), orphans
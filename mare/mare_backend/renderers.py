@@ -0,0 +1,29 @@
+"""``JSONRenderer`` com orjson: mesma saída do renderer do DRF, serializada em C.
+
+orjson já gera JSON compacto em UTF-8 (como ``COMPACT_JSON``/``UNICODE_JSON``);
+datas e ``Decimal`` que não venham como texto passam pelo ``JSONEncoder`` do
+DRF, para sair iguais. Com ``indent`` (``application/json; indent=4``), outras
+opções de JSON do DRF ou dados que o orjson recusa (inteiros de mais de 64 bits)
+usa o renderer original.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact or self.ensure_ascii or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Como o DRF: \u2028 e \u2029 sempre escapados (JSON subconjunto de JavaScript)
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
+        return ret
@@ -0,0 +1,108 @@
+"""Leituras de marés na réplica, escritas no primário.
+
+``ReplicaMiddleware`` decide por requisição: só ``GET``/``HEAD`` podem ler da
+réplica (alias ``replica``), e só os modelos de marés (``TideDay``/``Tide``);
+sessões, usuários, admin e capturas de perfil ficam sempre no primário. Fora
+de uma requisição (comandos, shell, ``--preload``) tudo vai ao primário.
+
+Proteção contra o atraso da réplica (ler logo depois de escrever):
+
+- qualquer escrita nas marés grava o instante em ``LAST_WRITE_KEY`` (ver
+  ``cache.bump_data_version``); por ``REPLICA_PIN_SECONDS`` depois dela todas
+  as leituras vão ao primário, de modo que páginas e a store recarregadas com
+  a versão nova não são preenchidas com dados antigos. Vale entre processos
+  quando o cache é compartilhado (Redis/arquivo);
+- o cliente que escreveu (método não seguro) recebe o cookie ``mare_primary``
+  pelo mesmo tempo e continua lendo do primário, com qualquer cache.
+"""
+import contextlib
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import LAST_WRITE_KEY
+
+REPLICA = "replica"
+PIN_COOKIE = "mare_primary"
+REPLICA_MODELS = {("mare_backend", "tideday"), ("mare_backend", "tide")}
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+_use_replica = contextvars.ContextVar("mare_use_replica", default=False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and (model._meta.app_label, model._meta.model_name) in REPLICA_MODELS:
+            return REPLICA
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mesmos dados nos dois bancos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o esquema pela replicação
+        return db == "default"
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Leituras no primário dentro do bloco, mesmo numa requisição GET."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def _pinned_until(last_write):
+    return (last_write or 0) + settings.REPLICA_PIN_SECONDS
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_replica.set(self.replica_allowed(request, cache.get(LAST_WRITE_KEY)))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.pin_writer(request, response)
+
+    async def __acall__(self, request):
+        token = _use_replica.set(self.replica_allowed(request, await cache.aget(LAST_WRITE_KEY)))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        return self.pin_writer(request, response)
+
+    def replica_allowed(self, request, last_write):
+        return (
+            request.method in _SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and time.time() >= _pinned_until(last_write)
+        )
+
+    def pin_writer(self, request, response):
+        if request.method not in _SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=max(1, round(settings.REPLICA_PIN_SECONDS)),
+                httponly=True, samesite="Lax", secure=request.is_secure(),
+            )
+        return response
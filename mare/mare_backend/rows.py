@@ -0,0 +1,82 @@
+"""Leitura rápida: linhas de ``.values()`` -> dicts no formato dos serializers.
+
+``TideDaySerializer``/``TideSerializer`` montam uma árvore de campos e passam
+cada maré por ``DateField``/``TimeField``/``DecimalField``. Para leitura, as
+funções abaixo são montadas uma vez (a lista de campos com a conversão de
+cada um) e só fazem as conversões que os campos fariam, com a mesma saída:
+
+- ``date``/``time``: ``isoformat()`` (formato ISO 8601 do DRF);
+- ``decimal``: ``format(valor, "f")``, como ``COERCE_DECIMAL_TO_STRING``
+  (o banco já devolve o valor com as casas decimais do campo).
+"""
+from .models import Tide
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _decimal(value):
+    return format(value, "f")
+
+
+_CONVERSIONS = {
+    "raw": None,
+    "date": _isoformat,
+    "time": _isoformat,
+    "decimal": _decimal,
+}
+
+
+def _nullable(convert):
+    return lambda value: None if value is None else convert(value)
+
+
+def row_builder(*fields, nullable=()):
+    """Função ``row -> dict`` para ``fields`` (pares ``(nome, tipo)``) de um ``.values()``.
+
+    Campos em ``nullable`` viram ``None`` quando nulos, como nos serializers.
+    """
+    getters = []
+    for name, kind in fields:
+        convert = _CONVERSIONS[kind]
+        if convert is not None and name in nullable:
+            convert = _nullable(convert)
+        getters.append((name, convert))
+    getters = tuple(getters)
+
+    def build(r):
+        return {name: r[name] if convert is None else convert(r[name]) for name, convert in getters}
+
+    return build
+
+
+# Campos de leitura de TideSerializer e TideDaySerializer (sem "tides", anexado à parte)
+TIDE_FIELDS = (("id", "raw"), ("order", "raw"), ("time", "time"), ("height", "decimal"))
+TIDEDAY_FIELDS = (("id", "raw"), ("date", "date"), ("weekday", "raw"))
+
+tide_row = row_builder(*TIDE_FIELDS)
+tideday_row = row_builder(*TIDEDAY_FIELDS)
+
+
+def field_names(fields):
+    return [name for name, _ in fields]
+
+
+def days_with_tides(day_rows):
+    """Dias (linhas de ``TIDEDAY_FIELDS``) no formato de ``TideDaySerializer``.
+
+    Uma consulta para as marés de todos os dias, como o ``prefetch_related("tides")``.
+    """
+    data = [tideday_row(r) for r in day_rows]
+    by_day = {d["id"]: d for d in data}
+    for d in data:
+        d["tides"] = []
+    tides = (
+        Tide.objects.filter(day_id__in=list(by_day))
+        .order_by("day_id", "order")
+        .values("day_id", *field_names(TIDE_FIELDS))
+    )
+    for t in tides:
+        by_day[t["day_id"]]["tides"].append(tide_row(t))
+    return data
@@ -1,5 +1,90 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import TideDay, Tide
+
+from .cache import bump_data_version
+from .models import TideDay, Tide, reclassify_days
+
+
+class TideListSerializer(serializers.ListSerializer):
+    """Escrita em lote: valida todas as marés juntas e grava com bulk upserts.
+
+    O número de consultas não depende do tamanho do lote.
+    """
+
+    batch_size = 500
+
+    def validate(self, attrs):
+        seen = {}
+        errors = []
+        for i, item in enumerate(attrs):
+            key = (item["day"]["date"], item["order"])
+            if key in seen:
+                errors.append(
+                    f"Item {i}: maré duplicada para {key[0].isoformat()} #{key[1]} (já informada no item {seen[key]})."
+                )
+            seen.setdefault(key, i)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        weekdays = {}
+        for item in validated_data:
+            day_data = item["day"]
+            weekdays.setdefault(day_data["date"], "")
+            if day_data.get("weekday"):
+                weekdays[day_data["date"]] = day_data["weekday"]
+
+        with transaction.atomic():
+            existing = set(
+                Tide.objects.filter(day__date__in=list(weekdays)).values_list("day__date", "order")
+            )
+            # Dias com rótulo informado atualizam o weekday; os demais só são criados
+            labelled = [TideDay(date=d, weekday=w, year=d.year, month=d.month) for d, w in weekdays.items() if w]
+            unlabelled = [TideDay(date=d, weekday="", year=d.year, month=d.month) for d, w in weekdays.items() if not w]
+            if labelled:
+                TideDay.objects.bulk_create(
+                    labelled,
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=["date"],
+                    update_fields=["weekday", "updated_at"],
+                )
+            if unlabelled:
+                TideDay.objects.bulk_create(unlabelled, batch_size=self.batch_size, ignore_conflicts=True)
+            day_ids = dict(TideDay.objects.filter(date__in=list(weekdays)).values_list("date", "id"))
+
+            Tide.objects.bulk_create(
+                [
+                    Tide(
+                        day_id=day_ids[item["day"]["date"]],
+                        order=item["order"],
+                        time=item["time"],
+                        height=item["height"],
+                    ).set_instant(item["day"]["date"])
+                    for item in validated_data
+                ],
+                batch_size=self.batch_size,
+                update_conflicts=True,
+                unique_fields=["day", "order"],
+                update_fields=["time", "height", "at", "updated_at"],
+            )
+            reclassify_days(day_ids.values())
+            # bulk_create não dispara post_save
+            transaction.on_commit(bump_data_version)
+
+            saved = {
+                (t.day_id, t.order): t
+                for t in Tide.objects.filter(day_id__in=list(day_ids.values())).select_related("day")
+            }
+
+        tides = []
+        for item in validated_data:
+            d = item["day"]["date"]
+            tide = saved[(day_ids[d], item["order"])]
+            tide.created = (d, item["order"]) not in existing
+            tides.append(tide)
+        return tides
 
 
 class TideSerializer(serializers.ModelSerializer):
@@ -10,6 +95,7 @@ class TideSerializer(serializers.ModelSerializer):
         model = Tide
         fields = ("id", "order", "time", "height", "date", "weekday")
         read_only_fields = ("id",)
+        list_serializer_class = TideListSerializer
 
     def create(self, validated_data):
         day_data = validated_data.pop("day")
@@ -20,7 +106,7 @@ class TideSerializer(serializers.ModelSerializer):
         day_obj, _ = TideDay.objects.get_or_create(date=date, defaults={"weekday": weekday or ""})
         if weekday and day_obj.weekday != weekday:
             day_obj.weekday = weekday
-            day_obj.save(update_fields=["weekday"])
+            day_obj.save(update_fields=["weekday", "updated_at"])
 
         tide, _ = Tide.objects.update_or_create(
             day=day_obj,
@@ -30,6 +116,12 @@ class TideSerializer(serializers.ModelSerializer):
                 "height": validated_data["height"],
             },
         )
+        day_obj.classify_tides()
+        return tide
+
+    def update(self, instance, validated_data):
+        tide = super().update(instance, validated_data)
+        tide.day.classify_tides()
         return tide
 
 
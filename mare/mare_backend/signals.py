@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_data_version
+from .models import Tide, TideDay, Tombstone
+
+
+@receiver(post_save, sender=TideDay)
+@receiver(post_delete, sender=TideDay)
+@receiver(post_save, sender=Tide)
+@receiver(post_delete, sender=Tide)
+def invalidate_tide_caches(sender, **kwargs):
+    # Só após o commit: evita gravar no cache dados antigos com a versão nova
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(post_delete, sender=TideDay)
+def record_deleted_day(sender, instance, using, **kwargs):
+    # Na mesma transação da exclusão (inclusive as em cascata e via queryset)
+    Tombstone.objects.using(using).create(
+        model=Tombstone.TIDEDAY, object_id=instance.pk, day_pk=instance.pk, date=instance.date
+    )
+
+
+@receiver(post_delete, sender=Tide)
+def record_deleted_tide(sender, instance, using, **kwargs):
+    Tombstone.objects.using(using).create(model=Tombstone.TIDE, object_id=instance.pk, day_pk=instance.day_id)
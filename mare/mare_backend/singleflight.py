@@ -0,0 +1,139 @@
+"""Reconstrução coalescida (single-flight) das páginas caras, com a última cópia boa.
+
+Numa falta de cache (versão nova dos dados, cache vazio depois do deploy) só
+quem pega a trava (``cache.add``, vale entre workers com cache compartilhado)
+reconstrói a página. Os demais servem a última cópia boa daquela URL, com
+``Warning: 110``, ou, se não houver nenhuma, esperam até
+``COALESCE_WAIT_SECONDS`` pela nova antes de reconstruir por conta própria.
+
+A última cópia boa (``STALE_PAGE_TIMEOUT``, sem a versão dos dados na chave)
+também é servida, com ``Warning: 111``, quando o banco falha (``DatabaseError``)
+em qualquer ponto da view (ver ``stale_on_db_error``).
+"""
+import asyncio
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import HttpResponse
+
+from .cache import page_timeout
+
+STALE = '110 - "Response is Stale"'
+REVALIDATION_FAILED = '111 - "Revalidation Failed"'
+# Intervalo entre consultas ao cache de quem espera a reconstrução
+POLL_SECONDS = 0.05
+
+
+def _stale_key(request):
+    return "mare:stale:" + hashlib.md5(request.build_absolute_uri().encode("utf-8")).hexdigest()
+
+
+def _store(key, request, content):
+    cache.set(key, content, page_timeout())
+    cache.set(_stale_key(request), content, settings.STALE_PAGE_TIMEOUT)
+
+
+async def _astore(key, request, content):
+    await cache.aset(key, content, page_timeout())
+    await cache.aset(_stale_key(request), content, settings.STALE_PAGE_TIMEOUT)
+
+
+def get_or_build(key, request, build):
+    """Conteúdo de ``key``; numa falta, ``build()`` (bytes) por um único processo.
+
+    Devolve ``(conteúdo, aviso)``: ``aviso`` é o valor do cabeçalho ``Warning``
+    quando o conteúdo é a última cópia boa, senão ``None``.
+    """
+    content = cache.get(key)
+    if content is not None:
+        return content, None
+    lock = key + ":lock"
+    if not cache.add(lock, 1, settings.COALESCE_LOCK_SECONDS):
+        stale = cache.get(_stale_key(request))
+        if stale is not None:
+            return stale, STALE
+        deadline = time.monotonic() + settings.COALESCE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(POLL_SECONDS)
+            content = cache.get(key)
+            if content is not None:
+                return content, None
+            if cache.get(lock) is None:
+                # Quem reconstruía falhou: tenta aqui
+                break
+        content = build()
+        _store(key, request, content)
+        return content, None
+    try:
+        content = build()
+        _store(key, request, content)
+    finally:
+        cache.delete(lock)
+    return content, None
+
+
+async def aget_or_build(key, request, build):
+    """``get_or_build`` para views assíncronas; ``build`` é uma corrotina."""
+    content = await cache.aget(key)
+    if content is not None:
+        return content, None
+    lock = key + ":lock"
+    if not await cache.aadd(lock, 1, settings.COALESCE_LOCK_SECONDS):
+        stale = await cache.aget(_stale_key(request))
+        if stale is not None:
+            return stale, STALE
+        deadline = time.monotonic() + settings.COALESCE_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            content = await cache.aget(key)
+            if content is not None:
+                return content, None
+            if await cache.aget(lock) is None:
+                break
+        content = await build()
+        await _astore(key, request, content)
+        return content, None
+    try:
+        content = await build()
+        await _astore(key, request, content)
+    finally:
+        await cache.adelete(lock)
+    return content, None
+
+
+def page_response(content, warning):
+    response = HttpResponse(content)
+    if warning:
+        response["Warning"] = warning
+    return response
+
+
+def stale_on_db_error(view):
+    """Com o banco fora do ar, responde a última cópia boa da URL (se houver)."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                return await view(request, *args, **kwargs)
+            except DatabaseError:
+                stale = await cache.aget(_stale_key(request))
+                if stale is None:
+                    raise
+                return page_response(stale, REVALIDATION_FAILED)
+        return wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            stale = cache.get(_stale_key(request))
+            if stale is None:
+                raise
+            return page_response(stale, REVALIDATION_FAILED)
+    return wrapper
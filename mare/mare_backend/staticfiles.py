@@ -0,0 +1,33 @@
+"""WhiteNoise também no modo assíncrono.
+
+O ``WhiteNoiseMiddleware`` original só é síncrono: sob ASGI o Django passaria
+cada requisição por uma thread (e de volta ao loop) só para atravessá-lo. A
+busca do arquivo é um acesso a dicionário, então a versão assíncrona resolve
+os estáticos direto no loop e repassa o resto sem trocar de thread.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,188 @@
+"""Cópia somente-leitura de todas as marés, em arrays compactos na memória.
+
+O conjunto de dados é pequeno (alguns milhares de linhas por ano), então cada
+processo pode mantê-lo inteiro em memória e responder páginas/API sem ir ao
+banco. Com ``gunicorn --preload`` a store é carregada no processo mestre
+(``mare/wsgi.py``) e compartilhada pelos workers via copy-on-write.
+
+Layout (um elemento por dia ou por maré, ordenados por data e ``order``):
+
+- ``day_ordinals``: ``date.toordinal()`` de cada dia, para busca com bisect
+- ``tide_start``: índice da primeira maré de cada dia (mais um sentinela)
+- ``day_min_cm``/``day_max_cm``: faixa de alturas de cada dia (espelho de
+  ``TideDay.min_height``/``max_height``), usada na busca de janelas
+- ``minutes``/``heights_cm``/``kinds``: minuto do dia, altura em centímetros
+  e tipo (1 alta, 0 baixa, -1 sem classificação) de cada maré
+
+A store é recarregada quando a versão dos dados (``mare_backend.cache``) muda.
+"""
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, time
+from decimal import Decimal
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .cache import aget_data_version, get_data_version
+from .models import Tide, TideDay
+
+_KIND_FLAGS = {Tide.HIGH: 1, Tide.LOW: 0, "": -1}
+_KIND_LABELS = dict(Tide.KIND_CHOICES)
+_FLAG_KINDS = {flag: kind for kind, flag in _KIND_FLAGS.items()}
+# Faixa de um dia sem marés: nunca fica abaixo/acima de nenhum limite
+_NO_MIN_CM, _NO_MAX_CM = 2 ** 31 - 1, -(2 ** 31)
+
+
+class StoredTide(NamedTuple):
+    id: int
+    order: int
+    time: time
+    height: Decimal
+    kind: str
+
+    @property
+    def type_label(self):
+        return _KIND_LABELS.get(self.kind)
+
+
+class StoredDay(NamedTuple):
+    id: int
+    date: date
+    weekday: str
+    tides: list
+
+
+class TideStore:
+    def __init__(self, version, day_ids, day_ordinals, weekdays, day_min_cm, day_max_cm,
+                 tide_start, tide_ids, orders, minutes, heights_cm, kinds):
+        self.version = version
+        self.day_ids = day_ids
+        self.day_ordinals = day_ordinals
+        self.weekdays = weekdays
+        self.day_min_cm = day_min_cm
+        self.day_max_cm = day_max_cm
+        self.tide_start = tide_start
+        self.tide_ids = tide_ids
+        self.orders = orders
+        self.minutes = minutes
+        self.heights_cm = heights_cm
+        self.kinds = kinds
+        self._index_by_id = {pk: i for i, pk in enumerate(day_ids)}
+
+    @classmethod
+    def load(cls, version=None):
+        """Lê dias e marés em duas consultas e monta os arrays."""
+        if version is None:
+            version = get_data_version()
+        day_ids, day_ordinals, weekdays = array("q"), array("i"), []
+        day_min_cm, day_max_cm = array("i"), array("i")
+        position = {}
+        for i, (pk, d, weekday, low, high) in enumerate(
+            TideDay.objects.order_by("date").values_list("id", "date", "weekday", "min_height", "max_height")
+        ):
+            day_ids.append(pk)
+            day_ordinals.append(d.toordinal())
+            weekdays.append(weekday)
+            day_min_cm.append(_NO_MIN_CM if low is None else int(low * 100))
+            day_max_cm.append(_NO_MAX_CM if high is None else int(high * 100))
+            position[pk] = i
+
+        counts = [0] * len(day_ids)
+        # order: PositiveSmallIntegerField, até 32767
+        tide_ids, orders, minutes = array("q"), array("H"), array("H")
+        heights_cm, kinds = array("i"), array("b")
+        for pk, day_id, order, t, height, kind in (
+            Tide.objects.order_by("day__date", "order")
+            .values_list("id", "day_id", "order", "time", "height", "kind")
+        ):
+            counts[position[day_id]] += 1
+            tide_ids.append(pk)
+            orders.append(order)
+            minutes.append(t.hour * 60 + t.minute)
+            heights_cm.append(int(height * 100))
+            kinds.append(_KIND_FLAGS.get(kind, -1))
+
+        tide_start = array("I", [0])
+        for n in counts:
+            tide_start.append(tide_start[-1] + n)
+        return cls(version, day_ids, day_ordinals, weekdays, day_min_cm, day_max_cm,
+                   tide_start, tide_ids, orders, minutes, heights_cm, kinds)
+
+    def __len__(self):
+        return len(self.day_ids)
+
+    def _day_at(self, i):
+        tides = []
+        for j in range(self.tide_start[i], self.tide_start[i + 1]):
+            m = self.minutes[j]
+            tides.append(StoredTide(
+                self.tide_ids[j],
+                self.orders[j],
+                time(m // 60, m % 60),
+                Decimal(self.heights_cm[j]).scaleb(-2),
+                _FLAG_KINDS[self.kinds[j]],
+            ))
+        return StoredDay(self.day_ids[i], date.fromordinal(self.day_ordinals[i]), self.weekdays[i], tides)
+
+    def slice(self, lo, hi):
+        """Dias nas posições ``[lo, hi)``, como as devolvidas por ``bounds``."""
+        return [self._day_at(i) for i in range(lo, hi)]
+
+    def day(self, d):
+        i = bisect_left(self.day_ordinals, d.toordinal())
+        if i < len(self.day_ordinals) and self.day_ordinals[i] == d.toordinal():
+            return self._day_at(i)
+        return None
+
+    def by_id(self, pk):
+        i = self._index_by_id.get(pk)
+        return self._day_at(i) if i is not None else None
+
+    def bounds(self, start=None, end=None):
+        """Índices ``[lo, hi)`` dos dias entre ``start`` e ``end`` (inclusivos, opcionais)."""
+        lo = bisect_left(self.day_ordinals, start.toordinal()) if start else 0
+        hi = bisect_right(self.day_ordinals, end.toordinal()) if end else len(self.day_ordinals)
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        return self.slice(*self.bounds(start, end))
+
+    def month(self, year, month):
+        first = date(year, month, 1)
+        last = date(year + month // 12, month % 12 + 1, 1).toordinal() - 1
+        return self.range(first, date.fromordinal(last))
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    """Store do processo, ou ``None`` se ``TIDE_STORE_ENABLED`` estiver desligado.
+
+    Recarrega (uma thread por vez) quando a versão dos dados muda.
+    """
+    global _store
+    if not getattr(settings, "TIDE_STORE_ENABLED", False):
+        return None
+    version = get_data_version()
+    store = _store
+    if store is not None and store.version == version:
+        return store
+    with _lock:
+        if _store is None or _store.version != version:
+            _store = TideStore.load(version)
+        return _store
+
+
+async def aget_store():
+    """``get_store`` para views assíncronas: a recarga (consultas) roda numa thread."""
+    if not getattr(settings, "TIDE_STORE_ENABLED", False):
+        return None
+    store = _store
+    if store is not None and store.version == await aget_data_version():
+        return store
+    return await sync_to_async(get_store)()
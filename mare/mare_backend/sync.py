@@ -0,0 +1,55 @@
+"""Sincronização incremental (``/api/changes/``): dias alterados ou excluídos desde um token.
+
+O token é o instante (``updated_at``/``deleted_at``) até onde o cliente já
+sincronizou, em microssegundos desde 1970 (hex). Um dia entra em ``days`` se
+ele, alguma de suas marés ou uma maré excluída dele mudou depois do token; os
+dias excluídos vêm de ``Tombstone``. Cada parte é uma consulta num índice
+(``updated_at``/``deleted_at``), então o custo acompanha o volume de edições,
+não o histórico.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from . import rows
+from .models import Tide, TideDay, Tombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Ids por consulta (limite de parâmetros do SQLite)
+CHUNK_SIZE = 500
+
+
+def encode_token(moment):
+    return format((moment - EPOCH) // timedelta(microseconds=1), "x")
+
+
+def decode_token(token):
+    """Instante do token; ``ValueError`` se inválido."""
+    micros = int(token, 16)
+    if micros < 0:
+        raise ValueError(token)
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def changes_since(since):
+    """``(dias, removidos)``: dias alterados no formato de ``TideDaySerializer``
+    (por data) e ``[{"id", "date"}]`` dos dias excluídos depois de ``since``."""
+    # order_by(): sem a ordenação padrão (e, em Tide, sem o join com TideDay)
+    day_ids = set(TideDay.objects.filter(updated_at__gt=since).order_by().values_list("id", flat=True))
+    day_ids.update(Tide.objects.filter(updated_at__gt=since).order_by().values_list("day_id", flat=True))
+    removed = []
+    tombstones = (
+        Tombstone.objects.filter(deleted_at__gt=since).order_by().values_list("model", "object_id", "day_pk", "date")
+    )
+    for model, object_id, day_pk, day_date in tombstones:
+        if model == Tombstone.TIDEDAY:
+            removed.append({"id": object_id, "date": day_date.isoformat()})
+        else:
+            # Maré excluída: o dia (se ainda existe) vai inteiro
+            day_ids.add(day_pk)
+
+    ids = sorted(day_ids)
+    fields = rows.field_names(rows.TIDEDAY_FIELDS)
+    days = []
+    for i in range(0, len(ids), CHUNK_SIZE):
+        days.extend(rows.days_with_tides(TideDay.objects.filter(id__in=ids[i:i + CHUNK_SIZE]).values(*fields)))
+    days.sort(key=lambda d: d["date"])
+    return days, sorted(removed, key=lambda d: (d["date"], d["id"]))
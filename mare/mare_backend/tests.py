@@ -1,3 +1,1191 @@
-from django.test import TestCase
+"""Benchmarks das páginas e da API, com orçamento fixo de consultas por view.
 
-# Create your tests here.
+Cada teste semeia anos de marés sintéticas (``upsert_days``, o mesmo caminho
+dos comandos de carga), mede a view com o cache vazio ("frio") e com o cache
+preenchido ("quente") e falha se o número de consultas passar do orçamento,
+que não pode crescer com o volume de dados. Os tempos vão para um relatório
+JSON, comparável entre commits.
+
+Variáveis de ambiente:
+
+- ``MARE_BENCH_YEARS``: anos semeados, terminando no ano corrente (padrão 1)
+- ``MARE_BENCH_ITERATIONS``: repetições por medida (padrão 5)
+- ``MARE_BENCH_REPORT``: caminho do relatório (padrão ``bench-report.json``
+  ao lado de ``manage.py``)
+"""
+import gzip
+import io
+import json
+import math
+import os
+import platform
+import runpy
+import statistics
+import subprocess
+import tempfile
+import time as clock
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .api_views import TideDayViewSet
+from .bulk import upsert_days
+from .cache import bump_data_version
+from .models import ProfileCapture, Tide, TideDay, classify_heights
+from .renderers import ORJSONRenderer
+from .serializers import TideDaySerializer, TideSerializer
+
+BENCH_YEARS = int(os.environ.get("MARE_BENCH_YEARS", "1"))
+BENCH_ITERATIONS = int(os.environ.get("MARE_BENCH_ITERATIONS", "5"))
+BENCH_REPORT = os.environ.get("MARE_BENCH_REPORT") or str(settings.BASE_DIR / "bench-report.json")
+
+WEEKDAYS_PT = ["SEG", "TER", "QUA", "QUI", "SEX", "SÁB", "DOM"]
+# Meio período da M2 (minutos) e ciclo de sizígia/quadratura (dias)
+_HALF_PERIOD = 372.5
+_SPRING_NEAP_DAYS = 14.77
+
+
+def synthetic_days(first, last):
+    """``{date: (weekday, [(order, time, altura), ...])}`` com ~4 extremos por dia.
+
+    Curva semidiurna com modulação de sizígia/quadratura, na faixa de
+    Salinópolis (aprox. 0 a 6 m).
+    """
+    days = {}
+    start = datetime.combine(first, time.min)
+    stop = datetime.combine(last + timedelta(days=1), time.min)
+    n = 0
+    moment = start + timedelta(minutes=97)
+    while moment < stop:
+        elapsed_days = (moment - start).total_seconds() / 86400
+        amplitude = 2.2 + 0.8 * math.cos(2 * math.pi * elapsed_days / _SPRING_NEAP_DAYS)
+        height = Decimal(f"{3.0 + (amplitude if n % 2 else -amplitude):.2f}")
+        weekday, tides = days.setdefault(moment.date(), (WEEKDAYS_PT[moment.weekday()], []))
+        tides.append((len(tides) + 1, moment.time().replace(second=0, microsecond=0), height))
+        moment += timedelta(minutes=_HALF_PERIOD)
+        n += 1
+    return days
+
+
+def _banco_js(directory, days):
+    """Grava um banco.js de janeiro com ``{dia: [(altura, "HHMM"), ...]}``."""
+    blocks = []
+    for day, tides in days.items():
+        mares = ", ".join(
+            f'"MARE{n}": {{ "Altura": {height}, "Horário": "{hhmm}" }}' for n, (height, hhmm) in enumerate(tides, 1)
+        )
+        blocks.append(f'  "{day:02d}": {{ "DIA": "QUA", {mares} }}')
+    path = Path(directory) / "banco.js"
+    path.write_text("Janeiro = {\n" + ",\n".join(blocks) + "\n};\n", encoding="utf-8")
+    return str(path)
+
+
+class TideKindTests(TestCase):
+    def test_classify_heights(self):
+        self.assertEqual(classify_heights([0.5, 4.6, 0.7, 5.0]), ["low", "high", "low", "high"])
+        self.assertEqual(classify_heights([4.6, 0.5, 5.0]), ["high", "low", "high"])
+        self.assertEqual(classify_heights([4.6]), [""])
+
+    def test_writes_store_kind(self):
+        def kinds(day):
+            return list(Tide.objects.filter(day=day).order_by("order").values_list("kind", flat=True))
+
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 3)))
+        for day in TideDay.objects.all():
+            heights = list(Tide.objects.filter(day=day).order_by("order").values_list("height", flat=True))
+            self.assertEqual(kinds(day), classify_heights(heights))
+
+        # Escrita pela API reclassifica o dia inteiro
+        day = TideDay.objects.get(date=date(2025, 1, 2))
+        before = kinds(day)
+        for tide in Tide.objects.filter(day=day):
+            response = self.client.patch(
+                f"/api/tides/{tide.pk}/?format=json", {"height": str(6 - tide.height)}, content_type="application/json"
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(kinds(day), [Tide.HIGH if k == Tide.LOW else Tide.LOW for k in before])
+
+    def test_reads_do_not_grow_with_days(self):
+        def count(url):
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(ctx)
+
+        urls = ("/calendario/2025/", "/api/tidedays/?format=json&year=2025")
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 31)))
+        month = [count(url) for url in urls]
+        upsert_days(synthetic_days(date(2025, 2, 1), date(2025, 12, 31)))
+        self.assertEqual([count(url) for url in urls], month)
+
+
+class DataVersionTests(TestCase):
+    def test_write_bumps_version_on_commit(self):
+        from .cache import get_data_version
+
+        before = get_data_version()
+        self.assertEqual(get_data_version(), before)
+        with self.captureOnCommitCallbacks(execute=True):
+            TideDay.objects.create(date=date(2025, 1, 1), weekday="QUA")
+        self.assertNotEqual(get_data_version(), before)
+
+    def test_gunicorn_refuses_locmem_with_several_workers(self):
+        conf = str(settings.BASE_DIR / "mare" / "gunicorn.conf.py")
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "3"}):
+            os.environ.pop("DJANGO_CACHE_BACKEND", None)
+            with self.assertRaises(SystemExit):
+                runpy.run_path(conf)
+            with mock.patch.dict(os.environ, {"DJANGO_CACHE_BACKEND": "file"}):
+                self.assertEqual(runpy.run_path(conf)["workers"], 3)
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "1", "DJANGO_CACHE_BACKEND": "locmem"}):
+            self.assertEqual(runpy.run_path(conf)["workers"], 1)
+
+
+class MonthGridTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 3, 31)))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_loads_only_the_month_grid(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/", {"date": "2025-02-10"})
+        self.assertEqual(response.status_code, 200)
+        weeks = response.context["month_weeks"]
+        # Fevereiro de 2025, domingo primeiro: de 26/01 a 01/03
+        self.assertEqual((weeks[0][0].date, weeks[-1][-1].date), (date(2025, 1, 26), date(2025, 3, 1)))
+        self.assertTrue(all(cell.has_data and cell.tides for week in weeks for cell in week))
+        self.assertEqual(response.context["weekday"], "SEG")
+        days_sql = [q["sql"] for q in ctx.captured_queries if 'FROM "mare_backend_tideday"' in q["sql"]]
+        self.assertTrue(days_sql)
+        self.assertTrue(all("2025-01-26" in sql and "2025-03-01" in sql for sql in days_sql))
+
+    def test_grids_outside_date_range(self):
+        today = timezone.localdate()
+        for qd in ("9999-12-31", "0001-01-01"):
+            with self.subTest(date=qd):
+                response = self.client.get("/", {"date": qd})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context["date"], today)
+        for year in (1, 9999):
+            with self.subTest(year=year):
+                self.assertEqual(self.client.get(f"/calendario/{year}/").status_code, 404)
+        self.assertEqual(self.client.get("/calendario/9998/").status_code, 200)
+
+
+class BulkImportTests(TestCase):
+    FIELDS = ("day__date", "day__weekday", "order", "time", "height", "kind", "at", "year", "month")
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_import(self, days, *args):
+        path = _banco_js(self.tmp.name, days)
+        with CaptureQueriesContext(connection) as ctx:
+            call_command(
+                "importar_banco_js", "--year", "2025", "--path", path, "--truncate", *args, stdout=io.StringIO()
+            )
+        return len(ctx), sorted(Tide.objects.values_list(*self.FIELDS))
+
+    def test_bulk_matches_row_by_row(self):
+        days = {d: [(0.57, "0246"), (4.61, "0814"), (0.72, "1450"), (5.02, "2030")] for d in range(1, 29)}
+        days[5] = [(4.10, "0900")]
+        bulk_queries, bulk_rows = self.run_import(days)
+        rows_queries, rows = self.run_import(days, "--no-bulk")
+        self.assertEqual(bulk_rows, rows)
+        self.assertEqual(len(rows), 27 * 4 + 1)
+        # Número de consultas fixo no modo em lote, uma ou mais por maré no outro
+        self.assertLess(bulk_queries, 20)
+        self.assertGreater(rows_queries, len(rows))
+
+    def test_stale_tides_are_deleted_in_batches(self):
+        from .bulk import delete_stale_tides
+
+        days = synthetic_days(date(2021, 1, 1), date(2023, 12, 31))
+        id_by_date = upsert_days(days)
+        trimmed = {d: (weekday, tides[:2]) for d, (weekday, tides) in days.items()}
+        # Um OR por dia: sem lotes, o SQLite recusaria a expressão
+        delete_stale_tides(trimmed, id_by_date)
+        self.assertEqual(Tide.objects.count(), 2 * len(days))
+        self.assertFalse(Tide.objects.filter(order__gt=2).exists())
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 31)))
+
+    def test_ndjson_and_csv_stream_the_range(self):
+        expected = Tide.objects.filter(day__date__range=(date(2025, 1, 10), date(2025, 1, 12))).count()
+        params = {"start": "2025-01-10", "end": "2025-01-12"}
+
+        response = self.client.get("/api/export/", params)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), expected)
+        self.assertEqual((lines[0]["date"], lines[0]["order"]), ("2025-01-10", 1))
+        self.assertEqual(lines[-1]["date"], "2025-01-12")
+
+        response = self.client.get("/api/export/", {**params, "format": "csv"})
+        self.assertIn('filename="mares-2025-01-10-2025-01-12.csv"', response["Content-Disposition"])
+        rows = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], "date,weekday,order,time,height,kind")
+        self.assertEqual(len(rows), expected + 1)
+
+        response = self.client.get("/api/export/")
+        self.assertEqual(len(b"".join(response.streaming_content).splitlines()), Tide.objects.count())
+
+    def test_invalid_parameters_are_bad_requests(self):
+        for params in ({"format": "xml"}, {"start": "2025-02-30"}, {"start": "9999-12-31", "end": "9999-12-31"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/export/", params).status_code, 400)
+
+
+class TideBatchTests(TestCase):
+    URL = "/api/tides/batch/?format=json"
+
+    def post(self, items):
+        return self.client.post(self.URL, items, content_type="application/json")
+
+    def items(self, first, last):
+        return [
+            {"date": d.isoformat(), "weekday": weekday, "order": order, "time": t.isoformat(), "height": str(height)}
+            for d, (weekday, tides) in synthetic_days(first, last).items()
+            for order, t, height in tides
+        ]
+
+    def test_creates_then_updates(self):
+        items = self.items(date(2025, 1, 1), date(2025, 1, 3))
+        response = self.post(items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()["created"], response.json()["updated"]), (len(items), 0))
+        self.assertEqual(Tide.objects.count(), len(items))
+        self.assertTrue(all(r["kind"] in (Tide.HIGH, Tide.LOW) for r in response.json()["results"]))
+
+        items[0]["height"] = "9.99"
+        response = self.post(items[:2] + self.items(date(2025, 1, 4), date(2025, 1, 4)))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(response.json()["results"][0]["height"], "9.99")
+        self.assertEqual(response.json()["results"][0]["kind"], Tide.HIGH)
+
+        response = self.post(items[:1])
+        self.assertEqual((response.status_code, response.json()["created"]), (200, 0))
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        # Dentro de um lote do bulk_create (limite de parâmetros do SQLite)
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.items(date(2025, 1, 1), date(2025, 1, 2)))
+        with CaptureQueriesContext(connection) as large:
+            self.post(self.items(date(2025, 2, 1), date(2025, 2, 20)))
+        self.assertEqual(len(large), len(small))
+
+    def test_invalid_batch_writes_nothing(self):
+        items = self.items(date(2025, 1, 1), date(2025, 1, 2))
+        response = self.post(items + [dict(items[0])])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("duplicada", str(response.json()))
+        response = self.post(items + [{**items[0], "order": 9, "height": "abc"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Tide.objects.exists())
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 31)))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_round_trip(self):
+        urls = ("/api/tidedays/?format=json&year=2025", "/api/tides/?format=json&date=2025-01-10", "/calendario/2025/")
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+                self.assertEqual((again.status_code, again.content), (304, b""))
+
+        url = "/api/tidedays/?format=json&year=2025"
+        etag = self.client.get(url)["ETag"]
+        day = TideDay.objects.get(date=date(2025, 1, 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            day.tides.first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_invalid_pk_is_not_found(self):
+        for url in ("/api/tidedays/abc/", "/api/tides/abc/", "/api/tidedays/99999999999999999999999/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {"format": "json"}).status_code, 404)
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 2, 28)))
+
+    def walk(self, url):
+        """Segue os links ``next``; devolve ``(resultados, [consultas por página])``."""
+        results, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url).json()
+            queries.append([q["sql"] for q in ctx.captured_queries])
+            results.extend(data["results"])
+            url = data["next"]
+        return results, queries
+
+    def test_pages_cover_every_row_once(self):
+        days, queries = self.walk("/api/tidedays/?format=json&page_size=7")
+        expected = [d.isoformat() for d in TideDay.objects.order_by("date").values_list("date", flat=True)]
+        self.assertEqual([d["date"] for d in days], expected)
+        self.assertEqual(len(queries), 9)
+        # Keyset: nada de OFFSET, e páginas profundas custam o mesmo que a primeira
+        self.assertFalse(any("OFFSET" in sql for page in queries for sql in page))
+        self.assertEqual(len(set(map(len, queries))), 1)
+
+        # Empates na mesma data (várias marés por dia) resolvidos pelo offset do cursor
+        tides, _ = self.walk("/api/tides/?format=json&page_size=3&year=2025&month=2")
+        self.assertEqual([t["id"] for t in tides], list(Tide.objects.filter(month=2).values_list("id", flat=True)))
+
+    def test_previous_link_and_bad_cursor(self):
+        first = self.client.get("/api/tidedays/?format=json&page_size=10").json()
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(second["results"][0]["date"], "2025-01-11")
+        self.assertEqual(self.client.get(second["previous"]).json()["results"], first["results"])
+        self.assertEqual(self.client.get("/api/tidedays/?format=json&cursor=zzz").status_code, 404)
+
+
+class TideStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 2, 28)))
+        # Um dia sem marés e um com extremo sem classificação
+        TideDay.objects.create(date=date(2025, 3, 2), weekday="DOM")
+        upsert_days({date(2025, 3, 3): ("SEG", [(1, time(4, 10), Decimal("0.35"))])})
+
+    def fetch(self, url, store):
+        cache.clear()
+        with override_settings(TIDE_STORE_ENABLED=store):
+            response = self.client.get(url)
+        if response.get("Content-Type", "").startswith("application/json"):
+            return response.status_code, response.json()
+        return response.status_code, response.content
+
+    def test_store_matches_orm(self):
+        day = TideDay.objects.get(date=date(2025, 2, 10))
+        urls = [
+            "/api/tidedays/?format=json&page_size=7",
+            "/api/tidedays/?format=json&year=2025&month=2",
+            "/api/tidedays/?format=json&start=2025-02-25&end=2025-03-10",
+            "/api/tidedays/?format=json&date=2025-03-03",
+            f"/api/tidedays/{day.pk}/?format=json",
+            "/?date=2025-02-10",
+            "/dia/2025-03-03/",
+            "/calendario/2025/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.fetch(url, True), self.fetch(url, False))
+        for url in ("/api/tidedays/abc/?format=json", "/api/tidedays/99999/?format=json"):
+            with self.subTest(url=url):
+                self.assertEqual((self.fetch(url, True)[0], self.fetch(url, False)[0]), (404, 404))
+
+        # Páginas seguintes (cursores gerados pela store) também batem
+        _, page = self.fetch("/api/tidedays/?format=json&page_size=7", True)
+        for _ in range(3):
+            self.assertEqual(self.fetch(page["next"], True), self.fetch(page["next"], False))
+            _, page = self.fetch(page["next"], True)
+        self.assertEqual(self.fetch(page["previous"], True), self.fetch(page["previous"], False))
+
+    @override_settings(TIDE_STORE_ENABLED=True)
+    def test_store_reloads_after_writes(self):
+        from .store import get_store
+
+        store = get_store()
+        self.assertIs(get_store(), store)
+        self.assertEqual(len(store), TideDay.objects.count())
+        tide = Tide.objects.get(day__date=date(2025, 3, 3))
+        tide.height = Decimal("0.40")
+        with self.captureOnCommitCallbacks(execute=True):
+            tide.save()
+        reloaded = get_store()
+        self.assertIsNot(reloaded, store)
+        self.assertEqual(reloaded.day(date(2025, 3, 3)).tides[0].height, Decimal("0.40"))
+        self.assertEqual(reloaded.day(date(2025, 3, 2)).tides, [])
+
+    def test_large_tide_order(self):
+        # order é PositiveSmallIntegerField: nada garante que caiba num byte
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_days({date(2025, 3, 4): ("TER", [(300, time(5, 0), Decimal("0.50"))])})
+        url = "/api/tidedays/?format=json&date=2025-03-04"
+        status, body = self.fetch(url, True)
+        self.assertEqual(status, 200)
+        self.assertEqual(body, self.fetch(url, False)[1])
+        self.assertEqual(body["results"][0]["tides"][0]["order"], 300)
+
+
+class HarmonicPredictionTests(TestCase):
+    def predict(self, *args):
+        out = io.StringIO()
+        call_command("prever_mares", *args, stdout=out)
+        return out.getvalue()
+
+    def test_prediction_follows_history(self):
+        truth = synthetic_days(date(2025, 1, 1), date(2025, 4, 10))
+        upsert_days({d: payload for d, payload in truth.items() if d.month < 4})
+
+        out = self.predict("--start", "2025-04-01", "--end", "2025-04-10", "--dry-run")
+        self.assertIn("10 dias seriam gravados", out)
+        self.assertFalse(TideDay.objects.filter(date__month=4).exists())
+
+        self.predict("--start", "2025-04-01", "--end", "2025-04-10")
+        for d in (date(2025, 4, 1), date(2025, 4, 5), date(2025, 4, 10)):
+            expected = truth[d][1]
+            predicted = list(Tide.objects.filter(day__date=d).order_by("order").values_list("time", "height", "kind"))
+            self.assertEqual(len(predicted), len(expected))
+            self.assertEqual([kind for _, _, kind in predicted], classify_heights([h for _, h, _ in predicted]))
+            for (_, t, height), (t_pred, h_pred, _) in zip(expected, predicted):
+                minutes = abs((t_pred.hour * 60 + t_pred.minute) - (t.hour * 60 + t.minute))
+                self.assertLess(minutes, 60)
+                self.assertLess(abs(h_pred - height), Decimal("0.75"))
+
+    def test_existing_days_are_kept(self):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 3, 31)))
+        stamps = dict(Tide.objects.filter(day__date__month=3).values_list("id", "updated_at"))
+        self.assertIn("Mantidos 31 dias", self.predict("--start", "2025-03-01", "--end", "2025-04-02"))
+        self.assertEqual(dict(Tide.objects.filter(day__date__month=3).values_list("id", "updated_at")), stamps)
+        self.assertEqual(TideDay.objects.filter(date__month=4).count(), 2)
+
+    def test_invalid_arguments(self):
+        # Sem intervalo, intervalo incompleto ou invertido, e sem histórico para o ajuste
+        cases = ((), ("--start", "2025-04-01"), ("--start", "2025-04-10", "--end", "2025-04-01"), ("--year", "2026"))
+        for args in cases:
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    self.predict(*args)
+
+        # Fora do intervalo de datas: erro claro antes de date() estourar
+        cases = (("--year", "0"), ("--year", "10000"), ("--start", "0001-01-01", "--end", "0001-01-31"))
+        for args in cases:
+            with self.subTest(args=args):
+                with self.assertRaisesRegex(CommandError, r"Ano inválido|Datas de"):
+                    self.predict(*args)
+
+
+class CurveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 31)))
+
+    def test_heights_pass_through_extremes(self):
+        tide = Tide.objects.get(day__date=date(2025, 1, 10), order=2)
+        at = f"2025-01-10T{tide.time:%H:%M}"
+        response = self.client.get("/api/curve/", {"at": at})
+        self.assertEqual(response.json()["results"], [{"at": at, "height": float(tide.height)}])
+        series = self.client.get("/api/curve/", {"start": "2025-01-10", "end": "2025-01-10", "step": 60}).json()
+        self.assertEqual(len(series["heights"]), 24)
+
+    def test_invalid_or_out_of_range_dates_are_bad_requests(self):
+        for params in (
+            {"at": "2025-02-30T10:00"},
+            {"at": "0001-01-01T00:00"},
+            {"start": "9999-12-31", "end": "9999-12-31"},
+            {"start": "2025-01-10", "end": "2025-01-09"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/curve/", params).status_code, 400)
+
+
+class WindowSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 1, 31)))
+
+    def test_windows_stay_below_threshold(self):
+        params = {"threshold": "2.0", "start": "2025-01-05", "end": "2025-01-10"}
+        data = self.client.get("/api/windows/", params).json()
+        self.assertGreater(data["count"], 0)
+        for window in data["results"]:
+            self.assertLess(window["min_height"], 2.0)
+            self.assertGreater(window["duration_minutes"], 0)
+
+    def test_non_finite_threshold_and_out_of_range_dates_are_bad_requests(self):
+        for params in (
+            {"threshold": "inf", "start": "2025-01-05", "end": "2025-01-10"},
+            {"threshold": "nan", "start": "2025-01-05", "end": "2025-01-10"},
+            {"threshold": "1", "start": "9999-12-30", "end": "9999-12-31"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get("/api/windows/", params).status_code, 400)
+
+
+class ImportManifestTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_import(self, days, *args):
+        out = io.StringIO()
+        call_command("importar_banco_js", "--year", "2025", "--path", _banco_js(self.tmp.name, days), *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_changed_days_are_written(self):
+        days = {1: [(0.57, "0246"), (4.61, "0814")], 2: [(0.59, "0321"), (4.61, "0853")], 3: [(0.58, "0353")]}
+        self.assertIn("Adicionados: 3, alterados: 0, removidos: 0, inalterados: 0", self.run_import(days))
+        stamps = dict(TideDay.objects.values_list("date", "updated_at"))
+
+        self.assertIn("Adicionados: 0, alterados: 0, removidos: 0, inalterados: 3", self.run_import(days))
+        self.assertEqual(dict(TideDay.objects.values_list("date", "updated_at")), stamps)
+
+        changed = {1: days[1], 2: [(0.59, "0321")], 4: [(0.60, "0420")]}
+        summary = "Adicionados: 1, alterados: 1, removidos: 1, inalterados: 1"
+        self.assertIn(summary, self.run_import(changed, "--dry-run"))
+        self.assertEqual(TideDay.objects.count(), 3)
+        self.run_import(changed)
+        self.assertEqual(
+            sorted(Tide.objects.values_list("day__date__day", "order")), [(1, 1), (1, 2), (2, 1), (4, 1)]
+        )
+        self.assertEqual(TideDay.objects.get(date=date(2025, 1, 1)).updated_at, stamps[date(2025, 1, 1)])
+
+    def test_days_written_elsewhere_survive(self):
+        days = {1: [(0.57, "0246"), (4.61, "0814")], 2: [(0.59, "0321"), (4.61, "0853")]}
+        self.run_import(days)
+        # Dias gravados pela API e por prever_mares, no mesmo ano do arquivo
+        response = self.client.post(
+            "/api/tides/batch/?format=json",
+            [{"date": "2025-01-20", "order": 1, "time": "05:10", "height": "0.61"}],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        upsert_days(synthetic_days(date(2025, 6, 1), date(2025, 6, 30)))
+
+        self.assertIn("removidos: 1", self.run_import({1: days[1]}))
+        self.assertFalse(TideDay.objects.filter(date=date(2025, 1, 2)).exists())
+        self.assertTrue(TideDay.objects.filter(date=date(2025, 1, 20)).exists())
+        self.assertEqual(TideDay.objects.filter(date__month=6).count(), 30)
+
+
+class DenormalizedDateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 2, 28)))
+
+    def test_fields_follow_writes(self):
+        tz = timezone.get_default_timezone()
+        for tide in Tide.objects.select_related("day"):
+            self.assertEqual(timezone.localtime(tide.at, tz).date(), tide.day.date)
+            self.assertEqual(timezone.localtime(tide.at, tz).time(), tide.time)
+            self.assertEqual((tide.year, tide.month), (tide.day.year, tide.day.month))
+
+        tide = Tide.objects.get(day__date=date(2025, 1, 31), order=1)
+        tide.time = time(23, 50)
+        tide.save(update_fields=["time"])
+        tide.refresh_from_db()
+        self.assertEqual(timezone.localtime(tide.at, tz), datetime(2025, 1, 31, 23, 50, tzinfo=tz))
+
+        day = TideDay.objects.create(date=date(2025, 3, 1), weekday="SÁB")
+        day.date = date(2026, 4, 1)
+        day.save(update_fields=["date"])
+        day.refresh_from_db()
+        self.assertEqual((day.year, day.month), (2026, 4))
+
+    def test_period_and_instant_filters(self):
+        data = self.client.get("/api/tides/", {"format": "json", "year": 2025, "month": 2, "page_size": 500}).json()
+        self.assertEqual(
+            [t["id"] for t in data["results"]],
+            list(Tide.objects.filter(day__date__month=2).order_by("day__date", "order").values_list("id", flat=True)),
+        )
+        # Atravessando a meia-noite, pelo instante
+        params = {"format": "json", "after": "2025-01-10T18:00", "before": "2025-01-11T06:00"}
+        tides = self.client.get("/api/tides/", params).json()["results"]
+        begin = timezone.make_aware(datetime(2025, 1, 10, 18))
+        stop = timezone.make_aware(datetime(2025, 1, 11, 6))
+        self.assertEqual(
+            [t["id"] for t in tides], list(Tide.objects.filter(at__gte=begin, at__lt=stop).values_list("id", flat=True))
+        )
+
+    def test_dates_outside_range_are_not_errors(self):
+        for url, count in (
+            ("/api/tides/?format=json&date=9999-12-31", 0),
+            ("/api/tides/?format=json&after=9999-12-31T23:00-05:00", 0),
+            ("/api/tides/?format=json&before=0001-01-01T00:00%2B05:00", 0),
+            ("/api/tides/?format=json&year=9999&month=12", 0),
+            ("/api/tidedays/?format=json&year=9999&month=12", 0),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual((response.status_code, len(response.json()["results"])), (200, count))
+        # Um filtro inválido é recusado, nunca ignorado (o que devolveria a tabela inteira)
+        for params in ("year=99999999999999999999999", "year=0", "year=2025&month=13", "year=2025&month=0",
+                       "year=abc", "month=2"):
+            for url in (f"/api/tides/?format=json&{params}", f"/api/tidedays/?format=json&{params}"):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 400)
+                    with override_settings(TIDE_STORE_ENABLED=True):
+                        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get("/dia/9999-12-31/").context["date"], timezone.localdate())
+
+
+class EndpointBenchmarkTests(TestCase):
+    # Medidas de todos os testes; viram o relatório ao fim da classe
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        first = date(cls.today.year - BENCH_YEARS + 1, 1, 1)
+        last = date(cls.today.year, 12, 31)
+        t0 = clock.perf_counter()
+        upsert_days(synthetic_days(first, last))
+        cls.seed_seconds = clock.perf_counter() - t0
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.results:
+            write_report(cls.results, cls.seed_seconds)
+
+    def setUp(self):
+        cache.clear()
+
+    def measure(self, name, url, cold_budget, warm_budget, **extra):
+        """Mede ``url`` frio e quente e confere o orçamento de consultas."""
+        cold = [self._request(url, clear=True) for _ in range(BENCH_ITERATIONS)]
+        warm = [self._request(url, clear=False) for _ in range(BENCH_ITERATIONS)]
+        cold_queries = max(q for _, q, _ in cold)
+        warm_queries = max(q for _, q, _ in warm)
+        self.results.append({
+            "name": name,
+            "url": url,
+            "bytes": cold[0][2],
+            "cold": _summary(cold, cold_budget),
+            "warm": _summary(warm, warm_budget),
+            **extra,
+        })
+        self.assertLessEqual(cold_queries, cold_budget, f"{name}: {cold_queries} consultas (cache frio)")
+        self.assertLessEqual(warm_queries, warm_budget, f"{name}: {warm_queries} consultas (cache quente)")
+
+    def _request(self, url, clear):
+        if clear:
+            cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            t0 = clock.perf_counter()
+            response = self.client.get(url)
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+            elapsed = clock.perf_counter() - t0
+        self.assertEqual(response.status_code, 200, url)
+        return elapsed, len(queries), len(content)
+
+    def test_seeded_range(self):
+        self.assertEqual(TideDay.objects.count(), sum(
+            (date(y, 12, 31) - date(y, 1, 1)).days + 1
+            for y in range(self.today.year - BENCH_YEARS + 1, self.today.year + 1)
+        ))
+        self.assertFalse(Tide.objects.filter(kind="").exists())
+
+    def test_index(self):
+        self.measure("index", "/", 3, 2)
+
+    def test_index_selected_date(self):
+        self.measure("index_date", f"/?date={self.today.replace(day=1).isoformat()}", 3, 2)
+
+    def test_calendar_year(self):
+        # Página inteira em cache: nenhuma consulta no acerto
+        self.measure("calendar_year", f"/calendario/{self.today.year}/", 3, 0)
+
+    def test_day_detail(self):
+        d = self.today
+        self.measure("day_detail", f"/dia/{d.year}-{d.month:02d}-{d.day:02d}/", 3, 0)
+
+    def test_api_tidedays(self):
+        self.measure("api_tidedays", "/api/tidedays/?format=json", 3, 2)
+
+    def test_api_tidedays_year(self):
+        self.measure(
+            "api_tidedays_year", f"/api/tidedays/?format=json&year={self.today.year}&page_size=500", 3, 2
+        )
+
+    def test_api_tides(self):
+        self.measure("api_tides", "/api/tides/?format=json&page_size=500", 2, 1)
+
+    def test_api_tides_month(self):
+        self.measure("api_tides_month", f"/api/tides/?format=json&year={self.today.year}&month=1", 2, 1)
+
+    @override_settings(TIDE_STORE_ENABLED=True)
+    def test_store_backed(self):
+        # Cache frio = versão nova: recarga da store (2 consultas) e validadores;
+        # depois disso nenhuma consulta
+        self.measure("index_store", "/", 3, 0, store=True)
+        self.measure("api_tidedays_store", "/api/tidedays/?format=json&page_size=500", 3, 0, store=True)
+
+    def test_fast_read_matches_serializers(self):
+        d = self.today.replace(day=1)
+        day = TideDay.objects.prefetch_related("tides").get(date=d)
+        tides = (
+            Tide.objects.annotate(day_date=F("day__date"))
+            .filter(year=d.year, month=d.month)
+            .order_by("day_date", "order")
+        )
+        days = TideDay.objects.prefetch_related("tides").filter(year=d.year, month=d.month).order_by("date")
+        cases = [
+            (f"/api/tidedays/{day.pk}/", TideDaySerializer(day).data),
+            (f"/api/tides/{tides[0].pk}/", TideSerializer(tides[0]).data),
+            (f"/api/tidedays/?year={d.year}&month={d.month}", TideDaySerializer(days, many=True).data),
+            (f"/api/tides/?year={d.year}&month={d.month}", TideSerializer(tides[:50], many=True).data),
+        ]
+        for url, data in cases:
+            content = self.client.get(url).content
+            if "?" in url:
+                page = json.loads(content)
+                data = {"next": page["next"], "previous": page["previous"], "results": data}
+            self.assertEqual(content, JSONRenderer().render(data), url)
+
+    def test_serialization_throughput(self):
+        """Linhas (dias + marés) por segundo, consultas incluídas: serializers e
+        JSONRenderer do DRF x ``.values()``, ``rows`` e orjson."""
+        days = TideDay.objects.order_by("date")
+        view = TideDayViewSet()
+        paths = {
+            "drf": lambda: JSONRenderer().render(TideDaySerializer(days.prefetch_related("tides"), many=True).data),
+            "fast": lambda: ORJSONRenderer().render(view.rows_to_data(days.values(*view.read_fields))),
+        }
+        self.assertEqual(paths["drf"](), paths["fast"]())
+        result = {"name": "serialize_tidedays", "rows": days.count() + Tide.objects.count()}
+        for name, render in paths.items():
+            seconds = min(_timed(render) for _ in range(BENCH_ITERATIONS))
+            result[f"{name}_rows_per_second"] = round(result["rows"] / seconds)
+        self.results.append(result)
+
+
+def _timed(fn):
+    t0 = clock.perf_counter()
+    fn()
+    return clock.perf_counter() - t0
+
+
+class MetricsEndpointTests(TestCase):
+    def test_views_are_labelled_by_url_name(self):
+        from .metrics import registry
+
+        registry._values.clear()
+        upsert_days(synthetic_days(date(2025, 3, 1), date(2025, 3, 31)))
+        self.client.get("/dia/2025-03-10/")
+        self.client.get("/api/tidedays/?format=json")
+        self.client.force_login(User.objects.create_user("ops", is_staff=True))
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('mare_http_requests_total{method="GET",status="200",view="day_detail"} 1', body)
+        self.assertIn('mare_db_queries_count{view="tideday-list"} 1', body)
+        self.assertIn('mare_template_render_seconds_count{view="day_detail"} 1', body)
+        self.assertNotIn('view="metrics"', body)
+
+    def test_unknown_methods_share_one_label(self):
+        from .metrics import registry
+
+        registry._values.clear()
+        for method in ("FOO", "BAR"):
+            self.client.generic(method, "/api/tidedays/?format=json")
+        self.client.force_login(User.objects.create_user("ops", is_staff=True))
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('mare_http_requests_total{method="other",status="405",view="tideday-list"} 2', body)
+        self.assertNotIn('method="FOO"', body)
+
+    def test_requires_staff_or_token(self):
+        from django.template.backends.django import Template
+
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+        # O tempo de template vem do backend próprio, sem alterar o Template do Django
+        self.assertEqual(Template.render.__module__, "django.template.backends.django")
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles.cleanup)
+        upsert_days(synthetic_days(date(2025, 3, 1), date(2025, 3, 31)))
+
+    def test_only_staff_requests_are_profiled(self):
+        with override_settings(PROFILER_DIR=self.profiles.name):
+            response = self.client.get("/calendario/2025/?_profile=1")
+            self.assertNotIn("X-Profile-Id", response)
+
+            staff = User.objects.create_user("staff", is_staff=True)
+            self.client.force_login(staff)
+            cache.clear()
+            response = self.client.get("/calendario/2025/", HTTP_X_PROFILE="1")
+
+            capture = ProfileCapture.objects.get(pk=response["X-Profile-Id"])
+            self.assertEqual(capture.view_name, "calendar_year")
+            report = json.loads(capture.artifact_path("json").read_text(encoding="utf-8"))
+            self.assertEqual(len(report["queries"]), capture.query_count)
+            self.assertIn("pages/views.py", " ".join(report["queries"][0]["stack"]))
+            self.assertTrue(capture.artifact_path("prof").exists())
+
+    def test_capture_limits_and_cleanup(self):
+        staff = User.objects.create_user("staff", is_staff=True)
+        self.client.force_login(staff)
+        with override_settings(PROFILER_DIR=self.profiles.name, PROFILER_MAX_QUERIES=1):
+            cache.clear()
+            response = self.client.get("/calendario/2025/?_profile=1")
+            capture = ProfileCapture.objects.get(pk=response["X-Profile-Id"])
+            report = json.loads(capture.artifact_path("json").read_text(encoding="utf-8"))
+            self.assertEqual(len(report["queries"]), 1)
+            self.assertEqual(report["queries_omitted"], capture.query_count - 1)
+
+            orphan = Path(self.profiles.name) / "999999.prof"
+            orphan.write_bytes(b"")
+            ProfileCapture.objects.filter(pk=capture.pk).update(created_at=timezone.now() - timedelta(days=30))
+            out = io.StringIO()
+            call_command("limpar_perfis", days=7, stdout=out)
+            self.assertIn("1 capturas e 1 arquivos", out.getvalue())
+            self.assertFalse(ProfileCapture.objects.exists())
+            self.assertEqual(list(Path(self.profiles.name).iterdir()), [])
+
+
+class PrerenderTests(TestCase):
+    def test_only_changed_pages_are_rendered_again(self):
+        upsert_days(synthetic_days(date(2025, 3, 1), date(2025, 3, 31)))
+        with tempfile.TemporaryDirectory() as output:
+            def run():
+                out = io.StringIO()
+                call_command("gerar_paginas", output=output, workers=1, stdout=out)
+                return out.getvalue()
+
+            self.assertIn("63 a gerar", run())
+            page = Path(output, "dia", "2025-03-10", "index.html")
+            self.assertEqual(page.read_bytes(), self.client.get("/dia/2025-03-10/", secure=True,
+                                                               HTTP_HOST="www.maresdesalinas.com.br").content)
+            self.assertTrue(page.with_name("index.html.gz").exists())
+            self.assertIn("0 a gerar", run())
+
+            Tide.objects.filter(day__date=date(2025, 3, 10), order=1).update(height=Decimal("9.99"))
+            # Dia, calendário e as variantes de index cuja grade mostra o dia 10
+            self.assertIn("33 a gerar", run())
+
+    def test_async_page_views(self):
+        from django.urls import resolve
+
+        from pages import views
+        from pages.management.commands import gerar_paginas
+
+        upsert_days(synthetic_days(date(2025, 3, 1), date(2025, 3, 31)))
+        # Como com ASYNC_VIEWS=True (deploy ASGI): as rotas apontam para corrotinas
+        async_views = {views.index: views.aindex, views.calendar_year: views.acalendar_year,
+                       views.day_detail: views.aday_detail}
+
+        def async_resolve(path):
+            match = resolve(path)
+            match.func = async_views.get(match.func, match.func)
+            return match
+
+        urls = ["/dia/2025-03-10/", "/calendario/2025/", "/?date=2025-03-10"]
+        with tempfile.TemporaryDirectory() as sync_dir, tempfile.TemporaryDirectory() as async_dir:
+            base_url = "https://www.maresdesalinas.com.br"
+            gerar_paginas.render_pages(urls, sync_dir, base_url)
+            cache.clear()
+            with mock.patch.object(gerar_paginas, "resolve", async_resolve):
+                self.assertEqual(gerar_paginas.render_pages(urls, async_dir, base_url), urls)
+            for url in urls:
+                path = gerar_paginas.page_file(url)
+                self.assertEqual(Path(async_dir, path).read_bytes(), Path(sync_dir, path).read_bytes())
+
+
+class AsyncViewTests(TestCase):
+    """As views assíncronas (deploy ASGI) respondem byte a byte como as síncronas."""
+
+    urls = [
+        "/?date=2025-03-02",
+        "/calendario/2025/",
+        "/dia/2025-03-10/",
+        "/api/curve/?start=2025-03-01&end=2025-03-03&step=30",
+        "/api/curve/?at=2025-03-10T10:00,2025-03-11T11:00",
+        "/api/windows/?threshold=1.5&start=2025-03-01&end=2025-03-31&from=18:00&to=06:00",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 2, 20), date(2025, 4, 10)))
+
+    async def test_async_views_match_sync_views(self):
+        from django.test import AsyncRequestFactory, RequestFactory
+        from django.urls import resolve
+
+        from pages import views
+        from . import api_views
+
+        async_views = {
+            views.index: views.aindex,
+            views.calendar_year: views.acalendar_year,
+            views.day_detail: views.aday_detail,
+            api_views.tide_curve: api_views.atide_curve,
+            api_views.tide_windows: api_views.atide_windows,
+        }
+        for url in self.urls:
+            match = resolve(url.split("?")[0])
+            await cache.aclear()
+            expected = await sync_to_async(match.func)(RequestFactory().get(url), *match.args, **match.kwargs)
+            await cache.aclear()
+            response = await async_views[match.func](AsyncRequestFactory().get(url), *match.args, **match.kwargs)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.content, expected.content, url)
+
+
+class ReplicaRoutingTests(TestCase):
+    def route(self, method="get", cookies=None):
+        from django.test import RequestFactory
+
+        from .routers import ReplicaMiddleware, ReplicaRouter
+
+        chosen = {}
+
+        def view(request):
+            chosen["tideday"] = ReplicaRouter().db_for_read(TideDay)
+            chosen["user"] = ReplicaRouter().db_for_read(User)
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        response = ReplicaMiddleware(view)(request)
+        return chosen, response
+
+    def test_reads_go_to_replica_until_a_write(self):
+        cache.clear()
+        chosen, _ = self.route()
+        self.assertEqual(chosen, {"tideday": "replica", "user": "default"})
+
+        chosen, response = self.route("post")
+        self.assertEqual(chosen["tideday"], "default")
+        self.assertIn("mare_primary", response.cookies)
+        self.assertEqual(self.route(cookies={"mare_primary": "1"})[0]["tideday"], "default")
+
+        # Escrita recente (qualquer cliente): primário durante REPLICA_PIN_SECONDS
+        bump_data_version()
+        self.assertEqual(self.route()[0]["tideday"], "default")
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.route()[0]["tideday"], "replica")
+
+
+class YearBundleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2024, 12, 1), date(2025, 12, 31)))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bundle_round_trip_and_caching(self):
+        from .bundle import brotli, decode_bin
+
+        manifest = self.client.get("/api/bundle/2025/").json()
+        self.assertEqual((manifest["days"], manifest["tides"]), (365, Tide.objects.filter(year=2025).count()))
+        response = self.client.get(manifest["json"], HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("immutable", response["Cache-Control"])
+        columns = json.loads(gzip.decompress(response.content))
+        self.assertEqual(decode_bin(self.client.get(manifest["bin"]).content), columns)
+        if brotli is not None:
+            response = self.client.get(manifest["json"], HTTP_ACCEPT_ENCODING="gzip, br")
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertEqual(json.loads(brotli.decompress(response.content)), columns)
+
+        # Colunas em delta reconstroem as marés do banco
+        expected = [
+            (t.day.date, t.order, t.time.hour * 60 + t.time.minute, int(t.height * 100))
+            for t in Tide.objects.filter(year=2025).select_related("day").order_by("day__date", "order")
+        ]
+        day = minute = cm = 0
+        decoded, tides = [], iter(zip(columns["order"], columns["minute"], columns["cm"]))
+        for day_delta, count in zip(columns["day"], columns["count"]):
+            day += day_delta
+            for order, minute_delta, cm_delta in (next(tides) for _ in range(count)):
+                minute, cm = minute + minute_delta, cm + cm_delta
+                decoded.append((date(2025, 1, 1) + timedelta(days=day), order, minute - day * 1440, cm))
+        self.assertEqual(decoded, expected)
+
+        # Só refaz quando o ano muda; hash antigo redireciona para o atual
+        with self.captureOnCommitCallbacks(execute=True):
+            Tide.objects.filter(year=2024).first().save()
+        self.assertEqual(self.client.get("/api/bundle/2025/").json()["hash"], manifest["hash"])
+        tide = Tide.objects.filter(year=2025).first()
+        tide.height += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            tide.save()
+        current = self.client.get("/api/bundle/2025/").json()
+        self.assertNotEqual(current["hash"], manifest["hash"])
+        self.assertRedirects(self.client.get(manifest["json"]), current["json"], fetch_redirect_response=False)
+        self.assertEqual(self.client.get("/api/bundle/1990/").status_code, 404)
+        self.assertEqual(self.client.get("/api/bundle/99999/").status_code, 404)
+        self.assertEqual(self.client.get("/api/bundle/0/").status_code, 404)
+
+    @override_settings(PAGES_CACHE_TIMEOUT=120)
+    def test_cached_bundles_expire(self):
+        from .bundle import get_bundle
+
+        # Cada escrita deixa para trás a cópia da versão anterior: precisa expirar
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            get_bundle(2025)
+        timeouts = {call.args[0].split(":")[1]: call.args[2] for call in cache_set.call_args_list}
+        self.assertEqual(timeouts["bundle"], 120)
+        self.assertTrue(all(timeout == 120 for timeout in timeouts.values()))
+
+
+class SyncChangesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 3, 31)))
+
+    @override_settings(SYNC_TOKEN_LAG_SECONDS=0)
+    def test_only_changed_and_removed_days(self):
+        token = self.client.get("/api/changes/").json()["token"]
+        self.assertEqual(self.client.get(f"/api/changes/?since={token}").json()["days"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/tides/", {"order": 1, "time": "06:00", "height": "1.10", "date": "2025-02-01"},
+                content_type="application/json",
+            )
+            Tide.objects.filter(day__date=date(2025, 2, 10), order=4).delete()
+            removed_id = TideDay.objects.get(date=date(2025, 3, 1)).pk
+            TideDay.objects.filter(pk=removed_id).delete()
+        with CaptureQueriesContext(connection) as queries:
+            changes = self.client.get(f"/api/changes/?since={token}").json()
+        self.assertLessEqual(len(queries), 5)
+        self.assertEqual([d["date"] for d in changes["days"]], ["2025-02-01", "2025-02-10"])
+        self.assertEqual(changes["days"][1], TideDaySerializer(TideDay.objects.get(date=date(2025, 2, 10))).data)
+        self.assertEqual(changes["removed"], [{"id": removed_id, "date": "2025-03-01"}])
+        self.assertEqual(self.client.get(f"/api/changes/?since={changes['token']}").json()["days"], [])
+
+        self.assertEqual(self.client.get("/api/changes/?since=x").status_code, 400)
+        self.assertEqual(self.client.get("/api/changes/?since=1").status_code, 410)
+
+
+class SingleFlightTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        upsert_days(synthetic_days(date(2025, 1, 1), date(2025, 12, 31)))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_copy_while_rebuilding_and_when_db_fails(self):
+        from django.db import OperationalError
+
+        from .cache import cache_key
+
+        def database_down(execute, sql, params, many, context):
+            raise OperationalError("database is locked")
+
+        good = self.client.get("/calendario/2025/")
+        self.assertFalse(good.has_header("Warning"))
+
+        # Versão nova e outro processo com a trava: serve a última cópia boa, sem validadores
+        bump_data_version()
+        cache.add(cache_key("page:calendar", 2025) + ":lock", 1)
+        response = self.client.get("/calendario/2025/")
+        self.assertEqual((response["Warning"], response.content), ('110 - "Response is Stale"', good.content))
+        self.assertFalse(response.has_header("ETag"))
+
+        bump_data_version()
+        with connection.execute_wrapper(database_down):
+            response = self.client.get("/calendario/2025/")
+            self.assertEqual((response["Warning"], response.content), ('111 - "Revalidation Failed"', good.content))
+            with self.assertRaises(OperationalError):
+                self.client.get("/calendario/2024/")
+
+        # Sem cópia boa, quem não tem a trava espera e, esgotado o prazo, reconstrói
+        cache.add(cache_key("page:day", "2025-03-10", "http://testserver/dia/2025-03-10/") + ":lock", 1)
+        with override_settings(COALESCE_WAIT_SECONDS=0.1):
+            response = self.client.get("/dia/2025-03-10/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Warning"))
+
+
+class WarmCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.localdate()
+        upsert_days(synthetic_days(today - timedelta(days=3), today + timedelta(days=3)))
+
+    def test_refuses_locmem(self):
+        with self.assertRaisesMessage(CommandError, "locmem"):
+            call_command("aquecer_cache", workers=1, stdout=io.StringIO())
+
+    def test_warmed_pages_are_served_from_cache(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        shared = {
+            "default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory.name}
+        }
+        today = timezone.localdate()
+        with override_settings(CACHES=shared):
+            out = io.StringIO()
+            call_command("aquecer_cache", days=1, workers=1, base_url="http://testserver", stdout=out)
+            self.assertIn("bundle", out.getvalue())
+            self.assertIn("Total: 8 URLs", out.getvalue())
+
+            for url in ("/", f"/dia/{today:%Y-%m-%d}/", f"/calendario/{today.year}/", f"/api/bundle/{today.year}/"):
+                with self.subTest(url=url), self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+def _summary(samples, budget):
+    times = sorted(s * 1000 for s, _, _ in samples)
+    return {
+        "queries": max(q for _, q, _ in samples),
+        "budget": budget,
+        "min_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, math.ceil(0.95 * len(times)) - 1)], 3),
+        "max_ms": round(times[-1], 3),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def write_report(results, seed_seconds):
+    report = {
+        "commit": _git_commit(),
+        "created_at": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "years": BENCH_YEARS,
+        "iterations": BENCH_ITERATIONS,
+        "seed_seconds": round(seed_seconds, 3),
+        "endpoints": sorted(results, key=lambda r: r["name"]),
+    }
+    with open(BENCH_REPORT, "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, ensure_ascii=False)
+        fh.write("\n")
@@ -0,0 +1,202 @@
+"""Busca de janelas em que a maré fica abaixo (ou acima) de um limite.
+
+A busca tem duas etapas:
+
+1. a faixa diária ``TideDay.min_height``/``max_height`` (índices compostos com
+   ``date``) escolhe só os dias que podem cruzar o limite. Anos sem nenhum
+   candidato são descartados pelo índice, sem ler marés;
+2. os extremos desses dias, e dos vizinhos (segmentos que atravessam a
+   meia-noite), formam segmentos da curva de ``mare_backend.curve``. O
+   instante em que cada segmento cruza o limite é obtido invertendo a
+   interpolação, de forma vetorizada para todos os segmentos.
+
+Janelas "acima" são tratadas como janelas "abaixo" da curva com sinal trocado.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db.models import Q
+
+from . import curve
+from .models import Tide, TideDay, instant_bounds
+from .store import aget_store, get_store
+
+BELOW = "below"
+ABOVE = "above"
+MODES = (BELOW, ABOVE)
+# Dois parâmetros por trecho; abaixo do limite de variáveis do SQLite
+_RUNS_PER_QUERY = 200
+
+
+def candidate_extremes(start, end, threshold, mode=BELOW):
+    """Extremos dos dias que podem cruzar ``threshold`` (e dos vizinhos) entre
+    ``start - 1 dia`` e ``end + 1 dia``, como arrays ``(segundos, alturas)``."""
+    first, last = start - timedelta(days=1), end + timedelta(days=1)
+    store = get_store()
+    if store is not None:
+        return _store_candidates(store, first, last, threshold, mode)
+    dates = _candidate_dates(first, last, threshold, mode)
+    rows = []
+    for tides in _tides_around(dates):
+        rows.extend(curve.tide_rows(tides))
+    return curve.rows_to_arrays(rows)
+
+
+async def acandidate_extremes(start, end, threshold, mode=BELOW):
+    """``candidate_extremes`` com o ORM assíncrono."""
+    first, last = start - timedelta(days=1), end + timedelta(days=1)
+    store = await aget_store()
+    if store is not None:
+        return _store_candidates(store, first, last, threshold, mode)
+    dates = [d async for d in _candidate_dates(first, last, threshold, mode)]
+    rows = []
+    for tides in _tides_around(dates):
+        rows.extend(await curve.atide_rows(tides))
+    return curve.rows_to_arrays(rows)
+
+
+def _store_candidates(store, first, last, threshold, mode):
+    lo, hi = store.bounds(first, last)
+    if mode == BELOW:
+        days = np.frombuffer(store.day_min_cm, dtype=np.int32)[lo:hi] < threshold * 100
+    else:
+        days = np.frombuffer(store.day_max_cm, dtype=np.int32)[lo:hi] > threshold * 100
+    return curve.store_extremes(store, lo, hi, _with_neighbours(days))
+
+
+def _candidate_dates(first, last, threshold, mode):
+    lookup = "min_height__lt" if mode == BELOW else "max_height__gt"
+    # Coberta pelo índice (date, min_height)/(date, max_height)
+    return TideDay.objects.filter(date__range=(first, last), **{lookup: threshold}).values_list("date", flat=True)
+
+
+def _tides_around(dates):
+    """Querysets de marés dos dias ``dates`` e vizinhos, um por lote de trechos."""
+    one_day = timedelta(days=1)
+    wanted = sorted({d + delta for d in dates for delta in (-one_day, timedelta(0), one_day)})
+    # Dias consecutivos viram um intervalo de ``Tide.at``: uma varredura do índice por trecho
+    runs = []
+    for d in wanted:
+        if runs and runs[-1][1] + one_day == d:
+            runs[-1][1] = d
+        else:
+            runs.append([d, d])
+    for i in range(0, len(runs), _RUNS_PER_QUERY):
+        spans = Q()
+        for first_day, last_day in runs[i:i + _RUNS_PER_QUERY]:
+            begin, stop = instant_bounds(first_day, last_day)
+            spans |= Q(at__gte=begin, at__lt=stop)
+        yield Tide.objects.filter(spans)
+
+
+def _with_neighbours(days):
+    out = days.copy()
+    out[1:] |= days[:-1]
+    out[:-1] |= days[1:]
+    return out
+
+
+def find_windows(seconds, heights, threshold, method="cosine"):
+    """Intervalos ``(inícios, fins)`` em que a curva fica abaixo de ``threshold``.
+
+    Segmentos inteiros abaixo do limite são unidos aos vizinhos; nos que
+    cruzam o limite, o instante do cruzamento vem de ``curve.crossing_fraction``.
+    """
+    if len(seconds) < 2:
+        return np.empty(0), np.empty(0)
+    t0, t1 = seconds[:-1], seconds[1:]
+    h0, h1 = heights[:-1], heights[1:]
+    span = t1 - t0
+    low, high = np.minimum(h0, h1), np.maximum(h0, h1)
+    hit = (span > 0) & (span <= curve.MAX_SEGMENT_SECONDS) & (low < threshold)
+    t0, t1, h0, h1, span, high = t0[hit], t1[hit], h0[hit], h1[hit], span[hit], high[hit]
+
+    whole = high <= threshold
+    rising = h1 > h0
+    weight = np.zeros_like(h0)
+    np.divide(threshold - h0, h1 - h0, out=weight, where=~whole)
+    crossing = t0 + curve.crossing_fraction(weight, method) * span
+    # Subindo, a água está abaixo do limite até o cruzamento; descendo, depois dele
+    starts = np.where(whole | rising, t0, crossing)
+    ends = np.where(whole | ~rising, t1, crossing)
+
+    # Segmentos encadeados (fim de um == início do próximo) formam uma janela
+    first = np.ones(len(starts), dtype=bool)
+    first[1:] = starts[1:] != ends[:-1]
+    groups = np.nonzero(first)[0]
+    last = np.append(groups[1:] - 1, len(starts) - 1)
+    return starts[groups], ends[last]
+
+
+def daily_limits(start, end, time_from=None, time_to=None):
+    """Intervalos permitidos ``(inícios, fins)`` de ``start`` 00:00 a ``end`` 24:00.
+
+    ``time_from``/``time_to`` são minutos do dia; ``time_from > time_to``
+    atravessa a meia-noite (ex.: 18:00 às 06:00).
+    """
+    begin = curve.local_seconds(start)
+    stop = curve.local_seconds(end) + curve.SECONDS_PER_DAY
+    if time_from is None and time_to is None:
+        return np.array([begin], dtype=np.float64), np.array([stop], dtype=np.float64)
+    time_from = 0 if time_from is None else time_from
+    time_to = 1440 if time_to is None else time_to
+    # Um dia antes, para o trecho de uma janela noturna iniciada na véspera
+    days = np.arange(begin - curve.SECONDS_PER_DAY, stop, curve.SECONDS_PER_DAY, dtype=np.float64)
+    starts = days + time_from * 60
+    ends = days + time_to * 60 + (curve.SECONDS_PER_DAY if time_to <= time_from else 0)
+    starts, ends = np.maximum(starts, begin), np.minimum(ends, stop)
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def intersect(starts, ends, limit_starts, limit_ends):
+    """Interseção de duas listas ordenadas de intervalos disjuntos."""
+    lo = np.searchsorted(limit_ends, starts, side="right")
+    hi = np.searchsorted(limit_starts, ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    window = np.repeat(np.arange(len(starts)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    limit = np.repeat(lo, counts) + offset
+    out_starts = np.maximum(starts[window], limit_starts[limit])
+    out_ends = np.minimum(ends[window], limit_ends[limit])
+    keep = out_ends > out_starts
+    return out_starts[keep], out_ends[keep]
+
+
+def extreme_heights(seconds, heights, starts, ends, method="cosine"):
+    """Menor altura dentro de cada intervalo: bordas interpoladas e extremos internos."""
+    edges = np.fmin(
+        curve.interpolate(seconds, heights, starts, method),
+        curve.interpolate(seconds, heights, ends, method),
+    )
+    lo = np.searchsorted(seconds, starts, side="right")
+    hi = np.searchsorted(seconds, ends, side="left")
+    inner = np.full(len(starts), np.inf)
+    has_inner = hi > lo
+    if has_inner.any():
+        padded = np.append(heights, np.inf)
+        bounds = np.column_stack((lo[has_inner], hi[has_inner])).ravel()
+        inner[has_inner] = np.minimum.reduceat(padded, bounds)[::2]
+    return np.fmin(edges, inner)
+
+
+def search(start, end, threshold, mode=BELOW, time_from=None, time_to=None,
+           min_minutes=0, method="cosine", extremes=None):
+    """Janelas de ``start`` a ``end`` (datas inclusivas) com a maré abaixo/acima
+    de ``threshold``, recortadas pelo horário do dia.
+
+    Devolve arrays ``(inícios, fins, altura_extrema)`` em segundos locais; a
+    altura extrema é a mínima (``below``) ou a máxima (``above``) da janela.
+    ``extremes`` (de ``acandidate_extremes``) evita a leitura.
+    """
+    if extremes is None:
+        extremes = candidate_extremes(start, end, threshold, mode)
+    seconds, heights = extremes
+    sign = 1.0 if mode == BELOW else -1.0
+    heights = sign * heights
+    starts, ends = find_windows(seconds, heights, sign * threshold, method)
+    starts, ends = intersect(starts, ends, *daily_limits(start, end, time_from, time_to))
+    if min_minutes:
+        keep = ends - starts >= min_minutes * 60
+        starts, ends = starts[keep], ends[keep]
+    return starts, ends, sign * extreme_heights(seconds, heights, starts, ends, method)
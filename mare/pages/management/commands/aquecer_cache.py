@@ -0,0 +1,111 @@
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+
+def plan_steps(today, days):
+    """``[(etapa, [urls])]``: index de hoje, dias em volta, calendários e pacotes do ano.
+
+    Só o que fica no cache compartilhado. As listas de /api/tidedays/ e
+    /api/tides/ não são guardadas (só os validadores, por URL exata) e o store
+    em memória é de cada worker, então não há o que aquecer por fora.
+    """
+    years = (today.year, today.year + 1)
+    return [
+        ("index", ["/"]),
+        ("day_detail", [
+            f"/dia/{d:%Y-%m-%d}/" for d in (today + timedelta(days=i) for i in range(-days, days + 1))
+        ]),
+        ("calendar_year", [f"/calendario/{year}/" for year in years]),
+        ("bundle", [f"/api/bundle/{year}/" for year in years]),
+    ]
+
+
+def fetch(factory, secure, url):
+    """Chama a view de ``url`` (sem middlewares, como gerar_paginas).
+
+    Devolve ``(status, segundos)``; ``status`` é o nome da exceção se a view falhar.
+    """
+    t0 = clock.perf_counter()
+    request = factory.get(url, secure=secure)
+    request.user = AnonymousUser()
+    try:
+        match = resolve(request.path_info)
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+        response = view(request, *match.args, **match.kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        status = response.status_code
+    except Exception as exc:
+        status = type(exc).__name__
+    return status, clock.perf_counter() - t0
+
+
+def _fetch_in_thread(factory, secure, url):
+    try:
+        return fetch(factory, secure, url)
+    finally:
+        # Conexões são por thread; as do pool não são reaproveitadas
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Renderiza e grava no cache compartilhado (redis/file) o index de hoje, os dias em volta, "
+        "os calendários e os pacotes (/api/bundle/) do ano corrente e do próximo, em paralelo. "
+        "Para depois do deploy; recusa rodar com cache locmem, que morreria com o comando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Dias antes e depois de hoje em /dia/ (padrão: 7)")
+        parser.add_argument("--workers", type=int, default=4, help="Threads (1 = sem pool)")
+        parser.add_argument(
+            "--base-url", help="Esquema e host públicos, que entram nas chaves (padrão: PRERENDER_BASE_URL)"
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(caches["default"], LocMemCache):
+            raise CommandError(
+                "Cache locmem: o que este processo gravar não chega aos workers. "
+                "Use DJANGO_CACHE_BACKEND=file ou redis."
+            )
+        base_url = options["base_url"] or settings.PRERENDER_BASE_URL
+        parts = urlsplit(base_url)
+        factory = RequestFactory(HTTP_HOST=parts.netloc)
+        secure = parts.scheme == "https"
+        steps = plan_steps(timezone.localdate(), max(options["days"], 0))
+
+        jobs = [(step, url) for step, urls in steps for url in urls]
+        t0 = clock.perf_counter()
+        if options["workers"] <= 1:
+            results = [fetch(factory, secure, url) for _, url in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                results = list(pool.map(lambda job: _fetch_in_thread(factory, secure, job[1]), jobs))
+        total = clock.perf_counter() - t0
+
+        failed = []
+        for step, urls in steps:
+            timings = [(url, res) for (s, url), res in zip(jobs, results) if s == step]
+            seconds = [elapsed for _, (_, elapsed) in timings]
+            failed += [
+                f"{url} ({status})" for url, (status, _) in timings if not isinstance(status, int) or status >= 500
+            ]
+            self.stdout.write(
+                f"{step:<14} {len(timings):>3} URLs  {sum(seconds):.2f} s somados, maior {max(seconds):.2f} s"
+            )
+        self.stdout.write(f"Total: {len(jobs)} URLs em {total:.2f} s ({options['workers']} threads)")
+        if failed:
+            raise CommandError("Falharam: " + ", ".join(failed))
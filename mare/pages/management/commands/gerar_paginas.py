@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import time as clock
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils import timezone
+
+from mare_backend.models import TideDay
+from pages.views import _load_days, _month_range
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - opcional
+    brotli = None
+
+MANIFEST = "manifest.json"
+# Páginas por tarefa enviada ao pool
+CHUNK_SIZE = 50
+
+
+def page_file(path):
+    """Arquivo de uma URL: ``/dia/2025-01-12/`` -> ``dia/2025-01-12/index.html``.
+
+    As variantes de ``index`` (``/?date=...``) ficam em ``index/<data>/``; o
+    proxy reverso reescreve ``/?date=<data>`` para lá.
+    """
+    if path.startswith("/?date="):
+        return f"index/{path[len('/?date='):]}/index.html"
+    return f"{path.strip('/')}/index.html"
+
+
+def _day_digest(day):
+    if day is None:
+        return "-"
+    return repr((day.weekday, [(t["order"], t["time"], t["height"], t["type"]) for t in day.tides]))
+
+
+def _hash(*parts):
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _template_fingerprint():
+    """Muda quando templates ou o manifesto do collectstatic mudam (URLs com hash)."""
+    sources = sorted((Path(settings.BASE_DIR) / "pages" / "templates").rglob("*.html"))
+    manifest = Path(settings.STATIC_ROOT) / "staticfiles.json"
+    if manifest.exists():
+        sources.append(manifest)
+    return _hash(*(hashlib.sha1(p.read_bytes()).hexdigest() for p in sources))
+
+
+def plan_pages(first, last, base_url, today):
+    """``{url: digest}`` de todas as páginas de ``first`` a ``last``.
+
+    O digest cobre exatamente os dados exibidos na página (incluindo os dias
+    de transbordo das grades de mês), a URL base e os templates.
+    """
+    years = range(first.year, last.year + 1)
+    lo = min(_month_range(first.year, first.month)[0], _month_range(years[0], 1)[0])
+    hi = max(_month_range(last.year, last.month)[1], _month_range(years[-1], 12)[1])
+    by_date = _load_days(lo, hi)
+    fingerprint = _template_fingerprint()
+
+    digests = {}
+    d = lo
+    while d <= hi:
+        digests[d] = _day_digest(by_date.get(d))
+        d += timedelta(days=1)
+
+    def span(a, b):
+        return [digests[a + timedelta(days=i)] for i in range((b - a).days + 1)]
+
+    pages = {}
+    for year in years:
+        cal_lo, cal_hi = _month_range(year, 1)[0], _month_range(year, 12)[1]
+        pages[f"/calendario/{year}/"] = _hash(fingerprint, base_url, *span(cal_lo, cal_hi))
+    month_digests = {}
+    d = first
+    while d <= last:
+        if d in by_date:
+            pages[f"/dia/{d.isoformat()}/"] = _hash(fingerprint, base_url, digests[d])
+            month = (d.year, d.month)
+            if month not in month_digests:
+                month_digests[month] = _hash(*span(*_month_range(*month)))
+            # O link "Hoje" do index depende da data corrente
+            pages[f"/?date={d.isoformat()}"] = _hash(fingerprint, base_url, today, month_digests[month], digests[d])
+        d += timedelta(days=1)
+    return pages
+
+
+def _write(target, content):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    variants = [(target, content), (target.with_name(target.name + ".gz"), gzip.compress(content, 9, mtime=0))]
+    if brotli is not None:
+        variants.append((target.with_name(target.name + ".br"), brotli.compress(content)))
+    for path, data in variants:
+        # Troca atômica: o servidor nunca lê um arquivo pela metade
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+def render_pages(urls, output, base_url):
+    """Renderiza ``urls`` chamando as views diretamente (roda nos processos do pool)."""
+    parts = urlsplit(base_url)
+    factory = RequestFactory(HTTP_HOST=parts.netloc)
+    secure = parts.scheme == "https"
+    rendered = []
+    for url in urls:
+        request = factory.get(url, secure=secure)
+        request.user = AnonymousUser()
+        match = resolve(request.path_info)
+        # Deploy ASGI: as views de página são corrotinas
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+        response = view(request, *match.args, **match.kwargs)
+        if response.status_code != 200:
+            raise CommandError(f"{url}: status {response.status_code}")
+        if response.has_header("Warning"):
+            # Última cópia boa (outro processo reconstruindo ou banco fora do ar)
+            raise CommandError(f"{url}: cópia antiga ({response['Warning']}); rode de novo")
+        _write(Path(output) / page_file(url), response.content)
+        rendered.append(url)
+    return rendered
+
+
+def _close_connections():
+    # Cada processo do pool abre a própria conexão
+    connections.close_all()
+
+
+def _in_scope(url, first, last, years):
+    if not years:
+        return True
+    if url.startswith("/calendario/"):
+        return first.year <= int(url.strip("/").split("/")[1]) <= last.year
+    raw = url[len("/?date="):] if url.startswith("/?date=") else url.strip("/").split("/")[1]
+    return first <= date.fromisoformat(raw) <= last
+
+
+class Command(BaseCommand):
+    help = (
+        "Pré-renderiza em HTML estático as páginas /dia/, /calendario/ e as variantes "
+        "de index (/?date=) em PRERENDER_ROOT, só as que mudaram desde a última execução."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", dest="years", type=int, action="append", help="Ano a gerar (pode repetir; padrão: todos)")
+        parser.add_argument("--output", help="Diretório de saída (padrão: PRERENDER_ROOT)")
+        parser.add_argument("--base-url", help="Esquema e host das URLs canônicas (padrão: PRERENDER_BASE_URL)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processos de renderização")
+        parser.add_argument("--force", action="store_true", help="Renderiza tudo, mesmo sem mudança nos dados")
+        parser.add_argument("--dry-run", action="store_true", help="Só mostra quantas páginas seriam geradas/removidas")
+
+    def handle(self, *args, **options):
+        output = Path(options["output"] or settings.PRERENDER_ROOT)
+        base_url = (options["base_url"] or settings.PRERENDER_BASE_URL).rstrip("/")
+        if urlsplit(base_url).scheme not in ("http", "https") or not urlsplit(base_url).netloc:
+            raise CommandError(f"--base-url inválida: {base_url}")
+
+        bounds = TideDay.objects.filter(tides__isnull=False).aggregate(first=Min("date"), last=Max("date"))
+        if bounds["first"] is None:
+            raise CommandError("Não há marés cadastradas")
+        first, last = bounds["first"], bounds["last"]
+        if options["years"]:
+            first = max(first, date(min(options["years"]), 1, 1))
+            last = min(last, date(max(options["years"]), 12, 31))
+            if first > last:
+                raise CommandError("Nenhum dia com marés nos anos informados")
+
+        t0 = clock.perf_counter()
+        pages = plan_pages(first, last, base_url, timezone.localdate())
+        manifest_path = output / MANIFEST
+        previous = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+        todo = sorted(url for url, digest in pages.items() if options["force"] or previous.get(url) != digest)
+        # Páginas geradas antes, dentro do intervalo, que deixaram de existir (dias removidos)
+        in_scope = {url for url in previous if _in_scope(url, first, last, options["years"])}
+        stale = sorted(in_scope - set(pages))
+        plan_s = clock.perf_counter() - t0
+        self.stdout.write(
+            f"{len(pages)} páginas de {first} a {last}: {len(todo)} a gerar, "
+            f"{len(pages) - len(todo)} inalteradas, {len(stale)} a remover ({plan_s:.3f}s)"
+        )
+        if options["dry_run"]:
+            return
+
+        t1 = clock.perf_counter()
+        done = []
+        chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+        if options["workers"] > 1 and len(chunks) > 1:
+            _close_connections()
+            # fork: os filhos herdam o Django já configurado
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(options["workers"], mp_context=context, initializer=_close_connections) as pool:
+                for rendered in pool.map(render_pages, chunks, [output] * len(chunks), [base_url] * len(chunks)):
+                    done.extend(rendered)
+        else:
+            for chunk in chunks:
+                done.extend(render_pages(chunk, output, base_url))
+        render_s = clock.perf_counter() - t1
+
+        for url in stale:
+            target = output / page_file(url)
+            for path in (target, target.with_name(target.name + ".gz"), target.with_name(target.name + ".br")):
+                path.unlink(missing_ok=True)
+            previous.pop(url, None)
+
+        previous.update({url: pages[url] for url in done})
+        output.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(previous, indent=0, sort_keys=True), encoding="utf-8")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Geradas {len(done)} páginas em {render_s:.3f}s "
+            f"({len(done) / max(render_s, 1e-9):,.0f} páginas/s, {options['workers']} processos); "
+            f"removidas {len(stale)}. Saída: {output}"
+        ))
+        if done or stale:
+            self.stdout.write(
+                "O WhiteNoise lista os arquivos na inicialização: recarregue os workers "
+                "(kill -HUP no gunicorn) para servir as páginas novas."
+            )
+
@@ -1,17 +1,23 @@
+from django.conf import settings
 from django.urls import path
 from django.views.generic import TemplateView
 from django.views.generic.base import RedirectView
 from django.contrib.staticfiles.storage import staticfiles_storage
 from . import views
 
+# Deploy ASGI: as mesmas páginas pelo ORM assíncrono
+if settings.ASYNC_VIEWS:
+    index, calendar_year, day_detail = views.aindex, views.acalendar_year, views.aday_detail
+else:
+    index, calendar_year, day_detail = views.index, views.calendar_year, views.day_detail
 
 urlpatterns = [
-    path("", views.index, name="index"),
+    path("", index, name="index"),
     path("sobre/", views.sobre, name="sobre"),
     path("privacidade/", views.privacidade, name="privacidade"),
     path("ads.txt", views.ads_txt, name="ads_txt"),
-    path("calendario/<int:year>/", views.calendar_year, name="calendar_year"),
-    path("dia/<int:year>-<int:month>-<int:day>/", views.day_detail, name="day_detail"),
+    path("calendario/<int:year>/", calendar_year, name="calendar_year"),
+    path("dia/<int:year>-<int:month>-<int:day>/", day_detail, name="day_detail"),
     path("favicon.ico", RedirectView.as_view(url=staticfiles_storage.url("pages/icones/favicon.ico"), permanent=True)),
     path("robots.txt", views.robots_txt, name="robots_txt"),
 ]
@@ -1,45 +1,177 @@
 from datetime import date as date_cls, timedelta
+from functools import partial
+from typing import NamedTuple
 import calendar
 
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 from django.templatetags.static import static
 from django.utils import timezone
 from urllib.parse import quote_plus
 
-from mare_backend.models import TideDay
+from mare_backend.cache import aget_data_version, cache_key, get_data_version, page_timeout
+from mare_backend.conditional import arange_validators, not_modified, range_validators, set_validators
+from mare_backend.models import TideDay, Tide, in_range, instant_bounds
+from mare_backend.singleflight import aget_or_build, get_or_build, page_response, stale_on_db_error
+from mare_backend.store import aget_store, get_store
 
 
-def _tide_typed(day_obj):
-    tides = list(day_obj.tides.all().order_by("order"))
-    typed = []
-    for i, t in enumerate(tides):
-        if len(tides) == 1:
-            tide_type = None
-        else:
-            compare_idx = i + 1 if i + 1 < len(tides) else i - 1
-            tide_type = "Maré Alta" if t.height > tides[compare_idx].height else "Maré Baixa"
-        typed.append({
+def _tide_typed(tides):
+    # Marés do prefetch (ou da store em memória): nenhuma consulta extra por dia
+    return [
+        {
             "order": t.order,
             "time": t.time,
             "height": t.height,
-            "type": tide_type,
-        })
-    return typed
+            "type": t.type_label,
+        }
+        for t in tides
+    ]
+
+
+class DayData(NamedTuple):
+    weekday: str
+    tides: list
+
+
+def _load_days(first, last):
+    """``{date: DayData}`` para o intervalo, pela store em memória ou pelo ORM."""
+    store = get_store()
+    if store is not None:
+        return {sd.date: DayData(sd.weekday, _tide_typed(sd.tides)) for sd in store.range(first, last)}
+    # Duas varreduras de índice: dias por ``date`` e marés por ``at`` (sem
+    # join nem lista de ids); as marés já vêm classificadas da escrita
+    days = TideDay.objects.filter(date__range=(first, last)).order_by("date").values_list("id", "date", "weekday")
+    start, end = instant_bounds(first, last)
+    tides_by_day = {}
+    for tide in Tide.objects.filter(at__gte=start, at__lt=end).order_by("order"):
+        tides_by_day.setdefault(tide.day_id, []).append(tide)
+    return {d: DayData(weekday, _tide_typed(tides_by_day.get(pk, []))) for pk, d, weekday in days}
+
+
+async def _aload_days(first, last):
+    """``_load_days`` com o ORM assíncrono (mesmas duas consultas)."""
+    store = await aget_store()
+    if store is not None:
+        return {sd.date: DayData(sd.weekday, _tide_typed(sd.tides)) for sd in store.range(first, last)}
+    days = [
+        row async for row in
+        TideDay.objects.filter(date__range=(first, last)).order_by("date").values_list("id", "date", "weekday")
+    ]
+    start, end = instant_bounds(first, last)
+    tides_by_day = {}
+    async for tide in Tide.objects.filter(at__gte=start, at__lt=end).order_by("order"):
+        tides_by_day.setdefault(tide.day_id, []).append(tide)
+    return {d: DayData(weekday, _tide_typed(tides_by_day.get(pk, []))) for pk, d, weekday in days}
+
+
+# Sunday first
+_CAL = calendar.Calendar(firstweekday=6)
+
+
+class DayCell(NamedTuple):
+    date: date_cls
+    in_month: bool
+    has_data: bool
+    tides: list
+
+
+def _month_dates(year, month):
+    return _CAL.monthdatescalendar(year, month)
+
+
+def _month_range(year, month):
+    """Primeira e última data exibidas na grade do mês (inclui os transbordos)."""
+    weeks = _month_dates(year, month)
+    return weeks[0][0], weeks[-1][-1]
+
 
+def _year_range(year):
+    """Primeira e última data do calendário do ano; 404 se a grade sai do alcance de ``date``."""
+    try:
+        return _month_range(year, 1)[0], _month_range(year, 12)[1]
+    except (ValueError, OverflowError):
+        raise Http404
+
+
+def _month_grid(year, month, by_date):
+    """Grade de semanas do mês, compartilhada por ``index`` e ``calendar_year``."""
+    return [
+        [
+            DayCell(d, d.month == month, d in by_date, by_date[d].tides if d in by_date else [])
+            for d in week
+        ]
+        for week in _month_dates(year, month)
+    ]
+
+
+def _page_response(content, warning, etag, last_modified):
+    # Cópia antiga: sem os validadores da versão nova, que a fixariam no cliente
+    response = page_response(content, warning)
+    return response if warning else set_validators(response, etag, last_modified)
 
+
+@stale_on_db_error
 def index(request):
     today = timezone.localdate()
+    selected = _selected_date(request, today)
+
+    # Single-month calendar widget: only the dates shown in the grid, in one
+    # range query; the selected day comes from the same result set
+    first_shown, last_shown = _month_range(selected.year, selected.month)
+    range_qs = TideDay.objects.filter(date__range=(first_shown, last_shown))
+
+    # Conditional GET: 304 before touching the tides or rendering
+    etag, last_modified = range_validators(range_qs, "index", today, selected, request.build_absolute_uri())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    def build():
+        by_date = _load_days(first_shown, last_shown)
+        return render(request, "pages/index.html", _index_context(request, today, selected, by_date)).content
+
+    key = cache_key("page:index", today, selected, request.build_absolute_uri())
+    return _page_response(*get_or_build(key, request, build), etag, last_modified)
+
+
+@stale_on_db_error
+async def aindex(request):
+    """``index`` assíncrona (deploy ASGI): mesmas consultas pelo ORM assíncrono."""
+    today = timezone.localdate()
+    selected = _selected_date(request, today)
+    first_shown, last_shown = _month_range(selected.year, selected.month)
+    range_qs = TideDay.objects.filter(date__range=(first_shown, last_shown))
+    etag, last_modified = await arange_validators(range_qs, "index", today, selected, request.build_absolute_uri())
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    async def build():
+        by_date = await _aload_days(first_shown, last_shown)
+        return render(request, "pages/index.html", _index_context(request, today, selected, by_date)).content
+
+    version = await aget_data_version()
+    key = cache_key("page:index", today, selected, request.build_absolute_uri(), version=version)
+    return _page_response(*await aget_or_build(key, request, build), etag, last_modified)
+
 
+def _selected_date(request, today):
     # Selected date via query param (?date=YYYY-MM-DD), defaults to today
-    selected = today
     qd = request.GET.get("date")
     if qd:
         try:
             selected = date_cls.fromisoformat(qd)
+            # A grade do mês (com os transbordos) também precisa caber em date
+            _month_range(selected.year, selected.month)
+            return selected
         except ValueError:
-            selected = today
+            pass
+    return today
 
+
+def _index_context(request, today, selected, by_date):
     meses_pt = [
         "janeiro", "fevereiro", "março", "abril", "maio", "junho",
         "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
@@ -52,29 +184,8 @@ def index(request):
         canonical_url = canonical_url.split("?", 1)[0]
     og_image_url = request.build_absolute_uri(static("pages/imagens/og-image.png"))
 
-    # Load selected day tides
-    day_obj = TideDay.objects.filter(date=selected).prefetch_related("tides").first()
-
-    # Build single-month calendar widget for the selected month/year
-    cal = calendar.Calendar(firstweekday=6)  # Sunday first
-    days_qs = (
-        TideDay.objects.filter(date__year=selected.year)
-        .prefetch_related("tides")
-        .order_by("date")
-    )
-    by_date = {td.date: td for td in days_qs}
-    month_weeks = []
-    for week in cal.monthdatescalendar(selected.year, selected.month):
-        week_cells = []
-        for d in week:
-            td = by_date.get(d)
-            week_cells.append({
-                "date": d,
-                "in_month": (d.month == selected.month),
-                "has_data": td is not None,
-                "tides": _tide_typed(td) if td else [],
-            })
-        month_weeks.append(week_cells)
+    month_weeks = _month_grid(selected.year, selected.month, by_date)
+    day_obj = by_date.get(selected)
 
     # Month selector options for the year (default 2025 request)
     year_for_picker = selected.year
@@ -130,7 +241,7 @@ def index(request):
     }
 
     if day_obj:
-        typed = _tide_typed(day_obj)
+        typed = day_obj.tides
         # Build WhatsApp share text with selected day's tides
         share_lines = [
             f"Marés de Salinópolis em {selected.strftime('%d/%m/%Y')}:",
@@ -148,8 +259,7 @@ def index(request):
             "whatsapp_share_url": f"https://wa.me/?text={quote_plus(share_text)}",
             "share_text": share_text,
         })
-
-    return render(request, "pages/index.html", context)
+    return context
 
 
 def sobre(request):
@@ -174,66 +284,139 @@ def robots_txt(request):
     return HttpResponse(content, content_type="text/plain")
 
 
+@stale_on_db_error
 def calendar_year(request, year: int):
+    first_shown, last_shown = _year_range(year)
+    range_qs = TideDay.objects.filter(date__range=(first_shown, last_shown))
+    etag, last_modified = range_validators(range_qs, "calendar", year)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    version = get_data_version()
+    key = cache_key("page:calendar", year, version=version)
+    content, warning = get_or_build(key, request, lambda: _render_calendar(request, year, version))
+    return _page_response(content, warning, etag, last_modified)
+
+
+@stale_on_db_error
+async def acalendar_year(request, year: int):
+    """``calendar_year`` assíncrona (deploy ASGI).
+
+    A renderização roda numa thread: os fragmentos de mês fora do cache leem
+    os dias sob demanda, de dentro do template.
+    """
+    first_shown, last_shown = _year_range(year)
+    range_qs = TideDay.objects.filter(date__range=(first_shown, last_shown))
+    etag, last_modified = await arange_validators(range_qs, "calendar", year)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    version = await aget_data_version()
+    key = cache_key("page:calendar", year, version=version)
+    content, warning = await aget_or_build(
+        key, request, lambda: sync_to_async(_render_calendar)(request, year, version)
+    )
+    return _page_response(content, warning, etag, last_modified)
+
+
+def _render_calendar(request, year, version):
+    first_shown, last_shown = _year_range(year)
     meses_pt = [
         "janeiro", "fevereiro", "março", "abril", "maio", "junho",
         "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
     ]
-    cal = calendar.Calendar(firstweekday=6)  # Sunday first
+    # Consulta adiada: só roda se algum fragmento de mês não estiver em cache
+    loaded = {}
 
-    days_qs = (
-        TideDay.objects.filter(date__year=year)
-        .prefetch_related("tides")
-        .order_by("date")
-    )
-    by_date = {td.date: td for td in days_qs}
+    def load_days():
+        if "by_date" not in loaded:
+            loaded["by_date"] = _load_days(first_shown, last_shown)
+        return loaded["by_date"]
+
+    def weeks_for(month):
+        return _month_grid(year, month, load_days())
 
     months = []
     for m in range(1, 13):
-        month_weeks = []
-        for week in cal.monthdatescalendar(year, m):
-            week_cells = []
-            for d in week:
-                td = by_date.get(d)
-                week_cells.append({
-                    "date": d,
-                    "in_month": (d.month == m),
-                    "has_data": td is not None,
-                    "tides": _tide_typed(td) if td else [],
-                })
-            month_weeks.append(week_cells)
         months.append({
             "name": meses_pt[m - 1].capitalize(),
             "number": m,
-            "weeks": month_weeks,
+            # O template chama o callable apenas fora do fragmento em cache
+            "weeks": partial(weeks_for, m),
         })
 
     context = {
         "year": year,
         "months": months,
+        "data_version": version,
+        "cache_timeout": page_timeout(),
     }
-    return render(request, "pages/calendar.html", context)
+    return render(request, "pages/calendar.html", context).content
 
 
+@stale_on_db_error
 def day_detail(request, year: int, month: int, day: int):
+    target = _day_target(year, month, day)
+    etag, last_modified = range_validators(
+        TideDay.objects.filter(date=target), "day", target, request.build_absolute_uri()
+    )
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    # canonical_url depende do host/esquema, então entra na chave
+    key = cache_key("page:day", target.isoformat(), request.build_absolute_uri())
+
+    def build():
+        day_obj = _load_days(target, target).get(target)
+        return render(request, "pages/day.html", _day_context(request, target, day_obj)).content
+
+    return _page_response(*get_or_build(key, request, build), etag, last_modified)
+
+
+@stale_on_db_error
+async def aday_detail(request, year: int, month: int, day: int):
+    """``day_detail`` assíncrona (deploy ASGI)."""
+    target = _day_target(year, month, day)
+    etag, last_modified = await arange_validators(
+        TideDay.objects.filter(date=target), "day", target, request.build_absolute_uri()
+    )
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+
+    version = await aget_data_version()
+    key = cache_key("page:day", target.isoformat(), request.build_absolute_uri(), version=version)
+
+    async def build():
+        day_obj = (await _aload_days(target, target)).get(target)
+        return render(request, "pages/day.html", _day_context(request, target, day_obj)).content
+
+    return _page_response(*await aget_or_build(key, request, build), etag, last_modified)
+
+
+def _day_target(year, month, day):
     try:
         target = date_cls(year, month, day)
     except ValueError:
-        target = timezone.localdate()
+        return timezone.localdate()
+    # As marés do dia são lidas por instante (``instant_bounds``)
+    return target if in_range(target) else timezone.localdate()
 
+
+def _day_context(request, target, day_obj):
     meses_pt = [
         "janeiro", "fevereiro", "março", "abril", "maio", "junho",
         "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
     ]
-    month_name = meses_pt[target.month - 1].capitalize()
-
-    day_obj = TideDay.objects.filter(date=target).prefetch_related("tides").first()
     context = {
         "date": target,
         "weekday": day_obj.weekday if day_obj else None,
-        "tides": _tide_typed(day_obj) if day_obj else [],
+        "tides": day_obj.tides if day_obj else [],
         "has_data": bool(day_obj),
-        "month_name": month_name,
+        "month_name": meses_pt[target.month - 1].capitalize(),
         "canonical_url": request.build_absolute_uri(),
         "og_image_url": request.build_absolute_uri(static("pages/imagens/og-image.png")),
         "whatsapp_share_url": "",
@@ -247,4 +430,4 @@ def day_detail(request, year: int, month: int, day: int):
         share_text = "\n".join(lines)
         context["share_text"] = share_text
         context["whatsapp_share_url"] = f"https://wa.me/?text={quote_plus(share_text)}"
-    return render(request, "pages/day.html", context)
+    return context